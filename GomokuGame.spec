@@ -5,12 +5,15 @@ a = Analysis(
     ['gomoku_standalone.py'],
     pathex=[],
     binaries=[],
+    # gomoku_standalone.py has its own AI and no opening book; build.bat and
+    # build_exe.py bundle opening_book.bin with gomoku.py
     datas=[('GUI_Pic', 'GUI_Pic')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Not used by the game; less to unpack on every launch
+    excludes=['tkinter', 'unittest', 'pydoc'],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +29,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-compressed binaries are decompressed again on every start
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
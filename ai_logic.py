@@ -1,85 +1,504 @@
 """
 AI logic for Gomoku: move selection and evaluation.
+
+Every empty cell gets a score per direction (horizontal, vertical and the two
+diagonals) for a given color: SCORE_GRADE for each friendly stone in the run
+through the cell, +1 for each open end and -2 for each end blocked by the
+opponent. The four direction scores form the ``shape`` of the cell; slot 4
+holds the combined value of the cell.
 """
 import random
-from game_logic import BOARD_SIZE
+import time
+from game_logic import BOARD_SIZE, DIRECTIONS, MAX_BOARD_SIZE, Board
+from threats import ThreatSolver, five_points
+from opening_book import book_move
+from engine_stats import MoveStats
+from scheduler import GameClock, MoveBudget
 
 SCORE_GRADE = 10
 MAX_SCORE = 1008611
+# Shares of a move's target time for the threat solver and the proof search
+# ahead of a search or MCTS (Medium gives the threat solver all of it).
+THREAT_SHARE = 0.25
+PROOF_SHARE = 0.25
+# Node budget of the proof-number search Hard runs in sharp positions the VCT left open.
+PROOF_NODE_LIMIT = 20000
+
+# A direction score this high means four friendly stones already touch the
+# cell in that line, so playing there makes five.
+FIVE_SCORE = 4 * SCORE_GRADE - 4
+# Marker stored in slot 4 of occupied cells.
+OCCUPIED = -MAX_SCORE
+
+
+def _direction_score(cells, x, y, dx, dy, color, size=BOARD_SIZE):
+    """Score the line through empty cell (x, y) in direction (dx, dy) for color."""
+    score = 0
+    for sx, sy in ((dx, dy), (-dx, -dy)):
+        nx, ny = x + sx, y + sy
+        while 0 <= nx < size and 0 <= ny < size and cells[nx * size + ny] == color:
+            score += SCORE_GRADE
+            nx += sx
+            ny += sy
+        if 0 <= nx < size and 0 <= ny < size:
+            value = cells[nx * size + ny]
+            if value == 0:
+                score += 1
+            elif value == -color:
+                score -= 2
+    return score
+
+
+def _line_score(board, idx, d, color):
+    """
+    _direction_score of empty cell idx along DIRECTIONS[d], read from the
+    Board's run tables instead of walking the line.
+    """
+    cells, geo = board.cells, board.geometry
+    score = 0
+    n = geo.following[d][idx]
+    if n >= 0 and cells[n] == color:
+        run = board.run_after[d][n]
+        score += SCORE_GRADE * (run + 1)
+        n = geo.following[d][n + run * geo.steps[d]]
+    if n >= 0:
+        score += 1 if cells[n] == 0 else -2
+    p = geo.preceding[d][idx]
+    if p >= 0 and cells[p] == color:
+        run = board.run_before[d][p]
+        score += SCORE_GRADE * (run + 1)
+        p = geo.preceding[d][p - run * geo.steps[d]]
+    if p >= 0:
+        score += 1 if cells[p] == 0 else -2
+    return score
+
+
+def shape_value(scores):
+    """
+    Combine the four direction scores of a cell into a single value, strongest
+    direction first. Returns MAX_SCORE if the cell completes five.
+    """
+    a, b, c, d = sorted(scores[:4], reverse=True)
+    if a >= FIVE_SCORE:
+        return MAX_SCORE
+    return a * 1000 + b * 100 + c * 10 + d
+
 
 def scan_board(board, color):
     """
     Scan each empty cell and evaluate its potential in all directions for the given color.
     Returns a 3D list of scores for each cell and direction.
     """
-    shape = [[[0 for _ in range(5)] for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
-    # TODO: Implement actual evaluation logic
+    size = len(board)
+    cells = [value for row in board for value in row]
+    shape = [[[0 for _ in range(5)] for _ in range(size)] for _ in range(size)]
+    for i in range(size):
+        for j in range(size):
+            if cells[i * size + j] != 0:
+                shape[i][j][4] = OCCUPIED
+                continue
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                shape[i][j][d] = _direction_score(cells, i, j, dx, dy, color, size)
     return shape
 
+
 def sort_shape(shape):
     """
     Sorts the score matrix for each cell and direction.
     """
-    # TODO: Implement actual sorting logic
+    for row in shape:
+        for cell in row:
+            cell[:4] = sorted(cell[:4], reverse=True)
     return shape
 
+
 def evaluate_shape(shape):
     """
     Evaluates the score matrix and returns the best move coordinates and score.
     """
-    # TODO: Implement actual evaluation logic
-    return (0, 0, 0)  # placeholder
+    max_x, max_y, max_score = 0, 0, OCCUPIED
+    size = len(shape)
+    for i in range(size):
+        for j in range(size):
+            cell = shape[i][j]
+            if cell[4] == OCCUPIED:
+                continue
+            if cell[0] >= FIVE_SCORE:
+                return i, j, MAX_SCORE
+            cell[4] = cell[0] * 1000 + cell[1] * 100 + cell[2] * 10 + cell[3]
+            if cell[4] > max_score:
+                max_x, max_y, max_score = i, j, cell[4]
+    return max_x, max_y, max_score
+
+
+# THREAT_WEIGHTS[stones][open ends]: value of extending a run of `stones`.
+THREAT_WEIGHTS = [
+    [0, 0, 0],
+    [0, 10, 50],
+    [0, 100, 1000],
+    [0, 1000, 10000],
+]
+# Direction score of a cell that turns a run of three into an open four.
+OPEN_FOUR_SCORE = 3 * SCORE_GRADE + 2
+
+
+def _threat_weight(score):
+    """
+    Weight of one direction score: how strong a line the color gets by playing
+    the cell, counting friendly stones and open ends. Five is handled apart.
+    """
+    stones = (score + 4) // SCORE_GRADE
+    ends = score - stones * SCORE_GRADE
+    open_ends = 2 if ends == 2 else 1 if ends in (1, -1) else 0
+    if stones >= 4:
+        return 0
+    return THREAT_WEIGHTS[stones][open_ends]
+
+
+_WEIGHTS = [_threat_weight(score) for score in range(-4, SCORE_GRADE * MAX_BOARD_SIZE + 3)]
+
+
+def cell_weight(cell):
+    """Sum of the direction weights of one shape cell."""
+    return _WEIGHTS[cell[0] + 4] + _WEIGHTS[cell[1] + 4] + _WEIGHTS[cell[2] + 4] + _WEIGHTS[cell[3] + 4]
+
+
+class ShapeTable:
+    """
+    Shape tensor for one color that follows a Board incrementally.
+
+    The table registers itself as a board observer. When a stone lands or is
+    removed, only cells whose direction scan reaches that stone are rescored:
+    along each of the four lines through it, the first empty cell past the run
+    of friendly stones on either side, and only in that line's direction. The
+    runs and the rescoring are read from the Board's run tables.
+    Unlike the tensor returned by scan_board, direction slots keep their order
+    and slot 4 always holds the combined value from shape_value.
+
+    Alongside the tensor the table keeps running totals over the empty cells:
+    `potential` (sum of cell_weight), `fives` (cells that complete five) and
+    `open_fours` (cells that make an open four).
+    """
+    def __init__(self, board, color):
+        self.board = board
+        self.color = color
+        self.rebuild()
+        board.add_observer(self)
+
+    def rebuild(self):
+        """Recompute the whole tensor from the board."""
+        self.shape = scan_board(self.board.grid, self.color)
+        self.potential = self.fives = self.open_fours = 0
+        for row in self.shape:
+            for cell in row:
+                if cell[4] != OCCUPIED:
+                    cell[4] = shape_value(cell)
+                    self._add(cell, 1)
+
+    def _add(self, cell, sign):
+        """Add (sign=1) or subtract (sign=-1) an empty cell's share of the totals."""
+        self.potential += sign * cell_weight(cell)
+        if cell[4] >= MAX_SCORE:
+            self.fives += sign
+        if OPEN_FOUR_SCORE in cell[:4]:
+            self.open_fours += sign
+
+    def board_reset(self):
+        self.rebuild()
+
+    def stone_placed(self, x, y, color):
+        cell = self.shape[x][y]
+        self._add(cell, -1)
+        cell[:] = [0, 0, 0, 0, OCCUPIED]
+        self._rescore_lines(x, y)
+
+    def stone_removed(self, x, y, color):
+        idx = x * self.board.size + y
+        cell = self.shape[x][y]
+        for d in range(4):
+            cell[d] = _line_score(self.board, idx, d, self.color)
+        cell[4] = shape_value(cell)
+        self._add(cell, 1)
+        self._rescore_lines(x, y)
+
+    def _rescore_lines(self, x, y):
+        """Rescore the cells whose direction scans pass through (x, y)."""
+        board, own = self.board, self.color
+        cells, geo, size = board.cells, board.geometry, board.size
+        idx = x * size + y
+        for d in range(4):
+            step = geo.steps[d]
+            n = geo.following[d][idx]
+            if n >= 0 and cells[n] == own:
+                n = geo.following[d][n + board.run_after[d][n] * step]
+            p = geo.preceding[d][idx]
+            if p >= 0 and cells[p] == own:
+                p = geo.preceding[d][p - board.run_before[d][p] * step]
+            for end in (n, p):
+                if end >= 0 and cells[end] == 0:
+                    cell = self.shape[end // size][end % size]
+                    self._add(cell, -1)
+                    cell[d] = _line_score(board, end, d, own)
+                    cell[4] = shape_value(cell)
+                    self._add(cell, 1)
+
+    def value(self, x, y):
+        """Combined value of cell (x, y), or OCCUPIED."""
+        return self.shape[x][y][4]
+
+    def weight(self, x, y):
+        """Threat weight of cell (x, y) for this color (0 if occupied)."""
+        return cell_weight(self.shape[x][y])
+
+    def best(self):
+        """
+        Return (x, y, score) of the highest valued empty cell, or None if the
+        board is full. Only the board's candidate cells are considered once
+        there is a stone on the board.
+        """
+        max_x, max_y, max_score = 0, 0, OCCUPIED
+        if self.board.candidates:
+            shape = self.shape
+            size = self.board.size
+            for idx in sorted(self.board.candidates):
+                x, y = divmod(idx, size)
+                if shape[x][y][4] > max_score:
+                    max_x, max_y, max_score = x, y, shape[x][y][4]
+            return max_x, max_y, max_score
+        for i, row in enumerate(self.shape):
+            for j, cell in enumerate(row):
+                if cell[4] > max_score:
+                    max_x, max_y, max_score = i, j, cell[4]
+        return None if max_score == OCCUPIED else (max_x, max_y, max_score)
+
+
+def shape_tables(board):
+    """
+    Return {color: ShapeTable} for a Board, attaching the tables on first use so
+    later calls only pay for incremental updates.
+    """
+    tables = {obs.color: obs for obs in board.observers if isinstance(obs, ShapeTable)}
+    for color in (1, -1):
+        if color not in tables:
+            tables[color] = ShapeTable(board, color)
+    return tables
+
 
-def autoplay(board, m, n):
+def autoplay(board, m, n, rng=None):
     """
-    Selects a random valid move near the last move.
+    Selects a random valid move near the last move. If the last move has no
+    free neighbour (or there is none), picks a random candidate cell touching
+    any stone instead. Returns None only when the board is full. The choice
+    is made with `rng` (a random.Random) if given, else the random module.
     """
-    a1 = [1,-1,1,-1,1,-1,0,0]
-    b1 = [1,-1,-1,1,0,0,1,-1]
-    rand = random.randint(0,7)
-    while m+a1[rand]>=0 and m+a1[rand]<BOARD_SIZE and n+b1[rand]>=0 and n+b1[rand]<BOARD_SIZE and board[m+a1[rand]][n+b1[rand]]!=0 :
-        rand = random.randint(0,7)
-    return m + a1[rand], n+b1[rand]
+    rng = rng or random
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    if m is not None:
+        a1 = [1,-1,1,-1,1,-1,0,0]
+        b1 = [1,-1,-1,1,0,0,1,-1]
+        free = [(m + a, n + b) for a, b in zip(a1, b1)
+                if board.in_bounds(m + a, n + b) and board.is_empty(m + a, n + b)]
+        if free:
+            return rng.choice(free)
+    moves = list(board.candidate_moves(radius=1)) or list(board.candidate_moves())
+    if moves:
+        return rng.choice(moves)
+    if board.occupied == 0:
+        return board.size // 2, board.size // 2
+    empty = [divmod(idx, board.size) for idx, color in enumerate(board.cells) if not color]
+    return rng.choice(empty) if empty else None
 
-def beta_go(board, m, n, color, times, difficulty='medium'):
+
+def _best_moves(board, color):
+    """
+    Return (x_P, y_P, max_P), (x_C, y_C, max_C): the best cell for the opponent
+    and for color, or None, None if the board is full. A Board uses its
+    incremental shape tables; a plain grid is scanned from scratch.
     """
-    AI move selection: chooses move based on difficulty.
+    if isinstance(board, Board):
+        tables = shape_tables(board)
+        return tables[-color].best(), tables[color].best()
+    shape_P = sort_shape(scan_board(board, -color))
+    shape_C = sort_shape(scan_board(board, color))
+    best_P, best_C = evaluate_shape(shape_P), evaluate_shape(shape_C)
+    if best_C[2] == OCCUPIED:
+        return None, None
+    return best_P, best_C
+
+
+class Preset:
+    """
+    A difficulty level: the `engine` that picks the moves ('random',
+    'evaluation', 'search' or 'mcts') at a search `strength` (None for the
+    default), the helpers run before it (opening book, a forced block, the
+    threat solver with or without VCT, the proof search), the time budget of
+    a move without a game clock (`move_time`), and the game clock the GUI
+    gives it (`game_time` seconds, None for none).
+    """
+    def __init__(self, name, engine, strength=None, move_time=1.0, game_time=None, use_book=True, use_threats=True,
+                 use_vct=True, use_proof=True):
+        self.name = name
+        self.engine = engine
+        self.strength = strength
+        self.move_time = move_time
+        self.game_time = game_time
+        self.use_book = use_book
+        self.use_threats = use_threats
+        self.use_vct = use_vct
+        self.use_proof = use_proof
+
+    def new_clock(self, increment=0.0):
+        """A GameClock of game_time seconds for one side of a game, or None."""
+        return GameClock(self.game_time, increment) if self.game_time else None
+
+    def __repr__(self):
+        return f'Preset({self.name!r}, engine={self.engine!r}, move_time={self.move_time}, game_time={self.game_time})'
+
+
+PRESETS = {
+    'easy': Preset('easy', 'random', move_time=0.0, use_book=False, use_threats=False, use_vct=False,
+                   use_proof=False),
+    'medium': Preset('medium', 'evaluation', move_time=0.25, game_time=10.0, use_vct=False, use_proof=False),
+    'hard': Preset('hard', 'search', move_time=1.0, game_time=30.0),
+    'mcts': Preset('mcts', 'mcts', move_time=1.0, game_time=30.0, use_proof=False),
+}
+
+
+def beta_go(board, m, n, color, preset='medium', clock=None, strength=None, time_limit=None, node_limit=None,
+            stop_event=None, use_book=None, workers=1, stats=None, use_proof=None, rng=None):
+    """
+    AI move selection with a preset, a name in PRESETS or a Preset:
     - easy: random
     - medium: current evaluation
-    - hard: prioritize blocking/winning
-    """
-    if difficulty == 'easy':
-        return autoplay(board, m, n)
-    elif difficulty == 'medium':
-        # Use current evaluation logic
-        shape_P = scan_board(board, -color)
-        shape_C = scan_board(board, color)
-        shape_P = sort_shape(shape_P)
-        shape_C = sort_shape(shape_C)
-        max_x_P, max_y_P, max_P = evaluate_shape(shape_P)
-        max_x_C, max_y_C, max_C = evaluate_shape(shape_C)
-        if max_P > max_C and max_C < MAX_SCORE:
-            return max_x_P, max_y_P
+    - hard: alpha-beta search (search.SearchEngine)
+    - mcts: Monte Carlo tree search (mcts.MCTSEngine), the tree kept between moves
+
+    Medium, hard and mcts play from the opening book (opening_book.py) while the
+    position is in it, block a lone four at once, and otherwise first ask the
+    threat solver (threats.py) for a forced win. When that finds none in a
+    sharp position, hard also runs a short proof-number search (pn_search.py)
+    before searching. `use_book` and `use_proof` override the preset.
+
+    `clock` is the side's scheduler.GameClock for the game: each move is
+    given a budget from it, more in critical positions and less for forced
+    moves, and its time is taken off the clock unless the move is cancelled
+    through `stop_event` (it is not played then). Without a clock a move gets
+    the preset's move_time. `time_limit` (seconds) caps the budget either
+    way; the solvers and the search stop by its hard limit.
+
+    `board` is either a Board (evaluated incrementally) or a grid[x][y].
+    Passing `strength` (1-10) selects the search engine at that level whatever
+    the preset; `node_limit` caps its work (for mcts, it counts playouts).
+    Setting `stop_event` (a threading.Event) cuts the solver and search short.
+    `workers` other than 1 spreads the search over that many processes
+    (parallel_search.py; None means one per core).
+    `stats` (an engine_stats.StatsRecorder, or anything with a record method)
+    is given a MoveStats describing how the move was chosen and what it cost.
+    `rng` (a random.Random) makes the easy preset's random moves repeatable.
+    """
+    if not isinstance(preset, Preset):
+        if preset not in PRESETS:
+            raise ValueError(f'unknown preset {preset!r}')
+        preset = PRESETS[preset]
+    info = MoveStats(preset.name, color)
+    start = time.perf_counter()
+    if strength is not None and preset.engine != 'search':
+        preset = PRESETS['hard']
+    position = board if isinstance(board, Board) else Board.from_grid(board)
+    if clock is not None:
+        budget = clock.budget(position, color, start)
+    else:
+        budget = MoveBudget(_move_time(preset, strength), _move_time(preset, strength), start)
+    if time_limit is not None:
+        budget.cap(time_limit)
+    info.target, info.limit = budget.target, budget.limit
+    info.move = _choose_move(info, position, m, n, color, preset, budget, strength, node_limit, stop_event,
+                             preset.use_book if use_book is None else use_book, workers,
+                             preset.use_proof if use_proof is None else use_proof, rng)
+    info.elapsed = time.perf_counter() - start
+    if clock is not None and not (stop_event is not None and stop_event.is_set()):
+        clock.charge(info.elapsed)
+        info.clock = clock.remaining
+    if stats is not None:
+        stats.record(info)
+    return info.move
+
+
+def _move_time(preset, strength):
+    """A move's time without a clock: the strength's own budget if one is given, else the preset's."""
+    if strength is None:
+        return preset.move_time
+    from search import STRENGTH_LEVELS
+    return STRENGTH_LEVELS[min(max(int(strength), 1), max(STRENGTH_LEVELS))][2]
+
+
+def _choose_move(info, board, m, n, color, preset, budget, strength, node_limit, stop_event, use_book, workers,
+                 use_proof, rng):
+    """The body of beta_go on a Board; notes in `info` where the move came from and the search work done."""
+    if board.occupied == 0:
+        info.source = 'centre'
+        return board.size // 2, board.size // 2
+    engine = preset.engine
+    if use_book and engine != 'random':
+        move = book_move(board)
+        if move is not None:
+            info.source = 'book'
+            return move
+    if preset.use_threats:
+        mine, theirs = board.bits[color], board.bits[-color]
+        blocks = five_points(theirs, mine, board.size)
+        if blocks and not blocks & (blocks - 1) and not five_points(mine, theirs, board.size):
+            info.source = 'forced'
+            return divmod(blocks.bit_length() - 1, board.size)
+        # Forced wins first: VCF always, VCT as well when the preset says so.
+        share = THREAT_SHARE if engine in ('search', 'mcts') else 1.0
+        solver = ThreatSolver(time_limit=budget.share(share), stop_event=stop_event)
+        line = solver.forced_win(board, color, use_vct=preset.use_vct)
+        info.threat_nodes = solver.nodes
+        if line:
+            info.source = 'threats'
+            info.depth = (len(line) + 1) // 2
+            return line[0]
+    if engine == 'search' and use_proof:
+        from pn_search import PROVEN, prove, sharp_position
+        if sharp_position(board, color):
+            result = prove(board, color, PROOF_NODE_LIMIT, budget.share(PROOF_SHARE), stop_event)
+            info.proof_nodes = result.nodes
+            if result.status == PROVEN:
+                info.source = 'proof'
+                info.depth = (len(result.line) + 1) // 2
+                return result.move
+    if engine == 'mcts':
+        from mcts import mcts_move
+        result = mcts_move(board, color, budget.target_left(), playout_limit=node_limit, stop_event=stop_event)
+        info.source = 'mcts'
+        info.add_search(result)
+        return result.move
+    if engine == 'search':
+        from search import DEFAULT_STRENGTH, search_move
+        if strength is None:
+            strength = preset.strength or DEFAULT_STRENGTH
+        if workers != 1:
+            from parallel_search import parallel_search_move
+            result = parallel_search_move(board, color, strength, workers, time_limit=budget.target_left(),
+                                          node_limit=node_limit, stop_event=stop_event)
+            info.source = 'parallel'
         else:
-            return max_x_C, max_y_C
-    elif difficulty == 'hard':
-        # Prioritize blocking opponent or winning
-        shape_P = scan_board(board, -color)
-        shape_C = scan_board(board, color)
-        shape_P = sort_shape(shape_P)
-        shape_C = sort_shape(shape_C)
-        max_x_P, max_y_P, max_P = evaluate_shape(shape_P)
-        max_x_C, max_y_C, max_C = evaluate_shape(shape_C)
-        # If can win, do it
-        if max_C >= MAX_SCORE:
-            return max_x_C, max_y_C
-        # If opponent can win, block
-        if max_P >= MAX_SCORE:
-            return max_x_P, max_y_P
-        # Otherwise, best move
-        if max_P > max_C:
+            result = search_move(board, color, strength, time_limit=budget.left(),
+                                 soft_time_limit=budget.target_left(), node_limit=node_limit, stop_event=stop_event)
+            info.source = 'search'
+        info.add_search(result)
+        return result.move
+    if engine == 'evaluation':
+        info.source = 'evaluation'
+        best_P, best_C = _best_moves(board, color)
+        if best_C is None:
+            return None
+        (max_x_P, max_y_P, max_P), (max_x_C, max_y_C, max_C) = best_P, best_C
+        if max_P > max_C and max_C < MAX_SCORE:
             return max_x_P, max_y_P
         else:
             return max_x_C, max_y_C
-    else:
-        return autoplay(board, m, n)
+    info.source = 'random'
+    return autoplay(board, m, n, rng)
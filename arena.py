@@ -0,0 +1,277 @@
+"""
+Headless self-play arena for Gomoku engines.
+
+Plays two beta_go configurations against each other for N games without
+opening a window, spreading the games over a process pool. Games are played
+in pairs: both games of a pair start from the same short random opening,
+derived from the pair's seed, with the colors swapped, so neither engine
+gets the better openings and a deterministic engine does not replay the
+same game.
+
+Usage:
+    python arena.py --games 40 --a-difficulty hard --a-time 0.5 --b-difficulty medium
+    python arena.py --games 40 --a-clock 20 --b-clock 20 --b-difficulty mcts
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game_logic import BOARD_SIZE, Board
+from ai_logic import PRESETS, beta_go
+from scheduler import GameClock
+from engine_stats import StatsRecorder
+from game_record import GameWriter
+
+OPENING_MOVES = 2
+
+
+class EngineConfig:
+    """
+    One side of a match: a beta_go preset plus optional budgets and seed.
+    With `game_time`, each game gives the engine a GameClock of that many
+    seconds (plus `increment` a move); `time_limit` caps every move. With
+    `stats_log`, the statistics of every move are appended to that
+    JSON-lines file, tagged with the engine name. `use_book` and `use_proof`
+    None keep the preset's choice.
+    """
+    def __init__(self, difficulty='hard', time_limit=None, strength=None, seed=None, name=None, use_book=None,
+                 workers=1, stats_log=None, use_proof=None, game_time=None, increment=0.0):
+        self.difficulty = difficulty
+        self.time_limit = time_limit
+        self.game_time = game_time
+        self.increment = increment
+        self.strength = strength
+        self.seed = seed
+        self.use_book = use_book
+        self.use_proof = use_proof
+        self.workers = workers
+        self.name = name or self.describe()
+        self.stats_log = stats_log
+        self._stats = None
+
+    def describe(self):
+        parts = [self.difficulty]
+        if self.strength is not None:
+            parts.append(f'strength={self.strength}')
+        if self.game_time is not None:
+            parts.append(f'clock={self.game_time}s' + (f'+{self.increment}s' if self.increment else ''))
+        if self.time_limit is not None:
+            parts.append(f'time={self.time_limit}s')
+        if self.use_book is False:
+            parts.append('no book')
+        if self.use_proof is False:
+            parts.append('no proof')
+        if self.workers != 1:
+            parts.append(f'workers={self.workers or "all"}')
+        return ' '.join(parts)
+
+    def new_clock(self):
+        """A fresh GameClock for one game, or None to give every move the preset's time."""
+        return GameClock(self.game_time, self.increment) if self.game_time is not None else None
+
+    def choose(self, board, last_move, color, clock=None, rng=None):
+        """Ask beta_go for a move; `rng` is the engine's own random.Random for the game."""
+        m, n = last_move if last_move else (None, None)
+        if self.stats_log and self._stats is None:
+            # Made on first use, in the process that plays the game
+            self._stats = StatsRecorder(self.stats_log, tags={'engine': self.name})
+        return beta_go(board, m, n, color, self.difficulty, clock,
+                       strength=self.strength, time_limit=self.time_limit, use_book=self.use_book,
+                       workers=self.workers, stats=self._stats, use_proof=self.use_proof, rng=rng)
+
+
+def random_opening(seed, moves=OPENING_MOVES, size=BOARD_SIZE):
+    """A few alternating moves near the centre, starting with black in the centre."""
+    rng = random.Random(seed)
+    centre = size // 2
+    opening = [(centre, centre)]
+    while len(opening) < moves + 1:
+        move = (centre + rng.randint(-2, 2), centre + rng.randint(-2, 2))
+        if move not in opening:
+            opening.append(move)
+    return opening
+
+
+def play_game(black, white, seed, size=BOARD_SIZE):
+    """
+    Play one game between two EngineConfigs on a size x size board. Returns a
+    dict with the winner (1 black, -1 white, 0 draw), the move list, each
+    side's move times and whether its game clock ran out.
+    """
+    board = Board(size)
+    color = 1
+    last_move = None
+    moves = []
+    times = {1: [], -1: []}
+    for move in random_opening(seed, size=size):
+        board.place(move[0], move[1], color)
+        moves.append(move)
+        last_move = move
+        color = -color
+    engines = {1: black, -1: white}
+    clocks = {1: black.new_clock(), -1: white.new_clock()}
+    # Each seeded engine draws from its own generator, so one seed never disturbs the other
+    rngs = {color: random.Random(engine.seed + seed) if engine.seed is not None else None
+            for color, engine in engines.items()}
+    winner = 0
+    while len(moves) < size * size:
+        start = time.perf_counter()
+        move = engines[color].choose(board, last_move, color, clocks[color], rngs[color])
+        times[color].append(time.perf_counter() - start)
+        if move is None:
+            break
+        if not board.place(move[0], move[1], color):
+            # An illegal move forfeits the game
+            winner = -color
+            break
+        moves.append(move)
+        if board.check_win(move[0], move[1], color):
+            winner = color
+            break
+        last_move = move
+        color = -color
+    flagged = {c: clock is not None and clock.flagged for c, clock in clocks.items()}
+    return {'seed': seed, 'winner': winner, 'moves': moves, 'times': times, 'flagged': flagged}
+
+
+def _play_pair(args):
+    a, b, seed, a_is_black, size = args
+    result = play_game(a, b, seed, size) if a_is_black else play_game(b, a, seed, size)
+    a_color = 1 if a_is_black else -1
+    return {
+        'seed': seed,
+        'a_color': a_color,
+        'a_result': result['winner'] * a_color,
+        'moves': len(result['moves']),
+        'game': result['moves'],
+        'winner': result['winner'],
+        'a_times': result['times'][a_color],
+        'b_times': result['times'][-a_color],
+        'a_flagged': result['flagged'][a_color],
+        'b_flagged': result['flagged'][-a_color],
+    }
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_difference(wins, draws, losses):
+    """
+    Elo difference of A over B with the half-width of its 95% confidence
+    interval, from the per-game score variance.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float('inf')
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if not variance:
+        # All results alike: the sample says nothing about the spread.
+        return _elo(score), float('inf')
+    stderr = math.sqrt(variance / games)
+    low, high = _elo(score - 1.96 * stderr), _elo(score + 1.96 * stderr)
+    return _elo(score), (high - low) / 2
+
+
+def run_match(a, b, games, seed=0, workers=None, size=BOARD_SIZE, record=None):
+    """
+    Play `games` games between EngineConfigs a and b on a process pool and
+    return the summary as a dict. Games 2k and 2k + 1 share the opening of
+    seed + k, with a as black in the first and white in the second. With
+    `record` (a path), the games are also appended to that game record file.
+    """
+    jobs = [(a, b, seed + i // 2, i % 2 == 0, size) for i in range(games)]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_play_pair(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_play_pair, jobs))
+    if record:
+        with GameWriter(record) as writer:
+            for r in results:
+                writer.write(r['game'], r['winner'], size)
+    wins = sum(1 for r in results if r['a_result'] > 0)
+    losses = sum(1 for r in results if r['a_result'] < 0)
+    draws = games - wins - losses
+    elo, margin = elo_difference(wins, draws, losses)
+    a_times = [t for r in results for t in r['a_times']]
+    b_times = [t for r in results for t in r['b_times']]
+    return {
+        'a': a.name,
+        'b': b.name,
+        'size': size,
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'elo': elo,
+        'elo_margin': margin,
+        'a_move_ms': 1000 * sum(a_times) / len(a_times) if a_times else 0.0,
+        'b_move_ms': 1000 * sum(b_times) / len(b_times) if b_times else 0.0,
+        'a_max_ms': 1000 * max(a_times, default=0.0),
+        'b_max_ms': 1000 * max(b_times, default=0.0),
+        'a_flagged': sum(r['a_flagged'] for r in results),
+        'b_flagged': sum(r['b_flagged'] for r in results),
+        'avg_game_length': sum(r['moves'] for r in results) / games if games else 0.0,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def format_report(summary):
+    return '\n'.join([
+        f"A: {summary['a']}",
+        f"B: {summary['b']}",
+        f"Games: {summary['games']}  A wins/draws/losses: {summary['wins']}/{summary['draws']}/{summary['losses']}",
+        f"Elo A-B: {summary['elo']:+.0f} +/- {summary['elo_margin']:.0f} (95%)",
+        f"Avg move time: A {summary['a_move_ms']:.1f} ms, B {summary['b_move_ms']:.1f} ms",
+        f"Max move time: A {summary['a_max_ms']:.1f} ms, B {summary['b_max_ms']:.1f} ms; "
+        f"clocks run out: A {summary['a_flagged']}, B {summary['b_flagged']}",
+        f"Avg game length: {summary['avg_game_length']:.1f} moves, wall time {summary['wall_time']:.1f} s",
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play two Gomoku engine configurations against each other.')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first pair of games')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE, help='board size (default 15)')
+    parser.add_argument('--record', metavar='FILE', help='append the games to this game record file')
+    parser.add_argument('--stats-log', metavar='FILE', help='append per-move engine statistics as JSON lines')
+    for side in ('a', 'b'):
+        parser.add_argument(f'--{side}-difficulty', default='hard' if side == 'a' else 'medium',
+                            choices=list(PRESETS))
+        parser.add_argument(f'--{side}-time', type=float, default=None, help='per-move time limit in seconds')
+        parser.add_argument(f'--{side}-clock', type=float, default=None, help='time for the whole game in seconds')
+        parser.add_argument(f'--{side}-increment', type=float, default=0.0, help='seconds added after every move')
+        parser.add_argument(f'--{side}-strength', type=int, default=None, help='search strength 1-10')
+        parser.add_argument(f'--{side}-seed', type=int, default=None, help='seed for the engine\'s own randomness')
+        parser.add_argument(f'--{side}-no-book', action='store_true', help='do not use the opening book')
+        parser.add_argument(f'--{side}-no-proof', action='store_true',
+                            help='no proof-number search in sharp positions (hard)')
+        parser.add_argument(f'--{side}-search-workers', type=int, default=1,
+                            help='processes per search (0: one per core); use with --workers 1')
+    args = parser.parse_args(argv)
+    a = EngineConfig(args.a_difficulty, args.a_time, args.a_strength, args.a_seed,
+                     use_book=False if args.a_no_book else None, workers=args.a_search_workers or None,
+                     stats_log=args.stats_log, use_proof=False if args.a_no_proof else None,
+                     game_time=args.a_clock, increment=args.a_increment)
+    b = EngineConfig(args.b_difficulty, args.b_time, args.b_strength, args.b_seed,
+                     use_book=False if args.b_no_book else None, workers=args.b_search_workers or None,
+                     stats_log=args.stats_log, use_proof=False if args.b_no_proof else None,
+                     game_time=args.b_clock, increment=args.b_increment)
+    summary = run_match(a, b, args.games, args.seed, args.workers, args.size, args.record)
+    print(json.dumps(summary, indent=2) if args.json else format_report(summary))
+
+
+if __name__ == "__main__":
+    main()
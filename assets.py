@@ -0,0 +1,189 @@
+"""
+Images and sounds for the GUI, prepared once and reused.
+
+Decoding bg.png and smoothscaling the stone PNGs is repeated on every
+launch, and the PyInstaller one-file build also unpacks them into a fresh
+temporary directory each time. AssetCache keeps every image it prepares,
+already scaled, as raw pixels in a cache directory outside the bundle, so
+later launches read it back with frombytes and only convert it to the
+display format. An entry is named after the source file's size and
+modification time and the scale, so replacing an image rebuilds it.
+
+Sounds starts the mixer only when the first sound is played and builds each
+Sound once. Opening the audio device is then off the path to the first
+frame, and moves no longer create a new Sound each time.
+
+StartupTimer measures the time from import to the first frame, split into
+named steps; set GOMOKU_STARTUP_REPORT=1 to print it when the game starts.
+"""
+import hashlib
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+CACHE_MAGIC = b'GMKS'
+CACHE_HEADER = struct.Struct('<4sHHB')
+# Stand-in effects when no sound file is configured: short square-wave beeps.
+BEEPS = {
+    'move': b'\x00\xff' * 1000,
+    'win': b'\x00\xff' * 2000,
+}
+
+
+def cache_dir():
+    """Per-user cache directory: $GOMOKU_CACHE_DIR, else the platform's usual place."""
+    if os.environ.get('GOMOKU_CACHE_DIR'):
+        return os.environ['GOMOKU_CACHE_DIR']
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'gomoku')
+
+
+class AssetCache:
+    """
+    Display-format images, scaled and cached on disk. `directory=None` uses
+    cache_dir(); a directory that cannot be written only disables the disk
+    cache. Needs a display mode to be set before image() is called.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or cache_dir()
+        self.hits = 0
+        self.misses = 0
+        self._images = {}
+
+    def image(self, path, scale=1.0, alpha=True):
+        """
+        The image at `path`, scaled by `scale` with smoothscale and converted
+        with convert_alpha() (or convert() if not `alpha`).
+        """
+        key = (path, scale, alpha)
+        surface = self._images.get(key)
+        if surface is None:
+            cached = self._cache_file(path, scale, alpha)
+            surface = self._load(cached, alpha) if cached else None
+            if surface is None:
+                self.misses += 1
+                surface = self._build(path, scale, alpha)
+                if cached:
+                    self._store(cached, surface, alpha)
+            else:
+                self.hits += 1
+            self._images[key] = surface
+        return surface
+
+    def _cache_file(self, path, scale, alpha):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        source = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{scale!r}|{alpha}|{pygame.version.ver}'
+        digest = hashlib.sha1(source.encode()).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.directory, f'{name}-{digest}.px')
+
+    @staticmethod
+    def _build(path, scale, alpha):
+        image = pygame.image.load(path)
+        image = image.convert_alpha() if alpha else image.convert()
+        if scale != 1.0:
+            image = pygame.transform.smoothscale(image, (int(image.get_width() * scale),
+                                                         int(image.get_height() * scale)))
+        return image
+
+    @staticmethod
+    def _load(cached, alpha):
+        """The surface stored in a cache file, or None if it is missing or unusable."""
+        try:
+            with open(cached, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < CACHE_HEADER.size:
+            return None
+        magic, width, height, has_alpha = CACHE_HEADER.unpack_from(data)
+        mode = 'RGBA' if has_alpha else 'RGB'
+        pixels = data[CACHE_HEADER.size:]
+        if magic != CACHE_MAGIC or has_alpha != alpha or len(pixels) != width * height * len(mode):
+            return None
+        image = pygame.image.frombytes(pixels, (width, height), mode)
+        return image.convert_alpha() if alpha else image.convert()
+
+    @staticmethod
+    def _store(cached, surface, alpha):
+        mode = 'RGBA' if alpha else 'RGB'
+        data = CACHE_HEADER.pack(CACHE_MAGIC, *surface.get_size(), alpha) + pygame.image.tobytes(surface, mode)
+        partial = f'{cached}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, cached)
+        except OSError:
+            pass  # The cache only saves time; carry on without it
+
+
+class Sounds:
+    """
+    Sound effects by name. `files` maps a name to a sound file; other names
+    play their BEEPS buffer. The mixer is started by the first play(), and
+    if there is no audio device every play() is silently skipped.
+    """
+    def __init__(self, files=None):
+        self.files = files or {}
+        self.available = True
+        self._sounds = {}
+
+    def play(self, name):
+        sound = self._sounds.get(name)
+        if sound is None:
+            if not self.available:
+                return
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                path = self.files.get(name)
+                sound = pygame.mixer.Sound(path) if path else pygame.mixer.Sound(buffer=BEEPS[name])
+            except pygame.error:
+                self.available = False
+                return
+            self._sounds[name] = sound
+        sound.play()
+
+
+class StartupTimer:
+    """Wall time of named startup steps, each measured from the previous mark()."""
+    def __init__(self):
+        self.start = self._last = time.perf_counter()
+        self.steps = []
+        self.reported = False
+
+    def mark(self, step):
+        now = time.perf_counter()
+        self.steps.append((step, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.start
+
+    def summary(self):
+        steps = ', '.join(f'{step} {1000 * seconds:.0f} ms' for step, seconds in self.steps)
+        return f'startup {1000 * self.total:.0f} ms: {steps}'
+
+    def report(self):
+        """Print the summary once, if GOMOKU_STARTUP_REPORT is set and there is a console."""
+        if self.reported:
+            return
+        self.reported = True
+        if os.environ.get('GOMOKU_STARTUP_REPORT') and sys.stderr is not None:
+            print(self.summary(), file=sys.stderr, flush=True)
+
+
+# Started when the game's modules are first imported; gomoku.py imports this
+# module first so the imports are part of the measurement.
+startup = StartupTimer()
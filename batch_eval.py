@@ -0,0 +1,218 @@
+"""
+Batch evaluation of many positions at once with NumPy.
+
+Positions are an (N, size, size) int8 array of 0/1/-1 cells indexed
+[n, x, y]. evaluate_batch() returns, for every position, the static score the
+search would give it (SearchEngine.evaluate at the root) and for each color
+the per-cell threat map: the cell_weight of every empty cell, as in the
+ShapeTables of ai_logic. The results match the incremental tables exactly.
+
+Nothing loops over cells or positions in Python. The board is padded with a
+wall value, and each direction is scanned as sliding windows: four shifted
+views of the whole batch on either side of every cell. Runs of friendly stones
+only need counting up to four per side, since any four already make a five
+(and weigh nothing as a threat), so the stones and ends of all lines through
+all cells come out of 2 x 4 x 4 whole-array steps per color.
+
+For offline work on large position sets (tuning, book building, game review):
+    python batch_eval.py games.gmr --output scores.npy
+"""
+import argparse
+import time
+from itertools import islice
+
+import numpy as np
+
+from ai_logic import FIVE_SCORE, OPEN_FOUR_SCORE, SCORE_GRADE, _threat_weight
+from game_logic import DIRECTIONS, WIN_LENGTH
+from game_record import DEFAULT_RECORDS, read_records
+from search import WIN_SCORE
+
+# Cell value of the padding around the board.
+WALL = 2
+# Positions evaluated together; bounds the temporary arrays to a few MB.
+CHUNK_SIZE = 4096
+# Friendly stones counted on each side of a cell; longer runs score the same.
+REACH = WIN_LENGTH - 1
+# _WEIGHTS of ai_logic for every direction score a capped run can reach.
+_WEIGHTS = np.array([_threat_weight(score) for score in range(-4, 2 * REACH * SCORE_GRADE + 3)], dtype=np.int32)
+# What the cell past a run adds to the direction score, indexed by value + 1
+# from the color's point of view: opponent -2, empty +1, (own), wall 0.
+_END_BONUS = np.array([-2, 1, 0, 0], dtype=np.int16)
+
+
+class BatchEvaluation:
+    """
+    Results for N positions: `scores` (N,) for the side to move and, keyed
+    by color, `threats` (N, size, size), `potential`, `fives` and
+    `open_fours` (N,) as in ai_logic.ShapeTable.
+    """
+    def __init__(self, scores, threats, potential, fives, open_fours):
+        self.scores = scores
+        self.threats = threats
+        self.potential = potential
+        self.fives = fives
+        self.open_fours = open_fours
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __repr__(self):
+        return f'BatchEvaluation(positions={len(self.scores)})'
+
+
+def stack_boards(boards):
+    """An (N, size, size) int8 array of the stones on Boards of one size."""
+    size = boards[0].size
+    if any(board.size != size for board in boards):
+        raise ValueError('all boards of a batch must have the same size')
+    return np.array([np.frombuffer(board.cells, dtype=np.int8) for board in boards]).reshape(-1, size, size)
+
+
+def _check_positions(positions):
+    positions = np.asarray(positions, dtype=np.int8)
+    if positions.ndim != 3 or positions.shape[1] != positions.shape[2]:
+        raise ValueError(f'positions must have shape (N, size, size), got {positions.shape}')
+    return positions
+
+
+def direction_scores(positions, color):
+    """
+    (N, 4, size, size) ai_logic direction scores of the empty cells for
+    color, in DIRECTIONS order (0 on occupied cells). Runs are counted up to
+    REACH stones per side, which changes no weight, five or open four.
+    """
+    positions = _check_positions(positions)
+    n, size = positions.shape[0], positions.shape[1]
+    # From color's point of view: own stones 1, opponent -1, wall 2
+    padded = np.pad(positions * np.int8(color), ((0, 0), (REACH, REACH), (REACH, REACH)), constant_values=WALL)
+    own = padded == 1
+    bonus = _END_BONUS[padded + 1]
+    empty = positions == 0
+    scores = np.zeros((n, len(DIRECTIONS), size, size), dtype=np.int16)
+    alive = np.empty((n, size, size), dtype=bool)
+    for d, (dx, dy) in enumerate(DIRECTIONS):
+        score = scores[:, d]
+        for sign in (1, -1):
+            alive.fill(True)
+            for k in range(1, REACH + 1):
+                ox, oy = REACH + sign * k * dx, REACH + sign * k * dy
+                window = (slice(None), slice(ox, ox + size), slice(oy, oy + size))
+                # Where the run stops at this step, the cell reached is its end
+                score += (alive & ~own[window]) * bonus[window]
+                alive &= own[window]
+                score += alive * np.int16(SCORE_GRADE)
+        score *= empty
+    return scores
+
+
+def threat_map(positions, color):
+    """(N, size, size) cell_weight of every empty cell for color (0 on occupied cells)."""
+    return _WEIGHTS[direction_scores(positions, color) + 4].sum(axis=1)
+
+
+def evaluate_batch(positions, to_move=1, chunk_size=CHUNK_SIZE):
+    """
+    Evaluate an (N, size, size) int8 array of positions. `to_move` is the
+    color to move, 1 or -1, for all positions or as an (N,) array. The
+    positions are worked through `chunk_size` at a time. Returns a
+    BatchEvaluation.
+    """
+    positions = _check_positions(positions)
+    to_move = np.broadcast_to(np.asarray(to_move, dtype=np.int8), (len(positions),))
+    if len(positions) <= chunk_size:
+        return _evaluate_chunk(positions, to_move)
+    parts = [_evaluate_chunk(positions[i:i + chunk_size], to_move[i:i + chunk_size])
+             for i in range(0, len(positions), chunk_size)]
+
+    def join(name):
+        return {color: np.concatenate([getattr(part, name)[color] for part in parts]) for color in (1, -1)}
+
+    return BatchEvaluation(np.concatenate([part.scores for part in parts]), join('threats'),
+                           join('potential'), join('fives'), join('open_fours'))
+
+
+def _evaluate_chunk(positions, to_move):
+    threats, potential, fives, open_fours = {}, {}, {}, {}
+    for color in (1, -1):
+        scores = direction_scores(positions, color)
+        threats[color] = _WEIGHTS[scores + 4].sum(axis=1)
+        potential[color] = threats[color].sum(axis=(1, 2), dtype=np.int64)
+        fives[color] = (scores >= FIVE_SCORE).any(axis=1).sum(axis=(1, 2))
+        open_fours[color] = (scores == OPEN_FOUR_SCORE).any(axis=1).sum(axis=(1, 2))
+    black = to_move == 1
+
+    def side(values, mine):
+        return np.where(black == mine, values[1], values[-1])
+
+    own_fives, opp_fives = side(fives, True), side(fives, False)
+    scores = np.where(own_fives > 0, WIN_SCORE,
+                      np.where(opp_fives > 1, -(WIN_SCORE - 1),
+                               np.where((side(open_fours, True) > 0) & (opp_fives == 0), WIN_SCORE - 2,
+                                        side(potential, True) - side(potential, False))))
+    return BatchEvaluation(scores.astype(np.int64), threats, potential, fives, open_fours)
+
+
+def record_positions(records):
+    """
+    Every position of a list of GameRecords of one size, after each move:
+    (positions, to_move, game) arrays, `game` indexing the record.
+    """
+    size = records[0].size
+    total = sum(len(record.moves) for record in records)
+    positions = np.zeros((total, size, size), dtype=np.int8)
+    to_move = np.empty(total, dtype=np.int8)
+    games = np.empty(total, dtype=np.intp)
+    i = 0
+    for game, record in enumerate(records):
+        if record.size != size:
+            raise ValueError('all games of a batch must have the same board size')
+        end = i + len(record.moves)
+        for k, (x, y) in enumerate(record.moves):
+            # The stone is on the board in this position and every later one of the game
+            positions[i + k:end, x, y] = 1 if k % 2 == 0 else -1
+        to_move[i:end] = np.where(np.arange(end - i) % 2 == 0, -1, 1)
+        games[i:end] = game
+        i = end
+    return positions, to_move, games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate every position of a game record file in batches.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_RECORDS)
+    parser.add_argument('--size', type=int, default=None, help='only games on this board size (default: the first game\'s)')
+    parser.add_argument('--output', '-o', help='save the scores, from black\'s point of view, as a .npy file')
+    args = parser.parse_args(argv)
+
+    size = args.size
+    records = iter(read_records(args.path))
+    scores = []
+    positions = elapsed = games = 0
+    while True:
+        # Enough games for about one chunk of positions at a time
+        chunk = list(islice(records, CHUNK_SIZE // 16))
+        if not chunk:
+            break
+        if size is None:
+            size = chunk[0].size
+        batch = [record for record in chunk if record.moves and record.size == size]
+        if not batch:
+            continue
+        batch_positions, to_move, _ = record_positions(batch)
+        start = time.perf_counter()
+        result = evaluate_batch(batch_positions, to_move)
+        elapsed += time.perf_counter() - start
+        scores.append(result.scores * to_move)
+        positions += len(batch_positions)
+        games += len(batch)
+    if not positions:
+        print('no games to evaluate')
+        return
+    if args.output:
+        np.save(args.output, np.concatenate(scores))
+    print(f'{positions} positions from {games} {size}x{size} games evaluated in {elapsed:.2f} s '
+          f'({positions / elapsed:,.0f} positions/s)')
+
+
+if __name__ == "__main__":
+    main()
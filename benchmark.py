@@ -0,0 +1,280 @@
+"""
+Benchmarks for game_logic and ai_logic.
+
+- Micro: Board.place/remove, Board.check_win, Board.win_line,
+  scan_board, evaluate_shape and (with NumPy) evaluate_batch per position,
+  reported as operations per second.
+- Macro: beta_go with each preset on a fixed corpus of opening, middlegame
+  and endgame positions (CORPUS), reported as p50/p99 move latency; the search engine
+  also reports nodes per second.
+
+Results are written as JSON. With --compare, the run is checked against a
+stored baseline and any metric that got worse by more than --tolerance is
+reported as a regression (exit status 1).
+
+Usage:
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import mcts
+from game_logic import Board
+from ai_logic import PRESETS, beta_go, evaluate_shape, scan_board, sort_shape
+from search import search_move, shared_table
+
+DIFFICULTIES = tuple(PRESETS)
+MICRO_ROUNDS = 5
+# Copies of the middlegame position in the evaluate_batch micro-benchmark.
+BATCH_POSITIONS = 1024
+MICRO_ROUND_TIME = 0.1
+MACRO_TIME_LIMIT = 0.5
+DEFAULT_TOLERANCE = 0.10
+# Latencies below this are timer noise and are not compared.
+LATENCY_FLOOR_MS = 1.0
+
+
+# Fixed positions from medium-vs-medium games, black to move, with no forced
+# VCF for either side: {phase: [space-separated x,y moves, black first]}.
+CORPUS = {
+    'opening': [
+        '7,7 6,8 8,6 9,5 7,6 6,6',
+        '7,7 9,6 9,7 8,7 10,5 7,8',
+        '7,7 6,9 7,6 7,5 7,8 7,9',
+        '7,7 8,6 5,9 6,8 4,8 3,7',
+    ],
+    'middlegame': [
+        '7,7 6,8 8,6 9,5 7,6 6,6 7,5 7,4 7,8 7,9 5,7 6,7 6,9 6,5 6,4 5,3 9,7 10,8 8,7 9,6',
+        '7,7 9,6 9,7 8,7 10,5 7,8 6,9 6,8 8,8 10,6 8,6 6,6 10,8 11,9 7,5 6,4 6,5 8,5 7,4 7,6',
+        '7,7 6,9 7,6 7,5 7,8 7,9 5,9 6,8 6,10 5,7 4,6 8,10 9,11 4,8 6,6 5,6 5,5 8,8 4,4 3,3',
+        '7,7 8,6 5,9 6,8 4,8 3,7 6,10 7,11 4,9 3,9 4,10 4,11 4,7 4,6 5,10 3,10 3,8 6,11 5,11 5,8',
+    ],
+    'endgame': [
+        '7,7 9,6 9,7 8,7 10,5 7,8 6,9 6,8 8,8 10,6 8,6 6,6 10,8 11,9 7,5 6,4 6,5 8,5 7,4 7,6 '
+        '6,7 5,6 4,6 9,9 10,9 10,10 9,11 7,9 5,7 4,7 9,8 11,8 10,7 11,10 11,11 11,7 11,6 8,9 12,5 13,4',
+        '7,7 8,6 5,9 6,8 4,8 3,7 6,10 7,11 4,9 3,9 4,10 4,11 4,7 4,6 5,10 3,10 3,8 6,11 5,11 5,8 '
+        '2,7 1,6 5,12 5,13 7,10 8,10 6,12 7,13 4,12 7,9 5,7 3,12 3,11 9,11 10,12 8,11 10,11 2,12 3,13 2,14',
+        '7,7 5,6 6,8 5,9 8,6 9,5 7,6 7,5 9,6 10,6 6,6 6,7 8,4 8,5 10,5 6,5 5,5 4,4 8,8 9,9 '
+        '8,7 7,8 4,5 8,9 9,10 11,4 7,4 6,4 7,9 8,10 7,11 6,10 9,7 10,7 9,8 10,9 10,8 11,9 12,9 11,8',
+        '7,7 9,7 9,5 8,6 7,5 7,6 9,6 8,5 8,7 7,8 6,7 5,7 10,5 11,4 9,4 9,3 11,6 12,7 8,3 7,2 '
+        '10,6 12,6 8,4 11,7 7,3 6,2 10,7 10,4 11,5 12,5 12,4 12,8 12,9 13,3 10,8 10,9 11,8 13,10 8,2 8,1',
+    ],
+}
+
+
+def position(moves):
+    """Board after a space-separated list of x,y moves, black first."""
+    board = Board()
+    color = 1
+    for move in moves.split():
+        x, y = (int(v) for v in move.split(','))
+        board.place(x, y, color)
+        color = -color
+    return board
+
+
+def corpus():
+    """{phase: [Board, ...]} for every phase in CORPUS."""
+    return {phase: [position(moves) for moves in games] for phase, games in CORPUS.items()}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _rate(run, rounds=MICRO_ROUNDS, round_time=MICRO_ROUND_TIME):
+    """
+    Call run() (which returns how many operations it did) repeatedly for
+    `rounds` rounds of about `round_time` seconds and report the best round.
+    """
+    best = 0.0
+    for _ in range(rounds):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            ops += run()
+            elapsed = time.perf_counter() - start
+            if elapsed >= round_time:
+                break
+        best = max(best, ops / elapsed)
+    return {'ops_per_sec': best, 'ns_per_op': 1e9 / best}
+
+
+def micro_benchmarks(positions):
+    board = positions['middlegame'][0]
+    size = board.size
+    empty = [(x, y) for x in range(size) for y in range(size) if board.is_empty(x, y)]
+    near = sorted(board.candidate_moves())
+    stones = [(x, y) for x in range(size) for y in range(size) if not board.is_empty(x, y)]
+
+    def place_remove():
+        for x, y in near:
+            board.place(x, y, 1)
+            board.remove(x, y)
+        return len(near)
+
+    def check_win():
+        for x, y in empty:
+            board.check_win(x, y, 1)
+            board.check_win(x, y, -1)
+        return 2 * len(empty)
+
+    def win_line():
+        for x, y in stones:
+            board.win_line(x, y)
+        return len(stones)
+
+    def scan():
+        scan_board(board.grid, 1)
+        return 1
+
+    shape = sort_shape(scan_board(board.grid, 1))
+
+    def evaluate():
+        evaluate_shape(shape)
+        return 1
+
+    results = {
+        'Board.place+remove': _rate(place_remove),
+        'Board.check_win': _rate(check_win),
+        'Board.win_line': _rate(win_line),
+        'scan_board': _rate(scan),
+        'evaluate_shape': _rate(evaluate),
+    }
+    try:
+        from batch_eval import evaluate_batch, stack_boards
+    except ImportError:
+        return results
+    batch = stack_boards([board] * BATCH_POSITIONS)
+
+    def evaluate_many():
+        evaluate_batch(batch)
+        return len(batch)
+
+    results['evaluate_batch'] = _rate(evaluate_many)
+    return results
+
+
+def macro_benchmarks(positions, repeat=3, time_limit=MACRO_TIME_LIMIT):
+    results = {}
+    for difficulty in DIFFICULTIES:
+        for phase, boards in positions.items():
+            latencies = []
+            for board in boards:
+                for _ in range(repeat):
+                    # Every run starts cold: no search table or MCTS tree left by the last one
+                    shared_table().clear()
+                    mcts._engine = None
+                    position = board.copy()
+                    start = time.perf_counter()
+                    beta_go(position, None, None, 1, difficulty, time_limit=time_limit, use_book=False)
+                    latencies.append(1000 * (time.perf_counter() - start))
+            results[f'{difficulty}/{phase}'] = {
+                'p50_ms': percentile(latencies, 50),
+                'p99_ms': percentile(latencies, 99),
+                'mean_ms': sum(latencies) / len(latencies),
+            }
+    for phase, boards in positions.items():
+        nodes = elapsed = 0
+        for board in boards:
+            shared_table().clear()
+            result = search_move(board.copy(), 1, time_limit=time_limit)
+            nodes += result.nodes
+            elapsed += result.elapsed
+        results[f'search/{phase}'] = {'nodes_per_sec': nodes / elapsed if elapsed else 0.0}
+    return results
+
+
+def run(repeat=3, time_limit=MACRO_TIME_LIMIT, micro=True, macro=True):
+    positions = corpus()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time_limit': time_limit,
+        'micro': micro_benchmarks(positions) if micro else {},
+        'macro': macro_benchmarks(positions, repeat, time_limit) if macro else {},
+    }
+    return report
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return a list of regression messages: throughput that fell, or latency
+    that rose, by more than `tolerance` relative to the baseline.
+    """
+    regressions = []
+    for section in ('micro', 'macro'):
+        for name, metrics in report.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            for metric, value in metrics.items():
+                before = old.get(metric)
+                if not before:
+                    continue
+                if metric in ('ops_per_sec', 'nodes_per_sec'):
+                    change = value / before - 1
+                    worse = change < -tolerance
+                elif metric.endswith('_ms'):
+                    if max(value, before) < LATENCY_FLOOR_MS:
+                        continue
+                    change = value / before - 1
+                    worse = change > tolerance
+                else:
+                    continue
+                if worse:
+                    regressions.append(f'{section} {name} {metric}: {before:.4g} -> {value:.4g} ({change:+.1%})')
+    return regressions
+
+
+def format_report(report):
+    lines = ['Micro-benchmarks:']
+    for name, metrics in report['micro'].items():
+        lines.append(f"  {name:<22} {metrics['ops_per_sec']:>14,.0f} ops/s {metrics['ns_per_op']:>12,.0f} ns/op")
+    lines.append(f"Macro-benchmarks (time limit {report['time_limit']} s):")
+    for name, metrics in report['macro'].items():
+        if 'nodes_per_sec' in metrics:
+            lines.append(f"  {name:<22} {metrics['nodes_per_sec']:>14,.0f} nodes/s")
+        else:
+            lines.append(f"  {name:<22} p50 {metrics['p50_ms']:>9.2f} ms  p99 {metrics['p99_ms']:>9.2f} ms")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Gomoku board and engines.')
+    parser.add_argument('--output', '-o', help='write the results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against a stored JSON result')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown before flagging (default 0.10)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed beta_go calls per position')
+    parser.add_argument('--time', type=float, default=MACRO_TIME_LIMIT, help='time limit per searched move')
+    parser.add_argument('--micro-only', action='store_true')
+    parser.add_argument('--macro-only', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat, args.time, micro=not args.macro_only, macro=not args.micro_only)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) against {args.compare}:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print(f'\nNo regressions against {args.compare}.')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 @echo off
 echo Building Gomoku Game executable...
-pyinstaller --onefile --windowed --name=GomokuGame --add-data="GUI_Pic;GUI_Pic" gomoku.py
+pyinstaller --onefile --windowed --noupx --exclude-module=tkinter --name=GomokuGame --add-data="GUI_Pic;GUI_Pic" --add-data="opening_book.bin;." gomoku.py
 echo.
 echo Build complete! The executable is located at:
 echo %cd%\dist\GomokuGame.exe
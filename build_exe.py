@@ -1,21 +1,29 @@
 # Build script for creating Gomoku Game executable
 # Run this script to create a standalone .exe file
 
+import argparse
 import os
 import subprocess
 import sys
 
-def build_exe():
-    """Build the Gomoku Game executable using PyInstaller."""
+def build_exe(onedir=False):
+    """
+    Build the Gomoku Game executable using PyInstaller. A one-file build
+    unpacks itself to a temporary directory on every launch; `onedir` builds
+    a folder instead, which starts faster but has to be shipped whole.
+    """
     print("Building Gomoku Game executable...")
     
     # PyInstaller command with options
     cmd = [
         "pyinstaller",
-        "--onefile",           # Create a single executable file
+        "--onedir" if onedir else "--onefile",  # A folder, or a single executable file
         "--windowed",          # Hide console window (for GUI apps)
+        "--noupx",             # UPX-compressed binaries are decompressed on every start
+        "--exclude-module=tkinter",  # Unused; less to unpack
         "--name=GomokuGame",   # Name of the executable
         "--add-data=GUI_Pic;GUI_Pic",  # Include GUI_Pic folder
+        "--add-data=opening_book.bin;.",  # Include the opening book
         "--icon=GUI_Pic/black.png",    # Use black.png as icon (optional)
         "gomoku.py"            # Main Python file
     ]
@@ -24,9 +32,10 @@ def build_exe():
         # Run PyInstaller
         result = subprocess.run(cmd, check=True, capture_output=True, text=True)
         print("Build successful!")
-        print(f"Executable created in: dist/GomokuGame.exe")
+        exe = "dist/GomokuGame/GomokuGame.exe" if onedir else "dist/GomokuGame.exe"
+        print(f"Executable created in: {exe}")
         print("\nYou can find your standalone executable at:")
-        print(os.path.abspath("dist/GomokuGame.exe"))
+        print(os.path.abspath(exe))
         
     except subprocess.CalledProcessError as e:
         print(f"Build failed with error: {e}")
@@ -36,4 +45,6 @@ def build_exe():
     return True
 
 if __name__ == "__main__":
-    build_exe()
+    parser = argparse.ArgumentParser(description="Build the Gomoku Game executable.")
+    parser.add_argument("--onedir", action="store_true", help="build a folder instead of a single file")
+    build_exe(parser.parse_args().onedir)
@@ -0,0 +1,160 @@
+"""
+Instrumentation for the AI: what each move decision did and what it cost.
+
+Given a `stats` recorder, beta_go describes every move it chooses with a
+MoveStats: where the move came from (the opening book, the threat solver,
+the search, ...), the nodes searched and depth reached, the transposition
+table hit rate, the cutoff rate, the evaluation calls and the wall time.
+
+A StatsRecorder keeps the last MoveStats and a rolling window of move
+latencies for a histogram, calls any registered callbacks with each new
+MoveStats, and can append every record to a JSON-lines log for later
+analysis:
+    recorder = StatsRecorder(log_path='moves.jsonl')
+    recorder.add_callback(print)
+    beta_go(board, m, n, color, 'hard', stats=recorder)
+"""
+import json
+import threading
+import time
+from collections import deque
+
+LATENCY_WINDOW = 200
+# Upper edges of the latency histogram buckets in milliseconds; the last
+# bucket takes everything slower.
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class MoveStats:
+    """
+    The work behind one move. `source` says which part of the AI chose it:
+    'centre', 'book', 'forced', 'threats', 'proof', 'search', 'parallel',
+    'mcts', 'evaluation' or 'random'. Search counters stay 0 for moves that
+    needed no search; `proof_nodes` counts the proof-number search of sharp
+    positions. `target` and `limit` are the move's time budget in seconds
+    (see scheduler.py), and `clock` the time left on the game clock after
+    it, if there is one. `difficulty` is the name of the preset.
+    """
+    def __init__(self, difficulty=None, color=None):
+        self.difficulty = difficulty
+        self.color = color
+        self.move = None
+        self.source = None
+        self.score = None
+        self.nodes = 0
+        self.depth = 0
+        self.evaluations = 0
+        self.expanded = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.threat_nodes = 0
+        self.proof_nodes = 0
+        self.elapsed = 0.0
+        self.target = None
+        self.limit = None
+        self.clock = None
+        self.timestamp = time.time()
+
+    @property
+    def tt_hit_rate(self):
+        """Fraction of transposition-table probes that found an entry."""
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def cutoff_rate(self):
+        """Fraction of expanded search nodes that ended in a beta cutoff."""
+        return self.cutoffs / self.expanded if self.expanded else 0.0
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def add_search(self, result):
+        """Take the depth, score, nodes and counters of a SearchResult."""
+        self.score = result.score
+        self.nodes = result.nodes
+        self.depth = result.depth
+        for name, value in result.counters.items():
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'difficulty': self.difficulty,
+            'color': self.color,
+            'move': list(self.move) if self.move is not None else None,
+            'source': self.source,
+            'score': self.score,
+            'elapsed_ms': 1000 * self.elapsed,
+            'nodes': self.nodes,
+            'nodes_per_sec': self.nodes_per_sec,
+            'depth': self.depth,
+            'evaluations': self.evaluations,
+            'tt_hit_rate': self.tt_hit_rate,
+            'cutoff_rate': self.cutoff_rate,
+            'threat_nodes': self.threat_nodes,
+            'proof_nodes': self.proof_nodes,
+            'target_ms': 1000 * self.target if self.target is not None else None,
+            'limit_ms': 1000 * self.limit if self.limit is not None else None,
+            'clock': self.clock,
+        }
+
+    def __repr__(self):
+        return (f'MoveStats(move={self.move}, source={self.source}, elapsed={self.elapsed:.3f}, '
+                f'nodes={self.nodes}, depth={self.depth})')
+
+
+class StatsRecorder:
+    """
+    Collects MoveStats. `log_path` appends each record as one JSON line;
+    `tags` are extra fields written into every line (e.g. an engine name).
+    record() may be called from a search thread.
+    """
+    def __init__(self, log_path=None, window=LATENCY_WINDOW, tags=None):
+        self.log_path = log_path
+        self.tags = tags or {}
+        self.last = None
+        self.moves = 0
+        self.latencies = deque(maxlen=window)
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """Call callback(move_stats) for every move recorded from now on."""
+        self.callbacks.append(callback)
+
+    def record(self, stats):
+        with self._lock:
+            self.last = stats
+            self.moves += 1
+            self.latencies.append(stats.elapsed)
+            if self.log_path:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps({**self.tags, **stats.as_dict()}) + '\n')
+        for callback in self.callbacks:
+            callback(stats)
+
+    def histogram(self, buckets=LATENCY_BUCKETS_MS):
+        """
+        Counts of the recent latencies per bucket, as a list of (upper edge
+        in ms, count); the last entry, with edge None, counts the rest.
+        """
+        counts = [0] * (len(buckets) + 1)
+        for latency in list(self.latencies):
+            ms = 1000 * latency
+            for i, edge in enumerate(buckets):
+                if ms <= edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return list(zip(list(buckets) + [None], counts))
+
+    def percentile(self, pct):
+        """Nearest-rank percentile of the recent latencies in seconds (0 if none)."""
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[rank]
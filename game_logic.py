@@ -1,56 +1,451 @@
 """
 Game logic for Gomoku: board management, win detection, move validation.
+
+The board size is chosen per Board (15x15 by default, 19x19 also offered).
+Cells live in one contiguous ``array('b')`` and cell (x, y) is index
+``x * size + y``. The position is also stored as one integer bitmask per
+color, using the same index as bit number. Every five-in-a-row window on the
+board is precomputed as a bitmask, so placing a stone, testing a cell and
+detecting a win are a handful of integer operations.
+
+Tables that depend only on the size (window masks, neighbourhoods, Zobrist
+keys) are built once per size by `geometry(size)` and shared by every Board
+of that size.
+
+Each position also carries a 64-bit Zobrist hash that is updated with one XOR
+per stone placed or removed, and the set of candidate moves: the empty cells
+near at least one stone.
+
+push() and pop() make and unmake moves on a move stack. Both touch only the
+move's own neighbourhood (and the observers' tables around it), so a search
+walks the tree on one Board instead of copying it at every node.
+
+Every stone also knows the run of same-colored stones it belongs to in each
+of the four directions: how many lie directly before it and how many after.
+A move updates only the runs along the four lines through it, so win
+detection, the winning line and the longest line through a cell are lookups,
+and the evaluator reads the same tables.
 """
+import random
+from array import array
 
 BOARD_SIZE = 15
+BOARD_SIZES = (15, 19)
+MAX_BOARD_SIZE = 25
+WIN_LENGTH = 5
+CANDIDATE_RADIUS = 2
+
+DIRECTIONS = [(1,0), (0,1), (1,1), (1,-1)]
+
+# Zobrist keys are drawn from a generator seeded with this value plus
+# (size - BOARD_SIZE), so hashes are stable across runs and can be stored on
+# disk, and the 15x15 keys are the ones the opening book was built with.
+ZOBRIST_SEED = 0x60D0C0
+
+
+class Geometry:
+    """
+    Tables for one board size, shared by all Boards of that size.
+
+    ``zobrist[color][idx]`` are the Zobrist keys, ``white_to_move`` is XORed
+    in by searches to tell apart the same stones with white to move, and
+    ``adjacent_masks[idx]`` is the bitmask of the (up to) 8 cells touching idx.
+
+    ``steps[d]`` is the index offset of one step along DIRECTIONS[d], and
+    ``following[d][idx]`` / ``preceding[d][idx]`` the index of the next and
+    previous cell on that line, or -1 past the edge of the board.
+    """
+    def __init__(self, size):
+        if not WIN_LENGTH <= size <= MAX_BOARD_SIZE:
+            raise ValueError(f'board size must be between {WIN_LENGTH} and {MAX_BOARD_SIZE}, got {size}')
+        self.size = size
+        self.cells = size * size
+        rng = random.Random(ZOBRIST_SEED + size - BOARD_SIZE)
+        self.zobrist = {color: [rng.getrandbits(64) for _ in range(self.cells)] for color in (1, -1)}
+        self.white_to_move = rng.getrandbits(64)
+        self._line_windows = {}
+        self._windows = {}
+        self._neighbours = {}
+        self.adjacent_masks = self._neighbour_masks(1)
+        self.steps = [dx * size + dy for dx, dy in DIRECTIONS]
+        self.following = [self._line_neighbours(dx, dy) for dx, dy in DIRECTIONS]
+        self.preceding = [self._line_neighbours(-dx, -dy) for dx, dy in DIRECTIONS]
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def windows(self, length):
+        """All straight `length`-cell windows as lists of cell indices (cached)."""
+        windows = self._windows.get(length)
+        if windows is None:
+            size = self.size
+            windows = []
+            for dx, dy in DIRECTIONS:
+                for x in range(size):
+                    for y in range(size):
+                        if self.in_bounds(x + dx * (length - 1), y + dy * (length - 1)):
+                            windows.append([(x + dx * step) * size + y + dy * step for step in range(length)])
+            self._windows[length] = windows
+        return windows
+
+    def line_windows(self, length):
+        """
+        For every cell, the bitmasks of all `length`-long straight windows that
+        pass through it, indexed by x * size + y (cached).
+        """
+        masks = self._line_windows.get(length)
+        if masks is None:
+            masks = [[] for _ in range(self.cells)]
+            for cells in self.windows(length):
+                mask = 0
+                for idx in cells:
+                    mask |= 1 << idx
+                for idx in cells:
+                    masks[idx].append(mask)
+            self._line_windows[length] = masks
+        return masks
+
+    def neighbourhood(self, radius):
+        """For every cell, the indices of the other cells within `radius` (Chebyshev), cached."""
+        neighbours = self._neighbours.get(radius)
+        if neighbours is None:
+            size = self.size
+            neighbours = []
+            for x in range(size):
+                for y in range(size):
+                    neighbours.append([nx * size + ny
+                                       for nx in range(max(0, x - radius), min(size, x + radius + 1))
+                                       for ny in range(max(0, y - radius), min(size, y + radius + 1))
+                                       if (nx, ny) != (x, y)])
+            self._neighbours[radius] = neighbours
+        return neighbours
+
+    def _line_neighbours(self, dx, dy):
+        size = self.size
+        return [(x + dx) * size + y + dy if self.in_bounds(x + dx, y + dy) else -1
+                for x in range(size) for y in range(size)]
+
+    def _neighbour_masks(self, radius):
+        masks = []
+        for cells in self.neighbourhood(radius):
+            mask = 0
+            for idx in cells:
+                mask |= 1 << idx
+            masks.append(mask)
+        return masks
+
+
+_GEOMETRIES = {}
+
+
+def geometry(size=BOARD_SIZE):
+    """Return the (cached) Geometry for a board size."""
+    geo = _GEOMETRIES.get(size)
+    if geo is None:
+        geo = _GEOMETRIES[size] = Geometry(size)
+    return geo
+
+
+# Tables of the default 15x15 board.
+_DEFAULT = geometry(BOARD_SIZE)
+ZOBRIST = _DEFAULT.zobrist
+ZOBRIST_WHITE_TO_MOVE = _DEFAULT.white_to_move
+WIN_MASKS = _DEFAULT.line_windows(WIN_LENGTH)
+ADJACENT_MASKS = _DEFAULT.adjacent_masks
+
+
+def line_windows(length):
+    """Return the (cached) per-cell window masks of the 15x15 board for a run length."""
+    return _DEFAULT.line_windows(length)
+
+
+def neighbourhood(radius):
+    """Return the (cached) per-cell neighbour index lists of the 15x15 board for a radius."""
+    return _DEFAULT.neighbourhood(radius)
+
+
+class _GridRow:
+    """Read-only view of one board row, indexed by y."""
+    __slots__ = ('_cells', '_base', '_size')
+
+    def __init__(self, cells, base, size):
+        self._cells = cells
+        self._base = base
+        self._size = size
+
+    def __getitem__(self, y):
+        if not 0 <= y < self._size:
+            raise IndexError(y)
+        return self._cells[self._base + y]
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self._cells[self._base:self._base + self._size])
+
+    def __repr__(self):
+        return repr(list(self))
+
 
 class Board:
     """
     Represents the Gomoku board and provides methods for placing pieces,
     checking for empty cells, and win detection.
+
+    ``size`` is the side length and ``geometry`` its shared tables.
+    ``cells`` is the contiguous ``array('b')`` of 0/1/-1 values indexed by
+    ``x * size + y``. ``bits[color]`` holds the stones of each color as a
+    bitmask, ``occupied`` is their union and ``hash`` is the Zobrist hash of
+    the stones. ``grid`` is a read-only view supporting ``grid[x][y]`` for
+    code that expects the old list-of-lists layout.
+
+    ``candidates`` is the set of empty cell indices within `candidate_radius`
+    of any stone. ``near[idx]`` counts the stones around each cell, so a move
+    only adjusts the counts of its own neighbourhood.
+
+    ``history`` is the move stack of push()/pop() as (x, y, color) tuples;
+    stones set with place() and remove() do not go on it.
+
+    ``run_before[d][idx]`` and ``run_after[d][idx]`` count the stones of the
+    same color directly before and after the stone at idx along DIRECTIONS[d]
+    (see Geometry.preceding/following); both are 0 for an empty cell.
     """
-    def __init__(self):
-        """Initialize an empty BOARD_SIZE x BOARD_SIZE grid."""
-        self.grid = [[0 for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+    def __init__(self, size=BOARD_SIZE, candidate_radius=CANDIDATE_RADIUS):
+        """Initialize an empty size x size board."""
+        self.candidate_radius = candidate_radius
+        self._allocate(size)
+        self.observers = []
+
+    def _allocate(self, size):
+        self.size = size
+        self.geometry = geometry(size)
+        self._neighbours = self.geometry.neighbourhood(self.candidate_radius)
+
+        self.near = array('b', bytes(self.geometry.cells))
+        self.candidates = set()
+        self.cells = array('b', bytes(self.geometry.cells))
+        self.run_before = [array('b', bytes(self.geometry.cells)) for _ in DIRECTIONS]
+        self.run_after = [array('b', bytes(self.geometry.cells)) for _ in DIRECTIONS]
+        self.grid = tuple(_GridRow(self.cells, x * size, size) for x in range(size))
+        self.bits = {1: 0, -1: 0}
+        self.occupied = 0
+        self.hash = 0
+        self.history = []
+
+    def copy(self):
+        """Return an independent Board with the same stones and no observers."""
+        board = Board(self.size, self.candidate_radius)
+        board.cells[:] = self.cells
+        board.near[:] = self.near
+        board.candidates = set(self.candidates)
+        for d in range(len(DIRECTIONS)):
+            board.run_before[d][:] = self.run_before[d]
+            board.run_after[d][:] = self.run_after[d]
+        board.bits = dict(self.bits)
+        board.occupied = self.occupied
+        board.hash = self.hash
+        board.history = list(self.history)
+        return board
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Build a Board holding the same stones as a (square) grid[x][y] of 0/1/-1."""
+        board = cls(len(grid))
+        for x, row in enumerate(grid):
+            for y, color in enumerate(row):
+                if color:
+                    board.place(x, y, color)
+        return board
+
+    def add_observer(self, observer):
+        """
+        Register an object to be told about board changes. Observers implement
+        stone_placed(x, y, color), stone_removed(x, y, color) and board_reset().
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        """Stop notifying a previously registered observer."""
+        self.observers.remove(observer)
+
+    def reset(self, size=None):
+        """Remove every stone from the board, switching to a new size if given."""
+        if size is not None and size != self.size:
+            self._allocate(size)
+        else:
+            cells = self.geometry.cells
+            self.cells[:] = array('b', bytes(cells))
+            self.near = array('b', bytes(cells))
+            self.run_before = [array('b', bytes(cells)) for _ in DIRECTIONS]
+            self.run_after = [array('b', bytes(cells)) for _ in DIRECTIONS]
+            self.candidates.clear()
+            self.bits = {1: 0, -1: 0}
+            self.occupied = 0
+            self.hash = 0
+            self.history.clear()
+        for observer in self.observers:
+            observer.board_reset()
+
+    def in_bounds(self, x, y):
+        """Return True if (x, y) is on the board."""
+        return 0 <= x < self.size and 0 <= y < self.size
 
     def place(self, x, y, color):
         """
         Place a piece of the given color at (x, y).
         Returns True if successful, False if invalid move.
         """
-        if x < 0 or x >= BOARD_SIZE or y < 0 or y >= BOARD_SIZE:
+        size = self.size
+        if x < 0 or x >= size or y < 0 or y >= size:
             return False
-        if self.grid[x][y] != 0:
+        idx = x * size + y
+        bit = 1 << idx
+        if self.occupied & bit:
             return False
-        self.grid[x][y] = color
+        self.occupied |= bit
+        self.bits[color] |= bit
+        self.hash ^= self.geometry.zobrist[color][idx]
+        self.cells[idx] = color
+        near, cells, candidates = self.near, self.cells, self.candidates
+        for n in self._neighbours[idx]:
+            near[n] += 1
+            if not cells[n]:
+                candidates.add(n)
+        candidates.discard(idx)
+        self._join_runs(idx, color)
+        for observer in self.observers:
+            observer.stone_placed(x, y, color)
         return True
 
+    def remove(self, x, y):
+        """
+        Take the stone at (x, y) off the board.
+        Returns the color that was removed, or 0 if the cell was empty.
+        """
+        idx = x * self.size + y
+        color = self.cells[idx]
+        if color == 0:
+            return 0
+        bit = 1 << idx
+        self.occupied &= ~bit
+        self.bits[color] &= ~bit
+        self.hash ^= self.geometry.zobrist[color][idx]
+        self.cells[idx] = 0
+        near, candidates = self.near, self.candidates
+        for n in self._neighbours[idx]:
+            near[n] -= 1
+            if not near[n]:
+                candidates.discard(n)
+        if near[idx]:
+            candidates.add(idx)
+        self._split_runs(idx)
+        for observer in self.observers:
+            observer.stone_removed(x, y, color)
+        return color
+
+    def _join_runs(self, idx, color):
+        """Merge the new stone at idx with the runs of its color on either side, in every direction."""
+        cells, geo = self.cells, self.geometry
+        for d in range(4):
+            before, after, step = self.run_before[d], self.run_after[d], geo.steps[d]
+            p, n = geo.preceding[d][idx], geo.following[d][idx]
+            left = before[p] + 1 if p >= 0 and cells[p] == color else 0
+            right = after[n] + 1 if n >= 0 and cells[n] == color else 0
+            before[idx] = left
+            after[idx] = right
+            for i in range(idx - left * step, idx, step):
+                after[i] += right + 1
+            for i in range(idx + step, idx + (right + 1) * step, step):
+                before[i] += left + 1
+
+    def _split_runs(self, idx):
+        """Cut the runs through the stone just removed from idx in two, in every direction."""
+        steps = self.geometry.steps
+        for d in range(4):
+            before, after, step = self.run_before[d], self.run_after[d], steps[d]
+            left, right = before[idx], after[idx]
+            before[idx] = after[idx] = 0
+            for i in range(idx - left * step, idx, step):
+                after[i] -= right + 1
+            for i in range(idx + step, idx + (right + 1) * step, step):
+                before[i] -= left + 1
+
+    def push(self, x, y, color):
+        """
+        Play a move and put it on the move stack.
+        Returns True if successful, False if invalid move.
+        """
+        if not self.place(x, y, color):
+            return False
+        self.history.append((x, y, color))
+        return True
+
+    def pop(self):
+        """Take back the last pushed move and return it as (x, y, color)."""
+        x, y, color = self.history.pop()
+        self.remove(x, y)
+        return x, y, color
+
+    def candidate_moves(self, radius=None):
+        """
+        Yield the candidate moves as (x, y). With radius=1 only cells touching
+        a stone are yielded (radius may not exceed candidate_radius).
+        """
+        size = self.size
+        if radius == 1:
+            occupied = self.occupied
+            adjacent = self.geometry.adjacent_masks
+            for idx in self.candidates:
+                if occupied & adjacent[idx]:
+                    yield divmod(idx, size)
+        else:
+            for idx in self.candidates:
+                yield divmod(idx, size)
+
     def is_empty(self, x, y):
         """Return True if cell (x, y) is empty."""
-        return self.grid[x][y] == 0
+        return not (self.occupied >> (x * self.size + y)) & 1
 
-    def check_win(self, x, y, color, length=5):
+    def line_length(self, x, y, color, direction):
+        """
+        Length of color's line through (x, y) along DIRECTIONS[direction],
+        counting (x, y) as color's stone whether or not it is on the board.
+        """
+        idx = x * self.size + y
+        if self.cells[idx] == color:
+            return self.run_before[direction][idx] + self.run_after[direction][idx] + 1
+        cells, geo = self.cells, self.geometry
+        p, n = geo.preceding[direction][idx], geo.following[direction][idx]
+        left = self.run_before[direction][p] + 1 if p >= 0 and cells[p] == color else 0
+        right = self.run_after[direction][n] + 1 if n >= 0 and cells[n] == color else 0
+        return left + right + 1
+
+    def longest_line(self, x, y, color):
+        """Length of color's longest line through (x, y) in any direction, as line_length()."""
+        return max(self.line_length(x, y, color, d) for d in range(4))
+
+    def check_win(self, x, y, color, length=WIN_LENGTH):
         """
         Check if placing at (x, y) wins the game for color.
         Returns True if there are 'length' consecutive pieces of the same color.
         """
-        directions = [(1,0), (0,1), (1,1), (1,-1)]
-        for dx, dy in directions:
-            count = 1
-            # Check in the positive direction
-            for step in range(1, length):
-                nx, ny = x + dx*step, y + dy*step
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.grid[nx][ny] == color:
-                    count += 1
-                else:
-                    break
-            # Check in the negative direction
-            for step in range(1, length):
-                nx, ny = x - dx*step, y - dy*step
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.grid[nx][ny] == color:
-                    count += 1
-                else:
-                    break
-            if count >= length:
+        for d in range(4):
+            if self.line_length(x, y, color, d) >= length:
                 return True
         return False
+
+    def win_line(self, x, y, length=WIN_LENGTH):
+        """
+        The cells of the line of at least `length` stones through the stone at
+        (x, y), as (x, y) tuples from one end to the other, or None.
+        """
+        idx = x * self.size + y
+        if not self.cells[idx]:
+            return None
+        for d in range(4):
+            left, right = self.run_before[d][idx], self.run_after[d][idx]
+            if left + right + 1 >= length:
+                step = self.geometry.steps[d]
+                return [divmod(i, self.size) for i in range(idx - left * step, idx + (right + 1) * step, step)]
+        return None
@@ -0,0 +1,247 @@
+"""
+Game records: a compact binary file of finished games, and text exports.
+
+A record file is a header followed by the games, one after another:
+
+    header  b'GMKR', version (u16)
+    game    board size (u8), result (i8), move count (u16), moves
+
+Each move is its cell index x * size + y, stored in one byte on boards of up
+to 16x16 and in two (u16) on larger ones. The result is 1 or -1 for a black
+or white win, 0 for a draw and 2 for a game that was abandoned. All integers
+are little-endian. A 15x15 game of 60 moves takes 64 bytes.
+
+Games are appended to the end of the file, so any number of them can be
+collected into one file, and read_records() yields them one at a time
+without reading the rest of the file.
+
+Games can also be written as PSQ text (the Piskvork format, one game per
+file) or as the one-game-per-line x,y format that opening_book.py reads:
+    python game_record.py games.gmr
+    python game_record.py games.gmr --psq psq_dir --text games.txt
+"""
+import argparse
+import os
+import struct
+
+from game_logic import BOARD_SIZE, MAX_BOARD_SIZE, WIN_LENGTH, Board
+
+MAGIC = b'GMKR'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+GAME = struct.Struct('<BbH')
+UNFINISHED = 2
+MAX_MOVES = 0xFFFF
+DEFAULT_RECORDS = 'games.gmr'
+
+
+class RecordError(Exception):
+    """Raised for a corrupt or incompatible record file, or a game that cannot be stored."""
+
+
+def _move_width(size):
+    """Bytes per move on a size x size board."""
+    return 1 if size * size <= 256 else 2
+
+
+class GameRecord:
+    """
+    One game: the board size, the (x, y) moves with black first and the
+    winner (1, -1, 0 for a draw, or None if the game was not finished).
+    """
+    def __init__(self, moves, winner=None, size=BOARD_SIZE):
+        self.moves = moves
+        self.winner = winner
+        self.size = size
+
+    def __repr__(self):
+        return f'GameRecord(size={self.size}, moves={len(self.moves)}, winner={self.winner})'
+
+    def board(self):
+        """A Board holding the final position."""
+        board = Board(self.size)
+        color = 1
+        for x, y in self.moves:
+            board.place(x, y, color)
+            color = -color
+        return board
+
+
+def game_result(moves, size=BOARD_SIZE):
+    """
+    Replay (x, y) moves and return the winner: the side that made five, 0 if
+    the board filled up without one, None if the game is not over.
+    """
+    board = Board(size)
+    color = 1
+    for x, y in moves:
+        if not board.place(x, y, color):
+            raise ValueError(f'illegal move {(x, y)} in game')
+        if board.check_win(x, y, color):
+            return color
+        color = -color
+    return 0 if len(moves) == size * size else None
+
+
+def encode_game(moves, winner=None, size=BOARD_SIZE):
+    """The bytes of one game as stored in a record file."""
+    if len(moves) > MAX_MOVES:
+        raise RecordError(f'a game of {len(moves)} moves is too long to record')
+    if winner not in (1, -1, 0, None):
+        raise RecordError(f'invalid winner {winner!r}')
+    cells = []
+    for x, y in moves:
+        if not (0 <= x < size and 0 <= y < size):
+            raise RecordError(f'move {(x, y)} is off a {size}x{size} board')
+        cells.append(x * size + y)
+    result = UNFINISHED if winner is None else winner
+    packed = bytes(cells) if _move_width(size) == 1 else struct.pack(f'<{len(cells)}H', *cells)
+    return GAME.pack(size, result, len(cells)) + packed
+
+
+class GameWriter:
+    """
+    Appends games to a record file, creating it if needed. Use as a context
+    manager or call close(); writes are buffered until then or flush().
+    """
+    def __init__(self, path=DEFAULT_RECORDS):
+        self.path = path
+        self._file = open(path, 'ab')
+        try:
+            if self._file.tell() == 0:
+                self._file.write(HEADER.pack(MAGIC, VERSION))
+            else:
+                with open(path, 'rb') as f:
+                    _check_header(f, path)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, moves, winner=None, size=BOARD_SIZE):
+        """Append a game given as (x, y) moves, black first."""
+        self._file.write(encode_game(moves, winner, size))
+
+    def write_record(self, record):
+        self.write(record.moves, record.winner, record.size)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _check_header(f, path):
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise RecordError(f'{path} is not a game record file')
+    magic, version = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise RecordError(f'{path} is not a version {VERSION} game record file')
+
+
+def read_records(path=DEFAULT_RECORDS):
+    """Yield the games of a record file as GameRecords, reading one game at a time."""
+    with open(path, 'rb') as f:
+        _check_header(f, path)
+        while True:
+            head = f.read(GAME.size)
+            if not head:
+                return
+            if len(head) < GAME.size:
+                raise RecordError(f'{path} ends in the middle of a game')
+            size, result, count = GAME.unpack(head)
+            if not WIN_LENGTH <= size <= MAX_BOARD_SIZE:
+                raise RecordError(f'{path} has a game on an unsupported {size}x{size} board')
+            if result not in (1, -1, 0, UNFINISHED):
+                raise RecordError(f'{path} has a game with an unknown result {result}')
+            width = _move_width(size)
+            data = f.read(count * width)
+            if len(data) < count * width:
+                raise RecordError(f'{path} ends in the middle of a game')
+            cells = data if width == 1 else struct.unpack(f'<{count}H', data)
+            if count and max(cells) >= size * size:
+                raise RecordError(f'{path} has a game with a move off its {size}x{size} board')
+            yield GameRecord([divmod(idx, size) for idx in cells],
+                             None if result == UNFINISHED else result, size)
+
+
+def to_psq(record):
+    """A game as PSQ text: a 'Piskvorky WxH' header and one 1-based x,y,time line per move."""
+    lines = [f'Piskvorky {record.size}x{record.size}, 11:11, 0']
+    lines.extend(f'{x + 1},{y + 1},0' for x, y in record.moves)
+    lines.append('-1')
+    return '\n'.join(lines) + '\n'
+
+
+def from_psq(text):
+    """Parse PSQ text into a GameRecord; the winner is found by replaying the moves."""
+    lines = text.splitlines()
+    try:
+        dimensions = lines[0].split()[1].rstrip(',')
+        width, height = (int(v) for v in dimensions.split('x'))
+    except (IndexError, ValueError) as e:
+        raise RecordError('not a PSQ game') from e
+    if width != height:
+        raise RecordError(f'unsupported {width}x{height} board')
+    moves = []
+    for line in lines[1:]:
+        fields = line.strip().split(',')
+        if len(fields) != 3:
+            break
+        try:
+            x, y = int(fields[0]) - 1, int(fields[1]) - 1
+        except ValueError:
+            break
+        moves.append((x, y))
+    try:
+        winner = game_result(moves, width)
+    except ValueError as e:
+        raise RecordError(str(e)) from e
+    return GameRecord(moves, winner, width)
+
+
+def to_text(record):
+    """A game as one line of space-separated x,y moves, as opening_book.read_games expects."""
+    return ' '.join(f'{x},{y}' for x, y in record.moves)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize or export a game record file.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_RECORDS)
+    parser.add_argument('--psq', metavar='DIR', help='write every game as DIR/game_NNNNNN.psq')
+    parser.add_argument('--text', metavar='FILE', help='write the games as x,y move lines')
+    args = parser.parse_args(argv)
+
+    if args.psq:
+        os.makedirs(args.psq, exist_ok=True)
+    text = open(args.text, 'w') if args.text else None
+    games = moves = 0
+    results = {1: 0, -1: 0, 0: 0, None: 0}
+    try:
+        for record in read_records(args.path):
+            games += 1
+            moves += len(record.moves)
+            results[record.winner] += 1
+            if args.psq:
+                with open(os.path.join(args.psq, f'game_{games:06d}.psq'), 'w') as f:
+                    f.write(to_psq(record))
+            if text:
+                text.write(to_text(record) + '\n')
+    except (OSError, RecordError) as e:
+        parser.error(str(e))
+    finally:
+        if text:
+            text.close()
+    print(f'{games} games, black/white/draw/unfinished {results[1]}/{results[-1]}/{results[0]}/{results[None]}, '
+          f'average length {moves / games if games else 0:.1f} moves')
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ Main entry point for Gomoku Game.
 Imports game logic, AI, and GUI modules and starts the game.
 """
 
+import multiprocessing
+
+import assets  # noqa: F401  (first, so its startup timer includes the other imports)
 from game_logic import Board
 from gui import GomokuGUI
 
@@ -12,4 +15,7 @@ def main():
     gui.run()
 
 if __name__ == "__main__":
+    # In a frozen build, lets the search's worker processes start without
+    # launching another copy of the game.
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,17 +1,115 @@
 """
 Pygame GUI for Gomoku.
 """
+import sys
+import threading
 import pygame
-from time import sleep
-from game_logic import BOARD_SIZE
-from ai_logic import beta_go
+from assets import AssetCache, Sounds, startup
+from game_logic import BOARD_SIZE, BOARD_SIZES
+from ai_logic import PRESETS, beta_go
+from engine_stats import StatsRecorder
+from game_record import GameWriter, RecordError
+from resources import resource_path
+from render import SPACING, WINDOW_SIZE, BoardRenderer, TextCache, board_layout, draw_board_background, stats_panel
 
-BG_PATH = './GUI_Pic/bg.png'
-WHITE_PATH = './GUI_Pic/white.png'
-BLACK_PATH = './GUI_Pic/black.png'
+BG_PATH = resource_path('GUI_Pic', 'bg.png')
+WHITE_PATH = resource_path('GUI_Pic', 'white.png')
+BLACK_PATH = resource_path('GUI_Pic', 'black.png')
 
 MOVE_SOUND_PATH = None  # Use Pygame beep if no file
 WIN_SOUND_PATH = None
+# Every game played is appended here; None turns recording off.
+GAME_RECORD_PATH = './games.gmr'
+# JSON-lines log of the statistics of every AI move; None turns it off.
+STATS_LOG_PATH = None
+
+FPS = 60
+# Processes for the Hard search; None uses one per core.
+AI_WORKERS = None
+MENU_HOVER_COLOR = (255, 243, 214)
+# Stone sprites are drawn this much larger than the image at the default spacing.
+STONE_SCALE = 1.5
+
+
+class AIWorker:
+    """
+    Runs beta_go on a background thread against the worker's own Board.
+    The event loop starts a search, polls for the move every frame, and can
+    cancel it; a cancelled search's move is thrown away. Moves are reported
+    to `stats` (an engine_stats.StatsRecorder), if given.
+
+    The worker's Board follows the game with push() and pop(), so the shape
+    tables the AI attaches to it stay up to date incrementally instead of
+    being rebuilt from a fresh copy for every move.
+    """
+    def __init__(self, stats=None):
+        self.stats = stats
+        self._board = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._result = None
+        self._error = None
+
+    @property
+    def busy(self):
+        """True while a search is running or its move has not been collected."""
+        return self._thread is not None
+
+    def start(self, board, m, n, color, preset, clock=None):
+        """Start searching for color's move on a copy of board, on the AI's game clock if it has one."""
+        self.cancel()
+        stop = self._stop = threading.Event()
+        snapshot = self._follow(board)
+        self._result = self._error = None
+
+        def work():
+            try:
+                move = beta_go(snapshot, m, n, color, preset, clock, stop_event=stop, workers=AI_WORKERS,
+                               stats=self.stats)
+            except Exception as error:
+                self._error = error
+            else:
+                if not stop.is_set():
+                    self._result = move
+
+        self._thread = threading.Thread(target=work, name='gomoku-ai', daemon=True)
+        self._thread.start()
+
+    def _follow(self, board):
+        """Bring the worker's Board to board's position, taking back and replaying only the moves that differ."""
+        own = self._board
+        if own is None or own.size != board.size:
+            own = self._board = board.copy()
+            return own
+        common = 0
+        for mine, theirs in zip(own.history, board.history):
+            if mine != theirs:
+                break
+            common += 1
+        while len(own.history) > common:
+            own.pop()
+        for x, y, color in board.history[common:]:
+            own.push(x, y, color)
+        return own
+
+    def poll(self):
+        """
+        Return (True, move) once the search has finished, else (False, None).
+        Errors raised by the search are re-raised here.
+        """
+        if self._thread is None or self._thread.is_alive():
+            return False, None
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+        return True, self._result
+
+    def cancel(self):
+        """Stop the running search, if any, and wait for it to exit."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
 
 class GomokuGUI:
     """
@@ -20,390 +118,429 @@ class GomokuGUI:
     def __init__(self, board):
         """
         Initialize the GUI, load images, set up the board, and sounds.
+        Only the display and fonts are started here; the mixer waits for the
+        first sound.
         """
-        pygame.init()
+        startup.mark('imports')
+        pygame.display.init()
+        pygame.font.init()
         pygame.display.set_caption("Gomoku Game")
-        self.screen = pygame.display.set_mode((750, 750), 0, 32)
-        self.background = pygame.image.load(BG_PATH).convert()
-        self.white = pygame.image.load(WHITE_PATH).convert_alpha()
-        self.black = pygame.image.load(BLACK_PATH).convert_alpha()
-        self.white = pygame.transform.smoothscale(self.white, (int(self.white.get_width() * 1.5), int(self.white.get_height() * 1.5)))
-        self.black = pygame.transform.smoothscale(self.black, (int(self.black.get_width() * 1.5), int(self.black.get_height() * 1.5)))
-        self.font = pygame.font.SysFont("Arial", 40)
+        self.screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE), 0, 32)
+        startup.mark('display')
+        self.assets = AssetCache()
+        self.background = self.assets.image(BG_PATH, alpha=False)
+        self.text = TextCache()
         self.board = board
-        self.dot_list = [(25 + i * 50 - self.white.get_width() / 2, 25 + j * 50 - self.white.get_height() / 2) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)]
+        self.board_size = board.size
+        self.first_color = 1
+        self.redo_moves = []
+        self.renderer = None
+        self.set_board_size(self.board_size)
         self.player_mode = None
         self.player_color = 1
         self.ai_difficulty = 'medium'
-        # Sound setup
-        pygame.mixer.init()
-        self.move_sound = None
-        self.win_sound = None
-        if MOVE_SOUND_PATH:
-            self.move_sound = pygame.mixer.Sound(MOVE_SOUND_PATH)
-        if WIN_SOUND_PATH:
-            self.win_sound = pygame.mixer.Sound(WIN_SOUND_PATH)
+        self.ai_clock = None
+        self.stats = StatsRecorder(STATS_LOG_PATH)
+        self.show_stats = False
+        self.worker = AIWorker(self.stats)
+        self.clock = pygame.time.Clock()
+        self.sounds = Sounds({'move': MOVE_SOUND_PATH, 'win': WIN_SOUND_PATH})
+        startup.mark(f'assets ({self.assets.hits} cached, {self.assets.misses} built)')
+
+    def set_board_size(self, size):
+        """
+        Lay the window out for a size x size board: the grid spacing, the
+        stone sprites scaled to it and, for sizes bg.png was not drawn for,
+        a plain grid background. The renderer is only rebuilt on a change.
+        """
+        if self.renderer is not None and self.renderer.size == size:
+            return
+        margin, spacing = board_layout(size)
+        background = self.background if size == BOARD_SIZE else draw_board_background(size)
+        scale = STONE_SCALE * spacing / SPACING
+        black, white = (self.assets.image(path, scale) for path in (BLACK_PATH, WHITE_PATH))
+        self.renderer = BoardRenderer(self.screen, background, black, white, size, margin, spacing)
 
     def play_move_sound(self):
         """Play move sound effect."""
-        if self.move_sound:
-            self.move_sound.play()
-        else:
-            # Simple beep sound instead of complex array conversion
-            try:
-                pygame.mixer.Sound(buffer=b'\x00\xff' * 1000).play()
-            except:
-                pass  # Skip sound if error
+        self.sounds.play('move')
 
     def play_win_sound(self):
         """Play win sound effect."""
-        if self.win_sound:
-            self.win_sound.play()
-        else:
-            # Simple beep sound instead of complex array conversion
-            try:
-                pygame.mixer.Sound(buffer=b'\x00\xff' * 2000).play()
-            except:
-                pass  # Skip sound if error
+        self.sounds.play('win')
 
     def show_start_menu(self):
-        """Display step-by-step menu for game mode, color, and difficulty selection."""
+        """Display step-by-step menu for game mode, board size, color, and difficulty selection."""
         # Step 1: Game Mode Selection
         self.player_mode = self.select_game_mode()
-        
-        # Step 2: Color Selection
+
+        # Step 2: Board Size
+        self.board_size = self.select_board_size()
+
+        # Step 3: Color Selection
         self.player_color = self.select_color()
         
-        # Step 3: AI Difficulty (only if vs AI)
+        # Step 4: AI Difficulty (only if vs AI)
         if self.player_mode == 'human_ai':
             self.ai_difficulty = self.select_difficulty()
 
+    def run_menu(self, draw, options, keys):
+        """
+        Show a menu and wait for a choice. draw(hovered) paints the whole menu,
+        options is a list of (rect, value) and keys maps key codes to values.
+        The loop sleeps until an event arrives and repaints only when the
+        option under the mouse changes.
+        """
+        def option_at(pos):
+            for rect, value in options:
+                if rect.collidepoint(pos):
+                    return value
+            return None
+
+        hovered = option_at(pygame.mouse.get_pos())
+        draw(hovered)
+        pygame.display.update()
+        if not startup.reported:
+            startup.mark('first frame')
+            startup.report()
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                sys.exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key in keys:
+                    return keys[event.key]
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                choice = option_at(event.pos)
+                if choice is not None:
+                    return choice
+            elif event.type == pygame.MOUSEMOTION:
+                choice = option_at(event.pos)
+                if choice != hovered:
+                    hovered = choice
+                    draw(hovered)
+                    pygame.display.update()
+
+    def draw_option_box(self, rect, hovered):
+        """Draw a bordered option box, tinted while the mouse is over it."""
+        pygame.draw.rect(self.screen, MENU_HOVER_COLOR if hovered else (255, 255, 255), rect, 0)
+        pygame.draw.rect(self.screen, (139, 69, 19), rect, 3)
+
+    def blit_centered(self, surface, center):
+        """Blit surface with its centre at `center`."""
+        self.screen.blit(surface, surface.get_rect(center=center))
+
     def select_game_mode(self):
         """Step 1: Select game mode."""
-        selecting = True
-        while selecting:
+        text = self.text
+        # Define clickable rectangles
+        rect1 = pygame.Rect(200, 280, 350, 60)
+        rect2 = pygame.Rect(200, 360, 350, 60)
+
+        def draw(hovered):
             self.screen.fill((240, 217, 181))  # Light wood color background
-            
-            # Draw title
-            title = pygame.font.SysFont("Arial", 48, bold=True).render('GOMOKU GAME', True, (139, 69, 19))
-            title_rect = title.get_rect(center=(375, 150))
-            self.screen.blit(title, title_rect)
-            
-            # Draw subtitle
-            subtitle = pygame.font.SysFont("Arial", 24).render('Select Game Mode', True, (101, 67, 33))
-            subtitle_rect = subtitle.get_rect(center=(375, 200))
-            self.screen.blit(subtitle, subtitle_rect)
-            
-            # Draw options with boxes
-            option1 = pygame.font.SysFont("Arial", 32).render('1. Human vs AI', True, (0, 0, 0))
-            option2 = pygame.font.SysFont("Arial", 32).render('2. Human vs Human', True, (0, 0, 0))
-            
-            # Define clickable rectangles
-            rect1 = pygame.Rect(200, 280, 350, 60)
-            rect2 = pygame.Rect(200, 360, 350, 60)
-            
+            self.blit_centered(text.render('GOMOKU GAME', 48, (139, 69, 19), bold=True), (375, 150))
+            self.blit_centered(text.render('Select Game Mode', 24, (101, 67, 33)), (375, 200))
             # Draw option boxes
-            pygame.draw.rect(self.screen, (255, 255, 255), rect1, 0)
-            pygame.draw.rect(self.screen, (139, 69, 19), rect1, 3)
-            pygame.draw.rect(self.screen, (255, 255, 255), rect2, 0)
-            pygame.draw.rect(self.screen, (139, 69, 19), rect2, 3)
-            
-            option1_rect = option1.get_rect(center=(375, 310))
-            option2_rect = option2.get_rect(center=(375, 390))
-            self.screen.blit(option1, option1_rect)
-            self.screen.blit(option2, option2_rect)
-            
+            self.draw_option_box(rect1, hovered == 'human_ai')
+            self.draw_option_box(rect2, hovered == 'human_human')
+            self.blit_centered(text.render('1. Human vs AI', 32, (0, 0, 0)), (375, 310))
+            self.blit_centered(text.render('2. Human vs Human', 32, (0, 0, 0)), (375, 390))
             # Add instruction
-            instruction = pygame.font.SysFont("Arial", 18).render('Click on option or press 1/2', True, (101, 67, 33))
-            instruction_rect = instruction.get_rect(center=(375, 480))
-            self.screen.blit(instruction, instruction_rect)
-            
-            pygame.display.update()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_1:
-                        return 'human_ai'
-                    elif event.key == pygame.K_2:
-                        return 'human_human'
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if rect1.collidepoint(event.pos):
-                        return 'human_ai'
-                    elif rect2.collidepoint(event.pos):
-                        return 'human_human'
+            self.blit_centered(text.render('Click on option or press 1/2', 18, (101, 67, 33)), (375, 480))
+
+        return self.run_menu(draw, [(rect1, 'human_ai'), (rect2, 'human_human')],
+                             {pygame.K_1: 'human_ai', pygame.K_2: 'human_human'})
+
+    def select_board_size(self):
+        """Step 2: Select the board size."""
+        text = self.text
+        options = [(pygame.Rect(200, 280 + 80 * i, 350, 60), size) for i, size in enumerate(BOARD_SIZES)]
+        keys = {pygame.K_1 + i: size for i, size in enumerate(BOARD_SIZES)}
+
+        def draw(hovered):
+            self.screen.fill((240, 217, 181))
+            self.blit_centered(text.render('Board Size', 40, (139, 69, 19), bold=True), (375, 180))
+            for i, (rect, size) in enumerate(options):
+                self.draw_option_box(rect, hovered == size)
+                self.blit_centered(text.render(f'{i + 1}. {size} x {size}', 32, (0, 0, 0)), rect.center)
+            # Add instruction
+            self.blit_centered(text.render('Click on size or press 1/2', 18, (101, 67, 33)),
+                               (375, 320 + 80 * len(options)))
+
+        return self.run_menu(draw, options, keys)
 
     def select_color(self):
-        """Step 2: Select player color."""
-        selecting = True
-        while selecting:
+        """Step 3: Select player color."""
+        text = self.text
+        # Define clickable rectangles
+        black_rect = pygame.Rect(150, 280, 200, 100)
+        white_rect = pygame.Rect(400, 280, 200, 100)
+
+        def draw(hovered):
             self.screen.fill((240, 217, 181))
-            
-            title = pygame.font.SysFont("Arial", 40, bold=True).render('Choose Your Color', True, (139, 69, 19))
-            title_rect = title.get_rect(center=(375, 180))
-            self.screen.blit(title, title_rect)
-            
-            # Define clickable rectangles
-            black_rect = pygame.Rect(150, 280, 200, 100)
-            white_rect = pygame.Rect(400, 280, 200, 100)
-            
+            self.blit_centered(text.render('Choose Your Color', 40, (139, 69, 19), bold=True), (375, 180))
             # Draw color options with visual stones
-            pygame.draw.rect(self.screen, (255, 255, 255), black_rect, 0)
-            pygame.draw.rect(self.screen, (139, 69, 19), black_rect, 3)
-            pygame.draw.rect(self.screen, (255, 255, 255), white_rect, 0)
-            pygame.draw.rect(self.screen, (139, 69, 19), white_rect, 3)
-            
+            self.draw_option_box(black_rect, hovered == 1)
+            self.draw_option_box(white_rect, hovered == -1)
             # Draw sample stones
             pygame.draw.circle(self.screen, (0, 0, 0), (250, 310), 20)
             pygame.draw.circle(self.screen, (255, 255, 255), (500, 310), 20)
             pygame.draw.circle(self.screen, (0, 0, 0), (500, 310), 20, 2)
-            
-            black_text = pygame.font.SysFont("Arial", 24).render('Press B', True, (0, 0, 0))
-            white_text = pygame.font.SysFont("Arial", 24).render('Press W', True, (0, 0, 0))
-            black_label = pygame.font.SysFont("Arial", 20).render('Black', True, (0, 0, 0))
-            white_label = pygame.font.SysFont("Arial", 20).render('White', True, (0, 0, 0))
-            
-            black_text_rect = black_text.get_rect(center=(250, 350))
-            white_text_rect = white_text.get_rect(center=(500, 350))
-            black_label_rect = black_label.get_rect(center=(250, 330))
-            white_label_rect = white_label.get_rect(center=(500, 330))
-            
-            self.screen.blit(black_text, black_text_rect)
-            self.screen.blit(white_text, white_text_rect)
-            self.screen.blit(black_label, black_label_rect)
-            self.screen.blit(white_label, white_label_rect)
-            
+            self.blit_centered(text.render('Press B', 24, (0, 0, 0)), (250, 350))
+            self.blit_centered(text.render('Press W', 24, (0, 0, 0)), (500, 350))
+            self.blit_centered(text.render('Black', 20, (0, 0, 0)), (250, 330))
+            self.blit_centered(text.render('White', 20, (0, 0, 0)), (500, 330))
             # Add instruction
-            instruction = pygame.font.SysFont("Arial", 18).render('Click on color or press B/W', True, (101, 67, 33))
-            instruction_rect = instruction.get_rect(center=(375, 450))
-            self.screen.blit(instruction, instruction_rect)
-            
-            pygame.display.update()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_b:
-                        return 1  # Black
-                    elif event.key == pygame.K_w:
-                        return -1  # White
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if black_rect.collidepoint(event.pos):
-                        return 1  # Black
-                    elif white_rect.collidepoint(event.pos):
-                        return -1  # White
+            self.blit_centered(text.render('Click on color or press B/W', 18, (101, 67, 33)), (375, 450))
+
+        # 1 is Black, -1 is White
+        return self.run_menu(draw, [(black_rect, 1), (white_rect, -1)],
+                             {pygame.K_b: 1, pygame.K_w: -1})
 
     def select_difficulty(self):
-        """Step 3: Select AI difficulty."""
-        selecting = True
-        while selecting:
+        """Step 4: Select AI difficulty."""
+        text = self.text
+        difficulties = [
+            ('E - Easy', 'Random moves', 250, 'easy'),
+            ('M - Medium', 'Basic strategy', 320, 'medium'),
+            ('H - Hard', 'Advanced tactics', 390, 'hard'),
+            ('T - Tree search', 'Monte Carlo', 460, 'mcts')
+        ]
+        rects = [(pygame.Rect(150, y_pos-20, 450, 50), diff_key) for _, _, y_pos, diff_key in difficulties]
+
+        def draw(hovered):
             self.screen.fill((240, 217, 181))
-            
-            title = pygame.font.SysFont("Arial", 40, bold=True).render('AI Difficulty', True, (139, 69, 19))
-            title_rect = title.get_rect(center=(375, 150))
-            self.screen.blit(title, title_rect)
-            
+            self.blit_centered(text.render('AI Difficulty', 40, (139, 69, 19), bold=True), (375, 150))
             # Draw difficulty options
-            difficulties = [
-                ('E - Easy', 'Random moves', 250, 'easy'),
-                ('M - Medium', 'Basic strategy', 320, 'medium'),
-                ('H - Hard', 'Advanced tactics', 390, 'hard')
-            ]
-            
-            rects = []
-            for i, (main_text, desc_text, y_pos, diff_key) in enumerate(difficulties):
-                rect = pygame.Rect(150, y_pos-20, 450, 50)
-                rects.append((rect, diff_key))
-                
-                pygame.draw.rect(self.screen, (255, 255, 255), rect, 0)
-                pygame.draw.rect(self.screen, (139, 69, 19), rect, 3)
-                
-                main = pygame.font.SysFont("Arial", 28).render(main_text, True, (0, 0, 0))
-                desc = pygame.font.SysFont("Arial", 18).render(desc_text, True, (101, 67, 33))
-                
-                main_rect = main.get_rect(center=(270, y_pos-5))
-                desc_rect = desc.get_rect(center=(450, y_pos-5))
-                
-                self.screen.blit(main, main_rect)
-                self.screen.blit(desc, desc_rect)
-            
+            for (main_text, desc_text, y_pos, diff_key), (rect, _) in zip(difficulties, rects):
+                self.draw_option_box(rect, hovered == diff_key)
+                self.blit_centered(text.render(main_text, 28, (0, 0, 0)), (270, y_pos-5))
+                self.blit_centered(text.render(desc_text, 18, (101, 67, 33)), (450, y_pos-5))
             # Add instruction
-            instruction = pygame.font.SysFont("Arial", 18).render('Click on difficulty or press E/M/H', True, (101, 67, 33))
-            instruction_rect = instruction.get_rect(center=(375, 480))
-            self.screen.blit(instruction, instruction_rect)
-            
-            pygame.display.update()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_e:
-                        return 'easy'
-                    elif event.key == pygame.K_m:
-                        return 'medium'
-                    elif event.key == pygame.K_h:
-                        return 'hard'
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    for rect, diff_key in rects:
-                        if rect.collidepoint(event.pos):
-                            return diff_key
+            self.blit_centered(text.render('Click on difficulty or press E/M/H/T', 18, (101, 67, 33)), (375, 540))
+
+        return self.run_menu(draw, rects, {pygame.K_e: 'easy', pygame.K_m: 'medium', pygame.K_h: 'hard',
+                                           pygame.K_t: 'mcts'})
 
     def run(self):
         """
         Main loop for the game GUI. Handles events, drawing, and game flow.
+        AI moves are computed by an AIWorker, so the window keeps repainting
+        and handling events while the engine thinks. R restarts at any time;
+        U takes moves back and Y replays them, also once the game is over.
         """
         while True:
             self.show_start_menu()
-            self.screen.blit(self.background, (0, 0))
-            color = self.player_color
-            times = 0
-            flag = False
-            self.board.grid = [[0 for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]  # Reset board
-            last_move = None
-            win_line = None
-
-            # If AI is black and player is white, AI should move first
-            if self.player_mode == 'human_ai' and self.player_color == -1:
-                # AI is black, player is white
-                x_ai, y_ai = beta_go(self.board.grid, None, None, 1, times, self.ai_difficulty)
-                times += 1
-                self.board.place(x_ai, y_ai, 1)
-                self.screen.blit(self.black, self.dot_list[BOARD_SIZE * x_ai + y_ai])
-                self.play_move_sound()
-                last_move = (x_ai, y_ai)
-                win_line = self.get_win_line(x_ai, y_ai, 1)
-                color = -1  # Next turn is white
-
-            while not flag:
-                # If it's AI's turn, make AI move automatically
-                if self.player_mode == 'human_ai' and color != self.player_color:
-                    # Find last move for AI context
-                    last_m, last_n = last_move if last_move else (None, None)
-                    x_ai, y_ai = beta_go(self.board.grid, last_m, last_n, color, times, self.ai_difficulty)
-                    times += 1
-                    self.board.place(x_ai, y_ai, color)
-                    self.screen.blit(self.white if color == -1 else self.black, self.dot_list[BOARD_SIZE * x_ai + y_ai])
-                    self.play_move_sound()
-                    last_move = (x_ai, y_ai)
-                    win_line = self.get_win_line(x_ai, y_ai, color)
-                    if self.board.check_win(x_ai, y_ai, color, 5):
-                        self.screen.blit(self.font.render(f'GAME OVER, {"White" if color == -1 else "Black"} wins!', True, (217, 20, 30)), (80, 650))
-                        if win_line:
-                            self.draw_win_line(win_line)
-                        self.play_win_sound()
-                        flag = True
-                        pygame.display.update()
-                        break
-                    color = -1 * color
-                    pygame.display.update()
-                    sleep(0.2)
-                    continue
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        exit()
-                    elif event.type == pygame.MOUSEBUTTONDOWN:
-                        x, y = pygame.mouse.get_pos()
-                        if 25 <= x <= 725 and 25 <= y <= 725:
-                            m = int(round((x - 25) / 50))
-                            n = int(round((y - 25) / 50))
-                            if not self.board.is_empty(m, n):
-                                continue
-                            if self.player_mode == 'human_ai':
-                                if color == self.player_color:
-                                    self.board.place(m, n, color)
-                                    self.screen.blit(self.black if color == 1 else self.white, self.dot_list[BOARD_SIZE * m + n])
-                                    self.play_move_sound()
-                                    last_move = (m, n)
-                                    win_line = self.get_win_line(m, n, color)
-                                    if self.board.check_win(m, n, color, 5):
-                                        self.screen.blit(self.font.render(f'GAME OVER, {"Black" if color == 1 else "White"} wins!', True, (110, 210, 30)), (80, 650))
-                                        if win_line:
-                                            self.draw_win_line(win_line)
-                                        self.play_win_sound()
-                                        flag = True
-                                        break
-                                    color = -1 * color
-                                else:
-                                    # Ignore clicks when it's AI's turn
-                                    continue
-                            else:  # human_human
-                                self.board.place(m, n, color)
-                                self.screen.blit(self.black if color == 1 else self.white, self.dot_list[BOARD_SIZE * m + n])
-                                self.play_move_sound()
-                                last_move = (m, n)
-                                win_line = self.get_win_line(m, n, color)
-                                if self.board.check_win(m, n, color, 5):
-                                    self.screen.blit(self.font.render(f'GAME OVER, {"Black" if color == 1 else "White"} wins!', True, (110, 210, 30)), (80, 650))
-                                    if win_line:
-                                        self.draw_win_line(win_line)
-                                    self.play_win_sound()
-                                    flag = True
-                                    break
-                                color = -1 * color
-                # Highlight last move
-                if last_move:
-                    self.highlight_last_move(last_move)
-                pygame.display.update()
-                if flag:
-                    self.show_restart_menu()
+            self.set_board_size(self.board_size)
+            self.renderer.clear()
+            self.update_stats_overlay()
+            # Black moves first; against the AI that may be the AI itself.
+            self.first_color = 1 if self.player_mode == 'human_ai' else self.player_color
+            self.board.reset(self.board_size)  # Reset board
+            self.redo_moves = []
+            # The AI's time for the whole game, shared out over its moves
+            self.ai_clock = PRESETS[self.ai_difficulty].new_clock()
+            while True:
+                winner = self.play_game()
+                choice = self.show_restart_menu() if winner is not None else 'restart'
+                if choice != 'undo':
                     break
+                self.undo()
+            # A game abandoned before its end is recorded as unfinished
+            self.save_game(winner)
+            if choice == 'quit':
+                sys.exit()
 
-    def highlight_last_move(self, move):
-        """Draw a red circle around the last move."""
-        m, n = move
-        x, y = self.dot_list[BOARD_SIZE * m + n]
-        pygame.draw.circle(self.screen, (255, 0, 0), (int(x + self.white.get_width() / 2), int(y + self.white.get_height() / 2)), 25, 3)
-
-    def get_win_line(self, x, y, color):
-        """Return the coordinates of the winning line if exists."""
-        directions = [(1,0), (0,1), (1,1), (1,-1)]
-        for dx, dy in directions:
-            count = 1
-            line = [(x, y)]
-            for step in range(1, 5):
-                nx, ny = x + dx*step, y + dy*step
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.board.grid[nx][ny] == color:
-                    line.append((nx, ny))
-                    count += 1
-                else:
+    def play_game(self):
+        """
+        Play until the game ends or the player restarts. Returns the winner
+        (1 or -1, 0 for a draw), or None if the game was abandoned.
+        """
+        while True:
+            color = self.to_move()
+            ai_turn = self.is_ai(color)
+            if ai_turn and not self.worker.busy:
+                # Find last move for AI context
+                last_m, last_n = self.board.history[-1][:2] if self.board.history else (None, None)
+                self.worker.start(self.board, last_m, last_n, color, self.ai_difficulty, self.ai_clock)
+                self.set_thinking(True)
+            if ai_turn:
+                done, move = self.worker.poll()
+                if done:
+                    self.set_thinking(False)
+                    self.update_stats_overlay()
+                    if move is None:
+                        # No empty cell left
+                        self.renderer.draw_text(self.text.render('GAME OVER, Draw!', 40, (0, 0, 0)), (80, 650))
+                        return 0
+                    self.redo_moves.clear()
+                    winner = self.play_move(move[0], move[1], color, by_ai=True)
+                    if winner:
+                        return winner
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.worker.cancel()
+                    self.save_game(None)
+                    sys.exit()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                    # Abandon the game, stopping any search in progress
+                    self.worker.cancel()
+                    self.set_thinking(False)
+                    return None
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_u:
+                    self.undo()
+                    break
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_s:
+                    self.show_stats = not self.show_stats
+                    self.update_stats_overlay()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_y:
+                    winner = self.redo()
+                    if winner is not None:
+                        return winner
                     break
-            for step in range(1, 5):
-                nx, ny = x - dx*step, y - dy*step
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.board.grid[nx][ny] == color:
-                    line.insert(0, (nx, ny))
-                    count += 1
-                else:
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if ai_turn:
+                        # Ignore clicks when it's AI's turn
+                        continue
+                    cell = self.renderer.cell_at(event.pos)
+                    if cell is None or not self.board.is_empty(*cell):
+                        continue
+                    self.redo_moves.clear()
+                    winner = self.play_move(cell[0], cell[1], color)
+                    if winner:
+                        return winner
                     break
-            if count >= 5:
-                return line
+            # Only the regions touched this frame reach the display
+            self.renderer.present()
+            self.clock.tick(FPS)
+
+    def to_move(self):
+        """The color whose turn it is."""
+        history = self.board.history
+        return -history[-1][2] if history else self.first_color
+
+    def is_ai(self, color):
+        """True if the AI plays color."""
+        return self.player_mode == 'human_ai' and color != self.player_color
+
+    def undo(self):
+        """
+        Take back the last move, cancelling any search in progress. Against
+        the AI, moves are taken back until it is the player's turn again.
+        """
+        self.worker.cancel()
+        self.set_thinking(False)
+        if not self.board.history:
+            return
+        self.redo_moves.append(self.board.pop())
+        while self.board.history and self.is_ai(self.to_move()):
+            self.redo_moves.append(self.board.pop())
+        self.redraw_board()
+
+    def redo(self):
+        """
+        Replay the last undone move (against the AI, up to the player's next
+        turn). Returns the winner if a replayed move ends the game, else None.
+        """
+        if not self.redo_moves:
+            return None
+        self.worker.cancel()
+        self.set_thinking(False)
+        while self.redo_moves:
+            x, y, color = self.redo_moves.pop()
+            winner = self.play_move(x, y, color, by_ai=self.is_ai(color))
+            if winner:
+                return winner
+            if not self.is_ai(self.to_move()):
+                break
         return None
 
+    def redraw_board(self):
+        """Repaint the whole board from the move stack."""
+        self.renderer.clear()
+        for x, y, color in self.board.history:
+            self.renderer.draw_stone(x, y, color)
+        self.highlight_last_move(self.board.history[-1][:2] if self.board.history else None)
+
+    def play_move(self, m, n, color, by_ai=False):
+        """
+        Place a stone for color at (m, n) and draw it. Returns the winner if
+        the move ends the game, else None: color for a five, and the opponent
+        for an illegal move, which forfeits the game and is not played.
+        """
+        if not self.board.push(m, n, color):
+            self.show_winner(-color, self.is_ai(-color))
+            return -color
+        self.renderer.draw_stone(m, n, color)
+        self.highlight_last_move((m, n))
+        self.play_move_sound()
+        if not self.board.check_win(m, n, color, 5):
+            return None
+        self.show_winner(color, by_ai)
+        win_line = self.board.win_line(m, n)
+        if win_line:
+            self.draw_win_line(win_line)
+        self.play_win_sound()
+        return color
+
+    def show_winner(self, color, by_ai):
+        """Announce that color (the AI's side if by_ai) has won."""
+        text_color = (217, 20, 30) if by_ai else (110, 210, 30)
+        self.renderer.draw_text(self.text.render(f'GAME OVER, {"Black" if color == 1 else "White"} wins!', 40, text_color), (80, 650))
+
+    def save_game(self, winner):
+        """Append the moves of the current game to GAME_RECORD_PATH, if any were played."""
+        moves = [(x, y) for x, y, _ in self.board.history]
+        if not GAME_RECORD_PATH or not moves:
+            return
+        if winner and self.first_color == -1:
+            # Records have black moving first; a game white opened is stored with colours swapped
+            winner = -winner
+        try:
+            with GameWriter(GAME_RECORD_PATH) as writer:
+                writer.write(moves, winner, self.board.size)
+        except (OSError, RecordError):
+            pass  # Recording is best effort; never interrupt the game
+
+    def update_stats_overlay(self):
+        """Show the AI's statistics in the top-right corner while they are toggled on (S)."""
+        if not self.show_stats:
+            if self.renderer.overlay is not None:
+                self.renderer.set_overlay(None)
+            return
+        panel = stats_panel(self.text, self.stats)
+        self.renderer.set_overlay(panel, (WINDOW_SIZE - panel.get_width() - 10, 10))
+
+    def set_thinking(self, thinking):
+        """Show in the window title whether the AI is searching."""
+        pygame.display.set_caption("Gomoku Game - AI thinking..." if thinking else "Gomoku Game")
+
+    def highlight_last_move(self, move):
+        """Draw a red circle around the last move, clearing the previous one."""
+        self.renderer.set_last_move(move)
+
     def draw_win_line(self, line):
         """Draw a green line over the winning sequence."""
-        if not line or len(line) < 2:
-            return
-        start = self.dot_list[BOARD_SIZE * line[0][0] + line[0][1]]
-        end = self.dot_list[BOARD_SIZE * line[-1][0] + line[-1][1]]
-        start_pos = (int(start[0] + self.white.get_width() / 2), int(start[1] + self.white.get_height() / 2))
-        end_pos = (int(end[0] + self.white.get_width() / 2), int(end[1] + self.white.get_height() / 2))
-        pygame.draw.line(self.screen, (0, 255, 0), start_pos, end_pos, 6)
+        self.renderer.draw_win_line(line)
     
     def show_restart_menu(self):
-        """Display restart option after game ends."""
-        restart_text = self.font.render('Press R to Restart or Q to Quit', True, (0, 0, 0))
-        self.screen.blit(restart_text, (120, 700))
-        pygame.display.update()
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r:
-                        waiting = False
-                    elif event.key == pygame.K_q:
-                        exit()
+        """
+        Display restart option after game ends. Returns 'restart', 'undo'
+        (take the last move back and play on) or 'quit'.
+        """
+        restart_text = self.text.render('Press R to Restart, U to Undo or Q to Quit', 32, (0, 0, 0))
+        self.renderer.draw_text(restart_text, ((WINDOW_SIZE - restart_text.get_width()) // 2, 700))
+        self.renderer.present()
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return 'quit'
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_r:
+                    return 'restart'
+                elif event.key == pygame.K_u:
+                    return 'undo'
+                elif event.key == pygame.K_q:
+                    return 'quit'
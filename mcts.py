@@ -0,0 +1,320 @@
+"""
+Monte Carlo Tree Search engine for Gomoku.
+
+UCT over the nearby candidate cells with progressive widening: a node may
+have at most 1 + WIDENING_C * visits ** WIDENING_EXPONENT children, taken in
+the order the alpha-beta engine would try them (a winning cell or the blocks
+of an opponent's five on their own), so the tree grows the promising moves
+first and widens as visits accumulate.
+
+Leaves are collected in batches (with a virtual loss on the selected path so
+one batch spreads over different leaves) and played out together. With NumPy
+the batch is a (games, cells) int8 array advanced one move per step for all
+games at once; without it each playout is run on the bitmasks in turn. The
+playout policy completes a five when it can, blocks the opponent's five, and
+otherwise plays a random cell next to a stone.
+
+The engine keeps its tree between moves: when asked about a position two
+plies below the previous root (our move and the reply), it re-roots at that
+node and keeps the statistics gathered there.
+"""
+import math
+import random
+import time
+
+from game_logic import WIN_LENGTH, Board, geometry
+from search import SearchEngine, SearchResult
+from threats import five_points
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EXPLORATION = 0.7
+WIDENING_C = 1.0
+WIDENING_EXPONENT = 0.5
+MAX_CHILDREN = 16
+BATCH_SIZE = 32
+ROLLOUT_DEPTH = 40
+DEFAULT_TIME_LIMIT = 1.0
+
+_ARRAYS = {}
+
+
+def _arrays(size):
+    """
+    (windows, adjacent) index arrays for a board size, built once: the cells
+    of every five-in-a-row window, shape (windows, WIN_LENGTH), and each
+    cell's 8 neighbours, shape (cells, 9), the cell itself padding the edges.
+    """
+    arrays = _ARRAYS.get(size)
+    if arrays is None:
+        geo = geometry(size)
+        adjacent = [[idx] + cells + [idx] * (8 - len(cells)) for idx, cells in enumerate(geo.neighbourhood(1))]
+        arrays = _ARRAYS[size] = (np.array(geo.windows(WIN_LENGTH), dtype=np.intp),
+                                  np.array(adjacent, dtype=np.intp))
+    return arrays
+
+
+def _rollouts_numpy(cells, to_move, rng, size):
+    """
+    Play out every position in lockstep. `cells` is a (games, cells) int8
+    array and `to_move` the color to move in each; returns the winners
+    (1, -1 or 0 for unfinished) as a list.
+    """
+    windows, adjacent = _arrays(size)
+    games = len(cells)
+    cells = cells.copy()
+    color = np.array(to_move, dtype=np.int8)
+    winner = np.zeros(games, dtype=np.int8)
+    near = np.zeros_like(cells, dtype=bool)
+    for idx in np.flatnonzero(cells.any(axis=0)):
+        near[:, adjacent[idx]] |= (cells[:, idx] != 0)[:, None]
+    active = np.ones(games, dtype=bool)
+    for _ in range(ROLLOUT_DEPTH):
+        live = np.flatnonzero(active)
+        if not len(live):
+            break
+        board = cells[live]
+        c = color[live][:, None, None]
+        stones = board[:, windows]
+        own = (stones == c).sum(axis=2)
+        opp = (stones == -c).sum(axis=2)
+        first_empty = (stones == 0).argmax(axis=2)
+        moves = np.full(len(live), -1, dtype=np.intp)
+        won = np.zeros(len(live), dtype=bool)
+        for pattern, wins in (((own == 4) & (opp == 0), True), ((opp == 4) & (own == 0), False)):
+            has = pattern.any(axis=1) & (moves < 0)
+            if has.any():
+                window = pattern[has].argmax(axis=1)
+                moves[has] = windows[window, first_empty[has, window]]
+                won[has] = wins
+        free = moves < 0
+        if free.any():
+            choice = rng.random((int(free.sum()), size * size))
+            choice[(board[free] != 0) | ~near[live[free]]] = -1
+            picked = choice.argmax(axis=1)
+            picked[choice.max(axis=1) < 0] = -1
+            moves[free] = picked
+        stuck = moves < 0
+        active[live[stuck]] = False
+        play = ~stuck
+        games_played, cells_played = live[play], moves[play]
+        cells[games_played, cells_played] = color[games_played]
+        near[games_played[:, None], adjacent[cells_played]] = True
+        winner[live[won]] = color[live[won]]
+        active[live[won]] = False
+        color[games_played] = -color[games_played]
+    return winner.tolist()
+
+
+def _rollouts_python(positions, to_move, rng, size):
+    """Fallback for _rollouts_numpy: positions are (black bits, white bits) pairs."""
+    adjacent = geometry(size).adjacent_masks
+    winners = []
+    for (black, white), color in zip(positions, to_move):
+        bits = {1: black, -1: white}
+        winner = 0
+        for _ in range(ROLLOUT_DEPTH):
+            mine, theirs = bits[color], bits[-color]
+            points = five_points(mine, theirs, size)
+            if points:
+                winner = color
+                break
+            blocks = five_points(theirs, mine, size)
+            if blocks:
+                move = blocks.bit_length() - 1
+            else:
+                occupied = mine | theirs
+                near = [idx for idx in range(size * size) if not occupied >> idx & 1 and occupied & adjacent[idx]]
+                if not near:
+                    break
+                move = rng.choice(near)
+            bits[color] |= 1 << move
+            color = -color
+        winners.append(winner)
+    return winners
+
+
+class Node:
+    """
+    A position in the tree, reached by `color` playing `move`. `value` sums
+    the playout results from `color`'s point of view (1 win, 0.5 draw).
+    """
+    __slots__ = ('move', 'color', 'parent', 'children', 'untried', 'visits', 'value', 'hash', 'terminal')
+
+    def __init__(self, move, color, parent, key, terminal=False):
+        self.move = move
+        self.color = color
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.value = 0.0
+        self.hash = key
+        self.terminal = terminal
+
+    def uct_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.value / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+class MCTSEngine:
+    """
+    UCT search under a wall-clock `time_limit` and/or a `playout_limit`.
+    Reusing one engine across a game reuses its tree. Setting `stop_event`
+    (a threading.Event) ends a running search with the current best move.
+    """
+    def __init__(self, time_limit=DEFAULT_TIME_LIMIT, playout_limit=None, batch_size=BATCH_SIZE,
+                 exploration=EXPLORATION, seed=None, stop_event=None, use_numpy=True):
+        self.time_limit = time_limit
+        self.playout_limit = playout_limit
+        self.batch_size = batch_size
+        self.exploration = exploration
+        self.stop_event = stop_event
+        self.use_numpy = use_numpy and np is not None
+        self.rng = np.random.default_rng(seed) if self.use_numpy else random.Random(seed)
+        self.root = None
+        self.playouts = 0
+        self._orderer = SearchEngine(width=MAX_CHILDREN)
+
+    def _reroot(self, board, color):
+        """Find the node for this position among the old root's grandchildren."""
+        if self.root is None:
+            return None
+        if self.root.hash == board.hash and self.root.color == -color:
+            return self.root
+        for child in self.root.children:
+            for grandchild in child.children:
+                if grandchild.hash == board.hash and grandchild.color == -color:
+                    grandchild.parent = None
+                    return grandchild
+        return None
+
+    def search(self, board, color):
+        """Find the best move for color on a Board; returns a SearchResult."""
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        work = board.copy()
+        self.root = self._reroot(board, color) or Node(None, -color, None, board.hash)
+        self.playouts = 0
+        while True:
+            self._run_batch(work)
+            if self.playout_limit is not None and self.playouts >= self.playout_limit:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+            if self.root.terminal or (self.root.untried == [] and not self.root.children):
+                break
+        elapsed = time.perf_counter() - start
+        if not self.root.children:
+            moves = self._moves(work, color)
+            return SearchResult(moves[0] if moves else None, 0.0, 0, self.playouts, elapsed)
+        best = max(self.root.children, key=lambda child: child.visits)
+        return SearchResult(best.move, best.value / best.visits, self._depth(), self.playouts, elapsed)
+
+    def principal_variation(self):
+        """The most visited line from the root, as a list of (x, y)."""
+        line, node = [], self.root
+        while node is not None and node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            line.append(node.move)
+        return line
+
+    def _depth(self):
+        return len(self.principal_variation())
+
+    def _moves(self, board, color):
+        """
+        The moves to expand for color, best first: the search's ordering, the
+        centre on an empty board, and none only once the board is full.
+        """
+        if not board.occupied:
+            return [(board.size // 2, board.size // 2)]
+        return (self._orderer.root_moves(board, color)
+                or [divmod(idx, board.size) for idx, cell in enumerate(board.cells) if not cell])
+
+    def _select(self, board):
+        """
+        Walk down from the root, expanding one node, and return (path, leaf
+        winner or None). The board is left at the leaf position.
+        """
+        node = self.root
+        path = [node]
+        node.visits += 1
+        while not node.terminal:
+            to_move = -node.color
+            if node.untried is None:
+                node.untried = self._moves(board, to_move)
+            limit = 1 + int(WIDENING_C * node.visits ** WIDENING_EXPONENT)
+            if node.untried and len(node.children) < limit:
+                x, y = node.untried.pop(0)
+                won = board.check_win(x, y, to_move)
+                child = Node((x, y), to_move, node, node.hash ^ board.geometry.zobrist[to_move][x * board.size + y],
+                             won)
+                node.children.append(child)
+                expanded = True
+            elif node.children:
+                child = node.uct_child(self.exploration)
+                expanded = False
+            else:
+                # No moves left: a full board.
+                return path, 0
+            board.push(*child.move, to_move)
+            child.visits += 1
+            path.append(child)
+            node = child
+            if expanded:
+                return path, node.color if node.terminal else None
+        return path, node.color
+
+    def _run_batch(self, board):
+        paths, leaves, winners = [], [], []
+        for _ in range(self.batch_size):
+            path, winner = self._select(board)
+            if winner is None:
+                if self.use_numpy:
+                    leaves.append(list(board.cells))
+                else:
+                    leaves.append((board.bits[1], board.bits[-1]))
+            paths.append((path, winner, -path[-1].color))
+            for _ in path[1:]:
+                board.pop()
+            if self.root.terminal:
+                break
+        to_move = [leaf_to_move for _, winner, leaf_to_move in paths if winner is None]
+        if leaves:
+            if self.use_numpy:
+                results = _rollouts_numpy(np.array(leaves, dtype=np.int8), to_move, self.rng, board.size)
+            else:
+                results = _rollouts_python(leaves, to_move, self.rng, board.size)
+        results = iter(results if leaves else [])
+        for path, winner, _ in paths:
+            if winner is None:
+                winner = next(results)
+            for node in path:
+                node.value += 1.0 if winner == node.color else 0.5 if winner == 0 else 0.0
+            self.playouts += 1
+
+
+_engine = None
+
+
+def mcts_move(board, color, time_limit=DEFAULT_TIME_LIMIT, playout_limit=None, stop_event=None):
+    """
+    Search a Board or grid[x][y] with the module's shared MCTSEngine, so the
+    tree carries over between the moves of a game. Returns a SearchResult.
+    """
+    global _engine
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    if _engine is None:
+        _engine = MCTSEngine()
+    _engine.time_limit = DEFAULT_TIME_LIMIT if time_limit is None else time_limit
+    _engine.playout_limit = playout_limit
+    _engine.stop_event = stop_event
+    return _engine.search(board, color)
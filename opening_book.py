@@ -0,0 +1,366 @@
+"""
+Opening book: known replies for the first moves of a game.
+
+The book is a binary file of fixed-size records sorted by position hash:
+
+    header  b'GMKB', version (u16), board size (u8), max ply (u8), records (u32)
+    record  key (u64), move (u16, cell index x * size + y), weight (u16)
+
+A position may have several records, one per book move. Positions are stored
+in a canonical orientation, the one of the eight board symmetries with the
+smallest Zobrist hash, so a single entry covers every rotation and mirror of
+an opening. The file is read through mmap and searched with a binary search,
+so opening a book costs nothing and a lookup touches a few pages.
+
+Books are built by searching the opening tree, from self-play or from game
+files (text, or game_record files) with:
+    python opening_book.py --expand 3 --output opening_book.bin
+    python opening_book.py --self-play 200 --output opening_book.bin
+    python opening_book.py --games games.txt --output opening_book.bin
+    python opening_book.py --records games.gmr --output opening_book.bin
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+
+from game_logic import BOARD_SIZE, Board
+from game_record import read_records
+from resources import resource_path
+
+MAGIC = b'GMKB'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBI')
+RECORD = struct.Struct('<QHH')
+MAX_PLY = 12
+MAX_WEIGHT = 0xFFFF
+DEFAULT_BOOK = resource_path('opening_book.bin')
+
+# The eight symmetries of the square board as (x, y, last) -> (x', y') maps,
+# where last = size - 1.
+SYMMETRIES = [
+    lambda x, y, last: (x, y),
+    lambda x, y, last: (last - x, y),
+    lambda x, y, last: (x, last - y),
+    lambda x, y, last: (last - x, last - y),
+    lambda x, y, last: (y, x),
+    lambda x, y, last: (last - y, x),
+    lambda x, y, last: (y, last - x),
+    lambda x, y, last: (last - y, last - x),
+]
+
+
+def _inverse(transform):
+    last = BOARD_SIZE - 1
+    probes = [(1, 3), (4, 2)]
+    for candidate in SYMMETRIES:
+        if all(candidate(*transform(x, y, last), last) == (x, y) for x, y in probes):
+            return candidate
+    raise AssertionError('symmetries are not closed under inversion')
+
+
+INVERSES = [_inverse(t) for t in SYMMETRIES]
+
+
+def _stones(board):
+    """(x, y, color) of every stone on a Board."""
+    size = board.size
+    return [(idx // size, idx % size, color) for idx, color in enumerate(board.cells) if color]
+
+
+def canonical_key(board):
+    """
+    Return (key, symmetry): the smallest Zobrist hash of the position over
+    the eight symmetries and the index of the symmetry that produces it.
+    """
+    stones = _stones(board)
+    size, last, zobrist = board.size, board.size - 1, board.geometry.zobrist
+    best = None
+    for i, transform in enumerate(SYMMETRIES):
+        key = 0
+        for x, y, color in stones:
+            tx, ty = transform(x, y, last)
+            key ^= zobrist[color][tx * size + ty]
+        if best is None or key < best[0]:
+            best = (key, i)
+    return best
+
+
+class BookError(Exception):
+    """Raised for a missing, corrupt or incompatible book file."""
+
+
+class OpeningBook:
+    """Read-only view of a book file. Use as a context manager or call close()."""
+    def __init__(self, path=DEFAULT_BOOK):
+        self.path = path
+        try:
+            self._file = open(path, 'rb')
+        except OSError as e:
+            raise BookError(f'cannot open book {path}: {e}') from e
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise BookError(f'empty book file {path}') from e
+        magic, version, self.size, self.max_ply, self.records = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise BookError(f'{path} is not a version {VERSION} opening book')
+        if len(self._map) < HEADER.size + self.records * RECORD.size:
+            self.close()
+            raise BookError(f'{path} is truncated')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self.records
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def _first(self, key):
+        """Index of the first record whose key is >= key."""
+        lo, hi = 0, self.records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, board):
+        """
+        Book moves for the position as a list of ((x, y), weight), best first.
+        A board of another size than the book's is always out of book.
+        """
+        if board.size != self.size or board.occupied.bit_count() >= self.max_ply:
+            return []
+        key, symmetry = canonical_key(board)
+        inverse = INVERSES[symmetry]
+        moves = []
+        i = self._first(key)
+        while i < self.records:
+            record_key, move, weight = self._record(i)
+            if record_key != key:
+                break
+            x, y = inverse(*divmod(move, self.size), self.size - 1)
+            if board.is_empty(x, y):
+                moves.append(((x, y), weight))
+            i += 1
+        moves.sort(key=lambda entry: -entry[1])
+        return moves
+
+    def choose(self, board, rng=None):
+        """
+        Pick a book move, weighted by the record weights when rng (a
+        random.Random) is given, otherwise the heaviest. None if out of book.
+        """
+        moves = self.lookup(board)
+        if not moves:
+            return None
+        if rng is None:
+            return moves[0][0]
+        return rng.choices([move for move, _ in moves], weights=[w for _, w in moves])[0]
+
+
+_default_book = None
+
+
+def book_move(board, rng=None):
+    """A move from the default book for a Board, or None if out of book or no book is installed."""
+    global _default_book
+    if _default_book is None:
+        try:
+            _default_book = OpeningBook()
+        except BookError:
+            _default_book = False
+    if not _default_book:
+        return None
+    return _default_book.choose(board, rng)
+
+
+class BookBuilder:
+    """
+    Collects (position, move) statistics and writes a book. Moves come from
+    finished games, where a move earns 2 points per game it won and 1 per
+    draw (moves that only ever lost are left out), or from expand(), where
+    each searched move counts as one won game.
+    """
+    def __init__(self, max_ply=MAX_PLY, min_games=1, size=BOARD_SIZE):
+        self.size = size
+        self.max_ply = max_ply
+        self.min_games = min_games
+        self.stats = {}
+        # (key, color) -> searched move in the canonical orientation
+        self._searched = {}
+
+    def _record(self, key, move, points):
+        entry = self.stats.setdefault((key, move), [0, 0])
+        entry[0] += 1
+        entry[1] += points
+
+    def add_game(self, moves, winner=None):
+        """
+        Add a game as a list of (x, y) moves, black first. The winner (1, -1 or
+        0) is found by replaying the game when not given.
+        """
+        board = Board(self.size)
+        positions = []
+        color = 1
+        for x, y in moves:
+            if not board.is_empty(x, y):
+                raise ValueError(f'illegal move {(x, y)} in game')
+            if len(positions) < self.max_ply:
+                key, symmetry = canonical_key(board)
+                positions.append((key, SYMMETRIES[symmetry](x, y, self.size - 1), color))
+            board.place(x, y, color)
+            if board.check_win(x, y, color):
+                if winner is None:
+                    winner = color
+                break
+            color = -color
+        if winner is None:
+            winner = 0
+        for key, (x, y), mover in positions:
+            self._record(key, x * self.size + y, 2 if winner == mover else 1 if winner == 0 else 0)
+
+    def expand(self, width=3, time_limit=0.2, strength=None):
+        """
+        Grow the book by search, up to max_ply stones. For each side in turn,
+        the searched best move is recorded and followed at every position
+        where that side is to move. Where the opponent is to move, its own
+        searched reply is recorded and followed too, so the book stays in book
+        against its own moves, and so are its `width` most threatening other
+        replies. Each position is searched once, however it is reached.
+        Returns the number of searches run.
+        """
+        from ai_logic import shape_tables
+        from search import DEFAULT_STRENGTH, SearchEngine
+        engine = SearchEngine.from_strength(strength or DEFAULT_STRENGTH, time_limit=time_limit)
+        self._searches = 0
+        for book_color in (1, -1):
+            board = Board(self.size)
+            self._expand(board, 1, book_color, engine, shape_tables(board), width, set())
+        return self._searches
+
+    def _expand(self, board, color, book_color, engine, tables, width, seen):
+        if board.occupied.bit_count() >= self.max_ply:
+            return
+        key, symmetry = canonical_key(board)
+        if (key, color) in seen:
+            return
+        seen.add((key, color))
+        last = self.size - 1
+        if not board.occupied:
+            canonical = SYMMETRIES[symmetry](self.size // 2, self.size // 2, last)
+        elif (key, color) in self._searched:
+            canonical = self._searched[key, color]
+        else:
+            canonical = SYMMETRIES[symmetry](*engine.search(board, color).move, last)
+            self._searched[key, color] = canonical
+            self._searches += 1
+        self._record(key, canonical[0] * self.size + canonical[1], 2)
+        moves = [INVERSES[symmetry](*canonical, last)]
+        if color != book_color and board.occupied:
+            scored = sorted(((tables[color].weight(x, y) + tables[-color].weight(x, y), x, y)
+                             for x, y in board.candidate_moves()), reverse=True)
+            moves += [(x, y) for _, x, y in scored if (x, y) != moves[0]][:width]
+        for x, y in moves:
+            if board.check_win(x, y, color):
+                continue
+            board.place(x, y, color)
+            self._expand(board, -color, book_color, engine, tables, width, seen)
+            board.remove(x, y)
+
+    def records(self):
+        """Sorted (key, move, weight) records."""
+        return sorted((key, move, min(points, MAX_WEIGHT))
+                      for (key, move), (games, points) in self.stats.items()
+                      if games >= self.min_games and points > 0)
+
+    def write(self, path):
+        records = self.records()
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.size, self.max_ply, len(records)))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        return len(records)
+
+
+def read_games(path):
+    """
+    Yield games from a text file: one game per line as space-separated x,y
+    moves, black first. Blank lines and lines starting with # are skipped.
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield [tuple(int(v) for v in move.split(',')) for move in line.split()]
+
+
+def self_play_games(games, time_limit=0.2, seed=0, workers=None, size=BOARD_SIZE):
+    """Play hard-vs-hard games with seeded random openings; yield (moves, winner)."""
+    from concurrent.futures import ProcessPoolExecutor
+    from arena import EngineConfig, play_game
+    engine = EngineConfig('hard', time_limit, use_book=False)
+    jobs = [(engine, engine, seed + i, size) for i in range(games)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(play_game, *zip(*jobs)):
+            yield result['moves'], result['winner']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build an opening book.')
+    parser.add_argument('--output', '-o', default=DEFAULT_BOOK)
+    parser.add_argument('--games', action='append', default=[], help='text file of games (x,y moves per line)')
+    parser.add_argument('--records', action='append', default=[], help='game record file (see game_record.py)')
+    parser.add_argument('--expand', type=int, default=0, metavar='WIDTH',
+                        help='search the opening tree, following WIDTH opponent replies per position')
+    parser.add_argument('--self-play', type=int, default=0, help='number of self-play games to add')
+    parser.add_argument('--time', type=float, default=0.2, help='search time per move')
+    parser.add_argument('--strength', type=int, default=None, help='search strength 1-10 for --expand')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-ply', type=int, default=MAX_PLY)
+    parser.add_argument('--size', type=int, default=BOARD_SIZE, help='board size of the book')
+    parser.add_argument('--min-games', type=int, default=1, help='drop moves seen in fewer games')
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.max_ply, args.min_games, args.size)
+    count = 0
+    for path in args.games:
+        for moves in read_games(path):
+            builder.add_game(moves)
+            count += 1
+    for path in args.records:
+        for record in read_records(path):
+            # Other board sizes, and games that were abandoned, say nothing about this book
+            if record.size == builder.size and record.winner is not None:
+                builder.add_game(record.moves, record.winner)
+                count += 1
+    if args.self_play:
+        for moves, winner in self_play_games(args.self_play, args.time, args.seed, args.workers, args.size):
+            builder.add_game(moves, winner)
+            count += 1
+    searches = builder.expand(args.expand, args.time, args.strength) if args.expand else 0
+    records = builder.write(args.output)
+    print(f'{count} games, {searches} searches -> {records} records in {args.output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Parallel search: one move decision spread over several processes.
+
+The root moves are dealt out round-robin to the workers of a process pool,
+so each worker gets a mix of strong and weak moves. Every worker runs the
+ordinary iterative-deepening SearchEngine on its share with the full time
+budget and its own transposition table (kept between moves, since the pool
+stays up), and reports the best move and score of each depth it completed.
+The answer is the best move at the deepest depth every worker finished;
+a proven win found by any worker is taken at once.
+
+The coordinator never waits much past the time budget. When it is stopped
+or the budget runs out, it answers from the workers that did finish, and
+moves the pool's shared generation counter on: every worker search checks
+the counter and gives up once it has changed, so no stale search holds up
+the next move.
+
+With N workers each process searches about 1/N of the root moves, so the
+same wall-clock budget reaches a deeper iteration.
+"""
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+from game_logic import Board
+from search import _MATE_BOUND, DEFAULT_STRENGTH, STRENGTH_LEVELS, WIN_SCORE, SearchEngine, SearchResult, shared_table
+
+# Time kept back from the workers' budget for starting them and collecting results.
+DISPATCH_MARGIN = 0.05
+# How often the coordinator checks stop_event while waiting.
+POLL_INTERVAL = 0.02
+# How long past the time budget the coordinator waits before answering without the late workers.
+DEADLINE_MARGIN = 0.1
+
+_pool = None
+_pool_workers = 0
+# Counts the searches; shared with the workers, which stop when it moves past theirs.
+_generation = None
+
+
+def default_workers():
+    """One worker per core."""
+    return os.cpu_count() or 1
+
+
+def _get_pool(workers):
+    """The shared process pool, restarted if the worker count changed."""
+    global _pool, _pool_workers, _generation
+    if _pool is None or _pool_workers != workers:
+        shutdown()
+        _generation = multiprocessing.RawValue('l', 0)
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_generation,))
+        _pool_workers = workers
+    return _pool
+
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+
+class _Superseded:
+    """Worker side stop_event: set once the coordinator has moved on from `generation`."""
+    def __init__(self, generation):
+        self.generation = generation
+
+    def is_set(self):
+        return _generation.value != self.generation
+
+
+def shutdown():
+    """Stop the worker processes."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _generation.value += 1
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown)
+
+
+def _search_share(size, stones, color, moves, max_depth, width, time_limit, node_limit, generation):
+    """Worker side: search `moves` only and return (iterations, nodes, counters)."""
+    board = Board(size)
+    for x, y, stone in stones:
+        board.place(x, y, stone)
+    engine = SearchEngine(max_depth=max_depth, width=width, time_limit=time_limit,
+                          node_limit=node_limit, table=shared_table(), stop_event=_Superseded(generation))
+    engine.search(board, color, root_moves=moves)
+    return engine.iterations, engine.nodes, engine.counters()
+
+
+class ParallelSearch:
+    """
+    Root-splitting search over `workers` processes with the same depth,
+    width and budget settings as SearchEngine. Setting `stop_event` makes
+    search() return early with the best move known so far, and the workers
+    stop too.
+    """
+    def __init__(self, workers=None, max_depth=4, width=12, time_limit=1.0, node_limit=None, stop_event=None):
+        self.workers = workers or default_workers()
+        self.max_depth = max_depth
+        self.width = width
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.stop_event = stop_event
+
+    @classmethod
+    def from_strength(cls, strength=DEFAULT_STRENGTH, workers=None, time_limit=None, node_limit=None, stop_event=None):
+        """Build a parallel search from a 1-10 strength level, as SearchEngine.from_strength."""
+        strength = min(max(int(strength), 1), max(STRENGTH_LEVELS))
+        max_depth, width, default_time = STRENGTH_LEVELS[strength]
+        return cls(workers=workers, max_depth=max_depth, width=width,
+                   time_limit=default_time if time_limit is None else time_limit,
+                   node_limit=node_limit, stop_event=stop_event)
+
+    def _single(self):
+        return SearchEngine(self.max_depth, self.width, self.time_limit, self.node_limit,
+                            table=shared_table(), stop_event=self.stop_event)
+
+    def search(self, board, color):
+        """Find the best move for color on a Board; returns a SearchResult."""
+        start = time.perf_counter()
+        moves = self._single().root_moves(board, color)
+        workers = min(self.workers, len(moves))
+        if workers <= 1:
+            return self._single().search(board, color)
+
+        stones = [(idx // board.size, idx % board.size, stone) for idx, stone in enumerate(board.cells) if stone]
+        time_limit = None
+        if self.time_limit is not None:
+            time_limit = max(self.time_limit - DISPATCH_MARGIN, self.time_limit / 2)
+        node_limit = self.node_limit // workers if self.node_limit is not None else None
+        pool = _get_pool(workers)
+        _generation.value += 1
+        futures = [pool.submit(_search_share, board.size, stones, color, moves[i::workers], self.max_depth,
+                               self.width, time_limit, node_limit, _generation.value) for i in range(workers)]
+        deadline = start + self.time_limit + DEADLINE_MARGIN if self.time_limit is not None else None
+        pending = set(futures)
+        while pending:
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+            timeout = POLL_INTERVAL
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.perf_counter())
+                if timeout <= 0:
+                    break
+            _, pending = wait(pending, timeout=timeout, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+        if pending:
+            # Give up on the late workers: drop the shares not started yet and
+            # make the running ones stop, so they do not delay the next move.
+            for future in pending:
+                future.cancel()
+            _generation.value += 1
+        results = [future.result() for future in futures if future.done() and not future.cancelled()]
+        return self._combine(moves, results, start, complete=not pending)
+
+    def _combine(self, moves, results, start, complete=True):
+        """
+        The answer from the workers' (iterations, nodes, counters), as a
+        SearchResult. Without the `complete` set of shares, a best move that
+        loses by force is not trusted over the first root move.
+        """
+        nodes = sum(n for _, n, _ in results)
+        counters = {}
+        for _, _, worker_counters in results:
+            for name, value in worker_counters.items():
+                counters[name] = counters.get(name, 0) + value
+        elapsed = time.perf_counter() - start
+        for iterations, _, _ in results:
+            for depth, move, score in iterations:
+                if score >= WIN_SCORE - self.max_depth:
+                    return SearchResult(move, score, depth, nodes, elapsed, counters)
+        depth = min((len(iterations) for iterations, _, _ in results), default=0)
+        if depth == 0:
+            return SearchResult(moves[0], 0, 0, nodes, elapsed, counters)
+        _, move, score = max((iterations[depth - 1] for iterations, _, _ in results), key=lambda it: it[2])
+        if not complete and score < -_MATE_BOUND:
+            return SearchResult(moves[0], 0, 0, nodes, elapsed, counters)
+        return SearchResult(move, score, depth, nodes, elapsed, counters)
+
+
+def parallel_search_move(board, color, strength=DEFAULT_STRENGTH, workers=None, time_limit=None,
+                         node_limit=None, stop_event=None):
+    """Like search.search_move, but spread over `workers` processes (default: all cores)."""
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    search = ParallelSearch.from_strength(strength, workers=workers, time_limit=time_limit,
+                                          node_limit=node_limit, stop_event=stop_event)
+    return search.search(board, color)
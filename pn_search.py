@@ -0,0 +1,308 @@
+"""
+Proof-number search: proves or disproves a forced win for the side to move.
+
+Best-first search over an AND/OR tree (Allis' proof-number search). Every
+node carries a proof number, the least number of leaves that must still be
+shown to win to prove it, and a disproof number, likewise for a refutation.
+Each step expands the most-proving leaf, the one on the path that always
+takes the OR child with the smallest proof number and the AND child with the
+smallest disproof number, and updates the numbers back to the root. Unlike
+iterative deepening, no part of the tree is searched twice and there is no
+depth limit, so long narrow forcing lines are found that alpha-beta and the
+fixed-depth VCT of threats.py cannot prove in reasonable time.
+
+Moves follow the threat rules of threats.py. The attacker plays fours and
+open threes, or any candidate cell with full_width. The defender must block
+a four, or answer an open three at one of its defences or with a four of
+its own. A proof is therefore a real forced win. A disproof means there is
+no win within those rules.
+
+The tree lives in memory, so `node_limit` also caps memory (roughly 150
+bytes a node); `time_limit` and `stop_event` end a search early as unknown.
+Puzzles can be solved from the command line:
+    python pn_search.py --moves "7,7 0,0 7,8 0,2 8,7 0,4 9,7 0,6 6,9 1,9" --nodes 200000
+"""
+import argparse
+import time
+
+from game_logic import Board, geometry
+from game_record import RecordError, from_psq
+from threats import _bit_indices, five_points, four_moves, three_defences, three_moves
+
+INFINITE = 1 << 60
+DEFAULT_NODE_LIMIT = 100000
+# Neighbourhood searched by full_width, as the candidate moves of a Board.
+FULL_WIDTH_RADIUS = 2
+# A side with at least this many four or open-three moves is in a sharp position.
+SHARP_THREATS = 2
+
+_NEAR_MASKS = {}
+
+
+def _near_masks(size):
+    """For every cell of a board size, the bitmask of the cells within FULL_WIDTH_RADIUS (built once)."""
+    masks = _NEAR_MASKS.get(size)
+    if masks is None:
+        masks = _NEAR_MASKS[size] = [sum(1 << n for n in cells)
+                                     for cells in geometry(size).neighbourhood(FULL_WIDTH_RADIUS)]
+    return masks
+
+
+PROVEN = 'proven'
+DISPROVEN = 'disproven'
+UNKNOWN = 'unknown'
+
+
+class ProofNode:
+    """
+    A node of the proof tree, reached by playing cell `move`. `attacker` is
+    True where the attacker is to move (OR node). `win` marks proven leaves
+    with the winning cells still to be played, as (block, five) or (five,).
+    """
+    __slots__ = ('move', 'attacker', 'proof', 'disproof', 'children', 'win')
+
+    def __init__(self, move, attacker):
+        self.move = move
+        self.attacker = attacker
+        self.proof = 1
+        self.disproof = 1
+        self.children = None
+        self.win = None
+
+    def set_proven(self, win=()):
+        self.proof, self.disproof, self.win = 0, INFINITE, win
+
+    def set_disproven(self):
+        self.proof, self.disproof = INFINITE, 0
+
+    def update(self):
+        """Recompute the numbers from the children."""
+        proofs = [child.proof for child in self.children]
+        disproofs = [child.disproof for child in self.children]
+        if self.attacker:
+            self.proof, self.disproof = min(proofs), min(sum(disproofs), INFINITE)
+        else:
+            self.proof, self.disproof = min(sum(proofs), INFINITE), min(disproofs)
+
+
+class ProofResult:
+    """
+    Outcome of a proof search: `status` is PROVEN, DISPROVEN or UNKNOWN, and
+    `line` the main line of the proof as (x, y) moves, attacker first and
+    ending with the five (empty unless proven). `nodes` counts the tree.
+    """
+    def __init__(self, status, line, nodes, elapsed, proof, disproof):
+        self.status = status
+        self.line = line
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.proof = proof
+        self.disproof = disproof
+
+    @property
+    def move(self):
+        return self.line[0] if self.line else None
+
+    def __repr__(self):
+        return (f'ProofResult(status={self.status}, line={self.line}, nodes={self.nodes}, '
+                f'elapsed={self.elapsed:.3f})')
+
+
+class SearchTimeout(Exception):
+    """Raised when the proof search runs out of time or is stopped."""
+
+
+class ProofSearch:
+    """
+    Proof-number search for a Board and the color to move. At most
+    `node_limit` nodes are created. `full_width` lets the attacker try every
+    candidate cell (within FULL_WIDTH_RADIUS of a stone) after its threats,
+    and the defender every cell when it faces no threat.
+    """
+    def __init__(self, node_limit=DEFAULT_NODE_LIMIT, time_limit=None, stop_event=None, full_width=False):
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.stop_event = stop_event
+        self.full_width = full_width
+        self.nodes = 0
+
+    def solve(self, board, color):
+        """Prove or disprove a win for color, to move on a Board or grid[x][y]; returns a ProofResult."""
+        if not isinstance(board, Board):
+            board = Board.from_grid(board)
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        self._size = board.size
+        self._near = _near_masks(board.size) if self.full_width else None
+        root = ProofNode(None, True)
+        mine, theirs = board.bits[color], board.bits[-color]
+        self.nodes = 1
+        try:
+            while root.proof and root.disproof and self.nodes < self.node_limit:
+                self._step(root, mine, theirs)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    raise SearchTimeout()
+                if self.stop_event is not None and self.stop_event.is_set():
+                    raise SearchTimeout()
+        except SearchTimeout:
+            pass
+        status = PROVEN if root.proof == 0 else DISPROVEN if root.disproof == 0 else UNKNOWN
+        line = [divmod(idx, self._size) for idx in self._main_line(root)] if status == PROVEN else []
+        return ProofResult(status, line, self.nodes, time.perf_counter() - start, root.proof, root.disproof)
+
+    def _step(self, root, mine, theirs):
+        """Expand the most-proving node and update the numbers on its path."""
+        path = [root]
+        node = root
+        while node.children is not None:
+            if node.attacker:
+                node = min(node.children, key=lambda child: child.proof)
+                mine |= 1 << node.move
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+                theirs |= 1 << node.move
+            path.append(node)
+        self._expand(node, mine, theirs)
+        for node in reversed(path):
+            if node.children:
+                node.update()
+
+    def _expand(self, node, mine, theirs):
+        """Evaluate a leaf: settle it, or give it a child per move."""
+        size = self._size
+        if node.attacker:
+            points = five_points(mine, theirs, size)
+            if points:
+                node.set_proven((points.bit_length() - 1,))
+                return
+            blocks = five_points(theirs, mine, size)
+            if blocks & (blocks - 1):
+                node.set_disproven()
+                return
+            if blocks:
+                moves = [blocks.bit_length() - 1]
+            else:
+                fours = four_moves(mine, theirs, size)
+                moves = list(_bit_indices(fours)) + list(_bit_indices(three_moves(mine, theirs, size) & ~fours))
+                if self.full_width:
+                    threats = fours | three_moves(mine, theirs, size)
+                    moves += list(_bit_indices(self._candidates(mine | theirs) & ~threats))
+        else:
+            if five_points(theirs, mine, size):
+                node.set_disproven()
+                return
+            points = five_points(mine, theirs, size)
+            if points & (points - 1):
+                blocks = list(_bit_indices(points))
+                node.set_proven((blocks[0], blocks[1]))
+                return
+            if points:
+                moves = [points.bit_length() - 1]
+            else:
+                defences = three_defences(mine, theirs, node.move, size) | four_moves(theirs, mine, size)
+                if not defences and self.full_width:
+                    defences = self._candidates(mine | theirs)
+                moves = list(_bit_indices(defences))
+        if not moves:
+            # The attacker is out of threats, or its last move left the defender free
+            node.set_disproven()
+            return
+        if self.nodes + len(moves) > self.node_limit:
+            self.nodes = self.node_limit
+            return
+        node.children = [ProofNode(move, not node.attacker) for move in moves]
+        self.nodes += len(moves)
+        node.update()
+
+    def _candidates(self, occupied):
+        """Empty cells within FULL_WIDTH_RADIUS of a stone."""
+        near = 0
+        for idx in _bit_indices(occupied):
+            near |= self._near[idx]
+        return near & ~occupied
+
+    def _main_line(self, node):
+        """
+        The proven line from node as cell indices: the attacker's quickest
+        proven move, and the defender's reply that holds out longest.
+        """
+        line = []
+        while node.children is not None:
+            if node.attacker:
+                node = min((child for child in node.children if child.proof == 0), key=self._proof_length)
+            else:
+                node = max(node.children, key=self._proof_length)
+            line.append(node.move)
+        if node.win:
+            line.extend(node.win)
+        return line
+
+    def _proof_length(self, node):
+        """Plies of the main line below a proven node."""
+        if node.children is None:
+            return len(node.win or ())
+        if node.attacker:
+            return 1 + min(self._proof_length(child) for child in node.children if child.proof == 0)
+        return 1 + max(self._proof_length(child) for child in node.children)
+
+
+def prove(board, color, node_limit=DEFAULT_NODE_LIMIT, time_limit=None, stop_event=None, full_width=False):
+    """Run a ProofSearch for color to move on a Board or grid[x][y]; returns a ProofResult."""
+    return ProofSearch(node_limit, time_limit, stop_event, full_width).solve(board, color)
+
+
+def sharp_position(board, color):
+    """
+    True if the position is tactical enough for a proof search to pay:
+    either side has SHARP_THREATS or more four and open-three moves, or color
+    must block a four.
+    """
+    mine, theirs, size = board.bits[color], board.bits[-color], board.size
+    if five_points(theirs, mine, size):
+        return True
+    return any((four_moves(a, b, size) | three_moves(a, b, size)).bit_count() >= SHARP_THREATS
+               for a, b in ((mine, theirs), (theirs, mine)))
+
+
+def _parse_moves(text):
+    return [tuple(int(v) for v in move.split(',')) for move in text.split()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prove or disprove a forced win with proof-number search.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--moves', help='the position as space-separated x,y moves, black first')
+    source.add_argument('--psq', metavar='FILE', help='the position at the end of a PSQ game')
+    parser.add_argument('--size', type=int, default=15, help='board size for --moves')
+    parser.add_argument('--color', type=int, choices=(1, -1), default=None,
+                        help='attacker: 1 black, -1 white (default: the side to move)')
+    parser.add_argument('--nodes', type=int, default=DEFAULT_NODE_LIMIT, help='largest proof tree')
+    parser.add_argument('--time', type=float, default=None, help='time limit in seconds')
+    parser.add_argument('--full-width', action='store_true', help='also try quiet attacking moves')
+    args = parser.parse_args(argv)
+
+    if args.psq:
+        try:
+            with open(args.psq) as f:
+                record = from_psq(f.read())
+        except (OSError, RecordError) as e:
+            parser.error(str(e))
+        moves, size = record.moves, record.size
+    else:
+        moves, size = _parse_moves(args.moves), args.size
+    board = Board(size)
+    to_move = 1
+    for x, y in moves:
+        if not board.place(x, y, to_move):
+            parser.error(f'illegal move {(x, y)}')
+        to_move = -to_move
+    color = args.color or to_move
+    result = prove(board, color, args.nodes, args.time, full_width=args.full_width)
+    side = 'Black' if color == 1 else 'White'
+    print(f'{side} to win: {result.status} ({result.nodes} nodes, {result.elapsed:.2f} s)')
+    if result.line:
+        print('Main line:', ' '.join(f'{x},{y}' for x, y in result.line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Board rendering with dirty rectangles, plus a cache for fonts and text.
+
+The renderer keeps what is on the board (stones, last-move marker, win line)
+separately from the screen surface. Each change repaints only the cells it
+touches and queues their rectangles, and present() passes just those
+rectangles to pygame.display.update instead of flipping the whole window.
+
+Cell positions follow the board size: board_layout() fits any size into the
+same window, and draw_board_background() paints a plain wooden board for
+sizes the background image was not drawn for.
+
+An overlay surface (such as the engine statistics from stats_panel()) can be
+shown above everything else; repaints underneath it redraw it on top.
+"""
+from collections import OrderedDict
+import pygame
+from game_logic import BOARD_SIZE
+
+MARGIN = 25
+SPACING = 50
+WINDOW_SIZE = 2 * MARGIN + (BOARD_SIZE - 1) * SPACING
+BOARD_COLOR = (244, 183, 76)
+GRID_COLOR = (20, 10, 0)
+GRID_WIDTH = 2
+STAR_RADIUS = 5
+HIGHLIGHT_COLOR = (255, 0, 0)
+HIGHLIGHT_WIDTH = 3
+WIN_LINE_COLOR = (0, 255, 0)
+WIN_LINE_WIDTH = 6
+
+FONT_FAMILY = "Arial"
+TEXT_CACHE_SIZE = 256
+
+PANEL_WIDTH = 250
+PANEL_COLOR = (20, 20, 20, 200)
+PANEL_TEXT_COLOR = (235, 235, 235)
+PANEL_BAR_COLOR = (110, 210, 30)
+PANEL_FONT_SIZE = 15
+PANEL_PADDING = 8
+HISTOGRAM_HEIGHT = 50
+
+
+def board_layout(size, window=WINDOW_SIZE):
+    """(margin, spacing) in pixels that centre a size x size board in the window."""
+    spacing = (window - 2 * MARGIN) // (size - 1)
+    return (window - (size - 1) * spacing) // 2, spacing
+
+
+def star_points(size):
+    """The marked intersections: the centre and one point in from each corner."""
+    centre = size // 2
+    edge = 3 if size >= 13 else 2
+    points = {(centre, centre)}
+    for x in (edge, size - 1 - edge):
+        for y in (edge, size - 1 - edge):
+            points.add((x, y))
+    return sorted(points)
+
+
+def draw_board_background(size, window=WINDOW_SIZE):
+    """Return a window-sized surface with a size x size grid on plain wood."""
+    margin, spacing = board_layout(size, window)
+    surface = pygame.Surface((window, window))
+    surface.fill(BOARD_COLOR)
+    last = margin + (size - 1) * spacing
+    for i in range(size):
+        offset = margin + i * spacing
+        pygame.draw.line(surface, GRID_COLOR, (offset, margin), (offset, last), GRID_WIDTH)
+        pygame.draw.line(surface, GRID_COLOR, (margin, offset), (last, offset), GRID_WIDTH)
+    for x, y in star_points(size):
+        pygame.draw.circle(surface, GRID_COLOR, (margin + x * spacing, margin + y * spacing), STAR_RADIUS)
+    return surface
+
+
+def _format_ms(ms):
+    return f'{ms / 1000:g}s' if ms >= 1000 else f'{ms:g}'
+
+
+def stats_panel(text, recorder):
+    """
+    A translucent surface describing the AI's last move (from an
+    engine_stats.StatsRecorder) above a histogram of its recent move times.
+    """
+    last = recorder.last
+    if last is None:
+        lines = ['No AI move yet']
+    else:
+        lines = [
+            f'AI move {recorder.moves}: {last.move}  [{last.source}]',
+            f'time {1000 * last.elapsed:.1f} ms   depth {last.depth}',
+            f'nodes {last.nodes:,}   ({last.nodes_per_sec:,.0f}/s)',
+            f'TT hits {last.tt_hit_rate:.0%}   cutoffs {last.cutoff_rate:.0%}',
+            f'evals {last.evaluations:,}   threat nodes {last.threat_nodes:,}',
+        ]
+        if last.proof_nodes:
+            lines.append(f'proof nodes {last.proof_nodes:,}')
+        if last.target is not None:
+            budget = f'budget {1000 * last.target:.0f} / {1000 * last.limit:.0f} ms'
+            lines.append(budget + (f'   clock {last.clock:.1f} s' if last.clock is not None else ''))
+    lines.append(f'last {len(recorder.latencies)}: p50 {1000 * recorder.percentile(50):.0f} ms'
+                 f'   p90 {1000 * recorder.percentile(90):.0f} ms')
+    line_height = PANEL_FONT_SIZE + 4
+    label_height = PANEL_FONT_SIZE
+    height = 2 * PANEL_PADDING + len(lines) * line_height + HISTOGRAM_HEIGHT + label_height + 4
+    panel = pygame.Surface((PANEL_WIDTH, height), pygame.SRCALPHA)
+    panel.fill(PANEL_COLOR)
+    y = PANEL_PADDING
+    for line in lines:
+        panel.blit(text.render(line, PANEL_FONT_SIZE, PANEL_TEXT_COLOR), (PANEL_PADDING, y))
+        y += line_height
+
+    histogram = recorder.histogram()
+    peak = max(count for _, count in histogram) or 1
+    slot = (PANEL_WIDTH - 2 * PANEL_PADDING) // len(histogram)
+    base = y + HISTOGRAM_HEIGHT
+    for i, (edge, count) in enumerate(histogram):
+        x = PANEL_PADDING + i * slot
+        bar = int(HISTOGRAM_HEIGHT * count / peak)
+        if bar:
+            pygame.draw.rect(panel, PANEL_BAR_COLOR, (x + 2, base - bar, slot - 4, bar))
+        label = text.render(_format_ms(edge) if edge is not None else 'more', PANEL_FONT_SIZE - 4,
+                            PANEL_TEXT_COLOR)
+        panel.blit(label, label.get_rect(midtop=(x + slot // 2, base + 2)))
+    return panel
+
+
+class TextCache:
+    """
+    Fonts and rendered text surfaces, each built once. Fonts are keyed by
+    (family, size, bold); surfaces by (family, size, bold, text, colour), with
+    the least recently used surfaces dropped beyond `max_entries`.
+    """
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+
+    def font(self, size, bold=False, family=FONT_FAMILY):
+        """Return the SysFont for (family, size, bold), looking it up only once."""
+        key = (family, size, bold)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = pygame.font.SysFont(family, size, bold=bold)
+        return font
+
+    def render(self, text, size, colour, bold=False, family=FONT_FAMILY):
+        """Return an antialiased surface for text, rendering it only once."""
+        key = (family, size, bold, text, colour)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = self.font(size, bold, family).render(text, True, colour)
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+
+
+class BoardRenderer:
+    """
+    Draws a size x size board onto `screen` and tracks the regions that
+    changed since the last present(). Intersections are `spacing` pixels
+    apart, starting `margin` pixels from the top-left corner.
+    """
+    def __init__(self, screen, background, black, white, size=BOARD_SIZE, margin=MARGIN, spacing=SPACING):
+        self.screen = screen
+        self.size = size
+        self.margin = margin
+        self.spacing = spacing
+        self.highlight_radius = spacing // 2
+        self.background = background
+        self.sprites = {1: black, -1: white}
+        self.stones = {}
+        self.last_move = None
+        self.win_line = None
+        self.overlay = None
+        self.overlay_rect = None
+        self.dirty = []
+
+    def cell_center(self, m, n):
+        """Pixel position of the intersection (m, n)."""
+        return self.margin + m * self.spacing, self.margin + n * self.spacing
+
+    def cell_at(self, pos):
+        """Board cell under a pixel position, or None if off the board."""
+        x, y = pos
+        margin, spacing = self.margin, self.spacing
+        last = margin + (self.size - 1) * spacing
+        if not (margin <= x <= last and margin <= y <= last):
+            return None
+        return int(round((x - margin) / spacing)), int(round((y - margin) / spacing))
+
+    def _stone_rect(self, m, n, color):
+        rect = self.sprites[color].get_rect()
+        rect.center = self.cell_center(m, n)
+        return rect
+
+    def _cell_rect(self, m, n):
+        """Area covering a stone and the last-move marker at (m, n)."""
+        size = max(self.sprites[1].get_width(), 2 * self.highlight_radius + 2)
+        rect = pygame.Rect(0, 0, size, size)
+        rect.center = self.cell_center(m, n)
+        return rect
+
+    def _win_line_rect(self, line):
+        start, end = self.cell_center(*line[0]), self.cell_center(*line[-1])
+        rect = pygame.Rect(min(start[0], end[0]), min(start[1], end[1]),
+                           abs(start[0] - end[0]) + 1, abs(start[1] - end[1]) + 1)
+        return rect.inflate(WIN_LINE_WIDTH * 2, WIN_LINE_WIDTH * 2)
+
+    def clear(self):
+        """Forget every stone and repaint the empty board."""
+        self.stones.clear()
+        self.last_move = None
+        self.win_line = None
+        self.screen.blit(self.background, (0, 0))
+        self.dirty = [self.screen.get_rect()]
+        self._restore_overlay(self.screen.get_rect())
+
+    def draw_stone(self, m, n, color):
+        """Add a stone at (m, n)."""
+        self.stones[(m, n)] = color
+        self.screen.blit(self.sprites[color], self._stone_rect(m, n, color))
+        self.dirty.append(self._cell_rect(m, n))
+        self._restore_overlay(self._cell_rect(m, n))
+
+    def remove_stone(self, m, n):
+        """Take the stone at (m, n) off the picture."""
+        if self.stones.pop((m, n), None) is not None:
+            self._repaint(self._cell_rect(m, n))
+
+    def set_last_move(self, move):
+        """Move the last-move marker to `move` (or hide it with None)."""
+        old, self.last_move = self.last_move, move
+        if old is not None and old != move:
+            self._repaint(self._cell_rect(*old))
+        if move is not None:
+            self._draw_highlight()
+            self.dirty.append(self._cell_rect(*move))
+            self._restore_overlay(self._cell_rect(*move))
+
+    def draw_win_line(self, line):
+        """Draw a green line over the winning sequence."""
+        if not line or len(line) < 2:
+            return
+        self.win_line = line
+        self._draw_win_line()
+        self.dirty.append(self._win_line_rect(line))
+        self._restore_overlay(self._win_line_rect(line))
+
+    def set_overlay(self, surface, pos=(0, 0)):
+        """Show surface above the board with its top-left at pos, or hide the overlay with None."""
+        old = self.overlay_rect
+        self.overlay = surface
+        self.overlay_rect = surface.get_rect(topleft=pos) if surface is not None else None
+        if old is not None:
+            self._repaint(old)
+        if surface is not None:
+            self._repaint(self.overlay_rect)
+
+    def _restore_overlay(self, rect):
+        """
+        Repaint the overlay's area if rect was drawn over part of it; the
+        overlay may be translucent, so it is never blitted onto itself.
+        """
+        if self.overlay is not None and self.overlay_rect.colliderect(rect):
+            self._repaint(self.overlay_rect)
+
+    def draw_text(self, surface, pos):
+        """Blit a rendered text surface; text is not redrawn by later repaints."""
+        self.dirty.append(self.screen.blit(surface, pos))
+
+    def _draw_highlight(self):
+        pygame.draw.circle(self.screen, HIGHLIGHT_COLOR, self.cell_center(*self.last_move),
+                           self.highlight_radius, HIGHLIGHT_WIDTH)
+
+    def _draw_win_line(self):
+        pygame.draw.line(self.screen, WIN_LINE_COLOR, self.cell_center(*self.win_line[0]),
+                         self.cell_center(*self.win_line[-1]), WIN_LINE_WIDTH)
+
+    def _repaint(self, rect):
+        """Redraw everything inside rect from the renderer's own state."""
+        self.screen.set_clip(rect)
+        self.screen.blit(self.background, rect, rect)
+        for (m, n), color in self.stones.items():
+            stone_rect = self._stone_rect(m, n, color)
+            if stone_rect.colliderect(rect):
+                self.screen.blit(self.sprites[color], stone_rect)
+        if self.last_move is not None and self._cell_rect(*self.last_move).colliderect(rect):
+            self._draw_highlight()
+        if self.win_line is not None and self._win_line_rect(self.win_line).colliderect(rect):
+            self._draw_win_line()
+        if self.overlay is not None and self.overlay_rect.colliderect(rect):
+            self.screen.blit(self.overlay, self.overlay_rect)
+        self.screen.set_clip(None)
+        self.dirty.append(rect)
+
+    def present(self):
+        """Push the changed regions to the display."""
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
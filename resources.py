@@ -0,0 +1,15 @@
+"""
+Files shipped with the game: images, sounds and the opening book.
+
+Run from source they sit next to the modules. A PyInstaller build unpacks
+them, with the modules, into sys._MEIPASS, so every path to one is resolved
+with resource_path.
+"""
+import os
+import sys
+
+
+def resource_path(*parts):
+    """Path of a file shipped with the game, inside the PyInstaller bundle when frozen."""
+    root = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, *parts)
@@ -0,0 +1,345 @@
+"""
+Post-game review: an evaluation curve and the blunders of finished games.
+
+Every game is replayed on a Board, and each position in it (before every
+move, and the final one unless the last move made five) is searched by the
+SearchEngine with a fixed per-position budget, which gives the engine's
+move there. A move is scored by searching the position after it, from the
+opponent's side; when it was not the engine's move, the position after the
+engine's move is searched too, and the difference is what the move lost.
+(Comparing with the score of the position before the move instead would
+mix searches from either side's point of view, whose static evaluations
+favour the side to move.) A move that lost MISTAKE_LOSS or BLUNDER_LOSS or
+more is flagged; throwing away a forced win, or walking into a forced loss,
+always loses more than that.
+
+Positions are searched on a process pool, a contiguous run of each game per
+worker so the workers' transposition tables carry over from one position to
+the next. Each distinct position is searched once: the openings repeated
+across an evening's games, and positions met again in a later review() with
+the same Reviewer, come from its cache, which can also be kept in a file
+between runs (for the same search budget).
+    python review.py games.gmr --last 10 --time 0.5
+    python review.py --psq game.psq --json
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game_logic import Board
+from game_record import DEFAULT_RECORDS, RecordError, from_psq, read_records
+from search import _MATE_BOUND, DEFAULT_STRENGTH, WIN_SCORE, SearchEngine, _position_key, shared_table
+
+DEFAULT_TIME = 0.5
+# Score lost by a move, for the side that played it, to count as a mistake or
+# a blunder: in ai_logic's THREAT_WEIGHTS, about two open twos or half-open
+# threes, and most of an open three.
+MISTAKE_LOSS = 2000
+BLUNDER_LOSS = 8000
+# Chunks of positions handed to each worker; more chunks balance the load better.
+CHUNKS_PER_WORKER = 4
+
+
+class MoveReview:
+    """
+    One move of a reviewed game: `ply` (0 for black's first move), the
+    `color` that played `move`, the engine's `best_move`, the scores of the
+    positions after the best move and after the move played and the `loss`
+    between them, all from the mover's point of view. `depth` is the depth
+    the engine reached before the move. `verdict` is 'blunder', 'mistake' or
+    None.
+    """
+    def __init__(self, ply, color, move, best_move, best_score, played_score, depth):
+        self.ply = ply
+        self.color = color
+        self.move = move
+        self.best_move = best_move
+        self.best_score = best_score
+        self.played_score = played_score
+        self.depth = depth
+        self.loss = max(0, best_score - played_score)
+        self.verdict = 'blunder' if self.loss >= BLUNDER_LOSS else 'mistake' if self.loss >= MISTAKE_LOSS else None
+
+    def as_dict(self):
+        return {
+            'ply': self.ply,
+            'color': self.color,
+            'move': list(self.move),
+            'best_move': list(self.best_move) if self.best_move is not None else None,
+            'best_score': self.best_score,
+            'played_score': self.played_score,
+            'loss': self.loss,
+            'depth': self.depth,
+            'verdict': self.verdict,
+        }
+
+    def __repr__(self):
+        return f'MoveReview(ply={self.ply}, move={self.move}, best_move={self.best_move}, loss={self.loss})'
+
+
+class GameReview:
+    """The MoveReviews of one GameRecord, in the order played."""
+    def __init__(self, record, moves):
+        self.record = record
+        self.moves = moves
+
+    @property
+    def curve(self):
+        """The evaluation after every move, from black's point of view."""
+        return [move.played_score * move.color for move in self.moves]
+
+    @property
+    def blunders(self):
+        return [move for move in self.moves if move.verdict == 'blunder']
+
+    @property
+    def mistakes(self):
+        return [move for move in self.moves if move.verdict == 'mistake']
+
+    def as_dict(self):
+        return {
+            'size': self.record.size,
+            'winner': self.record.winner,
+            'curve': self.curve,
+            'moves': [move.as_dict() for move in self.moves],
+        }
+
+    def __repr__(self):
+        return f'GameReview(moves={len(self.moves)}, blunders={len(self.blunders)}, mistakes={len(self.mistakes)})'
+
+
+def _analyse(jobs):
+    """
+    Search a run of positions in a worker, each given as (size, moves,
+    color); returns a (score, move, depth) per position.
+    """
+    results = []
+    for size, moves, color, strength, time_limit, node_limit in jobs:
+        board = Board(size)
+        to_move = 1
+        for x, y in moves:
+            board.push(x, y, to_move)
+            to_move = -to_move
+        engine = SearchEngine.from_strength(strength, time_limit=time_limit, node_limit=node_limit,
+                                            table=shared_table())
+        result = engine.search(board, color)
+        results.append((result.score, result.move, result.depth))
+    return results
+
+
+class Reviewer:
+    """
+    Reviews games with a SearchEngine of `strength`, giving each position
+    `time_limit` seconds (and at most `node_limit` nodes, if set) on
+    `workers` processes (default: all cores). `cache` maps (size, position
+    key) to a (score, move, depth) search result and is filled as positions
+    are searched.
+    """
+    def __init__(self, time_limit=DEFAULT_TIME, strength=DEFAULT_STRENGTH, node_limit=None, workers=None,
+                 cache=None):
+        self.time_limit = time_limit
+        self.strength = strength
+        self.node_limit = node_limit
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache if cache is not None else {}
+        self.searched = 0
+        self.cached = 0
+
+    def review(self, records):
+        """
+        Review GameRecords; returns a GameReview per record. Raises
+        RecordError for a game with an illegal move.
+        """
+        records = list(records)
+        jobs = {}
+        positions = [self._positions(record, jobs) for record in records]
+        self._search(jobs)
+        # Where a move was not the engine's choice, the position after the
+        # engine's move is searched as well, so both moves are scored alike.
+        jobs = {}
+        alternatives = [self._alternatives(record, keys, jobs) for record, keys in zip(records, positions)]
+        self._search(jobs)
+        return [self._review_game(record, keys, alts) for record, keys, alts in zip(records, positions, alternatives)]
+
+    def _positions(self, record, jobs):
+        """The keys of a game's positions, before each move and after the last."""
+        board = Board(record.size)
+        color = 1
+        keys = []
+        won = False
+        for ply, (x, y) in enumerate(record.moves):
+            keys.append(self._add_job(board, record.moves[:ply], color, jobs))
+            won = board.check_win(x, y, color)
+            if not board.place(x, y, color):
+                raise RecordError(f'illegal move {(x, y)} in game')
+            color = -color
+            if won and ply + 1 < len(record.moves):
+                raise RecordError(f'moves after the five at {(x, y)} in game')
+        keys.append(self._add_job(board, record.moves, color, jobs, lost=won))
+        return keys
+
+    def _alternatives(self, record, keys, jobs):
+        """Per move, the key of the position after the engine's move instead, or None if it was played."""
+        board = Board(record.size)
+        color = 1
+        alternatives = []
+        for ply, move in enumerate(record.moves):
+            best = self.cache[keys[ply]][1]
+            if best is None or best == move:
+                alternatives.append(None)
+            else:
+                won = board.check_win(*best, color)
+                board.push(*best, color)
+                alternatives.append(self._add_job(board, record.moves[:ply] + [best], -color, jobs, lost=won))
+                board.pop()
+            board.place(*move, color)
+            color = -color
+        return alternatives
+
+    def _add_job(self, board, moves, color, jobs, lost=False):
+        """
+        The cache key of the position on board, color to move after `moves`,
+        adding it to jobs unless it is known. A `lost` position, one where
+        the opponent has just made five, is settled without a search.
+        """
+        key = (board.size, _position_key(board, color))
+        if key in self.cache or key in jobs:
+            self.cached += 1
+        elif lost:
+            self.cache[key] = (-WIN_SCORE, None, 0)
+        else:
+            jobs[key] = (board.size, moves, color, self.strength, self.time_limit, self.node_limit)
+        return key
+
+    def _search(self, jobs):
+        if not jobs:
+            return
+        keys, positions = list(jobs), list(jobs.values())
+        chunk = math.ceil(len(positions) / (self.workers * CHUNKS_PER_WORKER))
+        chunks = [positions[i:i + chunk] for i in range(0, len(positions), chunk)]
+        if self.workers == 1:
+            results = [_analyse(part) for part in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(_analyse, chunks))
+        for key, result in zip(keys, (result for part in results for result in part)):
+            self.cache[key] = result
+        self.searched += len(jobs)
+
+    def _review_game(self, record, keys, alternatives):
+        moves = []
+        for ply, move in enumerate(record.moves):
+            _, best_move, depth = self.cache[keys[ply]]
+            played_score = -self.cache[keys[ply + 1]][0]
+            alternative = alternatives[ply]
+            best_score = played_score if alternative is None else -self.cache[alternative][0]
+            moves.append(MoveReview(ply, 1 if ply % 2 == 0 else -1, move, best_move, best_score, played_score, depth))
+        return GameReview(record, moves)
+
+
+def _settings(reviewer):
+    return {'strength': reviewer.strength, 'time': reviewer.time_limit, 'nodes': reviewer.node_limit}
+
+
+def load_cache(reviewer, path):
+    """
+    Fill the reviewer's cache from a file written by save_cache(). A missing
+    file, or one saved with a different search budget, is ignored.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('settings') != _settings(reviewer):
+        return
+    for size, key, score, move, depth in data['positions']:
+        reviewer.cache[size, key] = (score, tuple(move) if move is not None else None, depth)
+
+
+def save_cache(reviewer, path):
+    positions = [[size, key, score, list(move) if move is not None else None, depth]
+                 for (size, key), (score, move, depth) in reviewer.cache.items()]
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'w') as f:
+        json.dump({'settings': _settings(reviewer), 'positions': positions}, f)
+    os.replace(partial, path)
+
+
+def format_score(score):
+    """A score as text: '+W7' / '-W7' for a win or loss in 7 plies, else the number."""
+    if score > _MATE_BOUND:
+        return f'+W{WIN_SCORE - score}'
+    if score < -_MATE_BOUND:
+        return f'-W{WIN_SCORE + score}'
+    return f'{score:+d}'
+
+
+def format_review(review, number=None):
+    record = review.record
+    result = {1: 'black wins', -1: 'white wins', 0: 'draw', None: 'unfinished'}[record.winner]
+    title = f'Game {number}' if number is not None else 'Game'
+    lines = [f'{title}: {record.size}x{record.size}, {len(record.moves)} moves, {result}; '
+             f'{len(review.blunders)} blunders, {len(review.mistakes)} mistakes']
+    for move in review.moves:
+        if move.verdict:
+            side = 'black' if move.color == 1 else 'white'
+            best = f'{move.best_move[0]},{move.best_move[1]}' if move.best_move is not None else '-'
+            lines.append(f'  {move.ply + 1:3d}. {side} {move.move[0]},{move.move[1]} {move.verdict}: '
+                         f'{format_score(move.played_score)} (best {best} {format_score(move.best_score)})')
+    return '\n'.join(lines)
+
+
+def _read_games(args, parser):
+    records = []
+    try:
+        for path in args.psq or ():
+            with open(path) as f:
+                records.append(from_psq(f.read()))
+        if args.path or not records:
+            records.extend(record for record in read_records(args.path or DEFAULT_RECORDS) if record.moves)
+    except (OSError, RecordError) as e:
+        parser.error(str(e))
+    if args.last:
+        records = records[-args.last:]
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Review finished games: evaluation curves and blunders.')
+    parser.add_argument('path', nargs='?', help=f'game record file (default {DEFAULT_RECORDS}, unless --psq)')
+    parser.add_argument('--psq', metavar='FILE', action='append', help='also review this PSQ game (repeatable)')
+    parser.add_argument('--last', type=int, default=None, help='only the last N games')
+    parser.add_argument('--time', type=float, default=DEFAULT_TIME, help='search time per position in seconds')
+    parser.add_argument('--nodes', type=int, default=None, help='search node limit per position')
+    parser.add_argument('--strength', type=int, default=DEFAULT_STRENGTH, help='search strength 1-10')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--cache', metavar='FILE', help='keep searched positions in this file between runs')
+    parser.add_argument('--json', action='store_true', help='print the reviews as JSON')
+    args = parser.parse_args(argv)
+
+    records = _read_games(args, parser)
+    reviewer = Reviewer(args.time, args.strength, args.nodes, args.workers)
+    if args.cache:
+        load_cache(reviewer, args.cache)
+    start = time.perf_counter()
+    try:
+        reviews = reviewer.review(records)
+    except RecordError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+    if args.cache:
+        save_cache(reviewer, args.cache)
+    if args.json:
+        print(json.dumps([review.as_dict() for review in reviews]))
+        return
+    for number, review in enumerate(reviews, 1):
+        print(format_review(review, number))
+    print(f'{len(reviews)} games, {reviewer.searched} positions searched, {reviewer.cached} from the cache, '
+          f'{elapsed:.1f} s')
+
+
+if __name__ == "__main__":
+    main()
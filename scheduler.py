@@ -0,0 +1,122 @@
+"""
+Move-time scheduling: how long the AI may think about each move.
+
+A GameClock holds one side's time for a whole game, plus an optional
+increment per move. For every move it hands out a MoveBudget: a target, the
+time the move should normally take, and a hard limit it never runs past.
+The target is the time left spread over the moves still expected, scaled by
+how critical the position is. A move forced by a four gets a small fraction
+of the share, and every four or open-three move on the board (for either
+side) adds to it, up to MAX_CRITICALITY times the share. The hard limit lets
+a search whose best move keeps changing run on past the target, up to
+MAX_STRETCH times it, but never takes more than MAX_CLOCK_FRACTION of the
+time left, so the clock cannot run out.
+
+beta_go spends a budget in stages, each capped by the time to the hard
+limit: the threat solver and the proof search get a share of the target,
+and the search or MCTS the rest. Book moves take almost no time, and what
+they save stays on the clock for later moves.
+"""
+import time
+
+from threats import five_points, four_moves, three_moves
+
+# Moves per side a game is expected to last, and the fewest still planned for.
+EXPECTED_MOVES = 30
+MIN_MOVES_TO_GO = 8
+# Fraction of the normal share for a move forced by a four.
+FORCED_FACTOR = 0.1
+# Extra share per four or open-three move on the board, and the largest factor.
+THREAT_FACTOR = 0.2
+MAX_CRITICALITY = 3.0
+# The hard limit is at most this many times the target, and this fraction of the clock.
+MAX_STRETCH = 3.0
+MAX_CLOCK_FRACTION = 0.25
+# Seconds kept back on the clock for the work around each move, and the smallest
+# budget while the clock still has it.
+SAFETY_MARGIN = 0.02
+MIN_MOVE_TIME = 0.01
+
+
+def criticality(board, color):
+    """
+    How much of its normal share of the clock color's move on a Board
+    deserves: FORCED_FACTOR when either side has a five to make or block, else
+    1 plus THREAT_FACTOR per four or open-three move, capped at MAX_CRITICALITY.
+    """
+    mine, theirs, size = board.bits[color], board.bits[-color], board.size
+    if five_points(mine, theirs, size) or five_points(theirs, mine, size):
+        return FORCED_FACTOR
+    threats = sum((four_moves(a, b, size) | three_moves(a, b, size)).bit_count()
+                  for a, b in ((mine, theirs), (theirs, mine)))
+    return min(1.0 + THREAT_FACTOR * threats, MAX_CRITICALITY)
+
+
+class MoveBudget:
+    """
+    The time for one move, in seconds from `start` (a perf_counter time):
+    aim for `target`, and never pass `limit`.
+    """
+    def __init__(self, target, limit, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.limit = limit
+        self.target = min(target, limit)
+
+    @property
+    def deadline(self):
+        return self.start + self.limit
+
+    def cap(self, seconds):
+        """Shorten the budget to at most `seconds`."""
+        self.limit = min(self.limit, seconds)
+        self.target = min(self.target, seconds)
+
+    def left(self):
+        """Seconds to the hard limit."""
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def target_left(self):
+        """Seconds to the target, never past the hard limit."""
+        return min(max(0.0, self.start + self.target - time.perf_counter()), self.left())
+
+    def share(self, fraction):
+        """`fraction` of the target, or what is left before the hard limit if that is less."""
+        return min(self.target * fraction, self.left())
+
+    def __repr__(self):
+        return f'MoveBudget(target={self.target:.3f}, limit={self.limit:.3f})'
+
+
+class GameClock:
+    """
+    One side's clock: `total` seconds for the game, and `increment` added
+    after every move. budget() plans a move and charge() takes its time off.
+    """
+    def __init__(self, total, increment=0.0):
+        self.total = total
+        self.increment = increment
+        self.remaining = total
+        self.moves = 0
+
+    @property
+    def flagged(self):
+        """True once the moves have taken more than the clock held."""
+        return self.remaining < 0
+
+    def budget(self, board, color, start=None):
+        """The MoveBudget for color's move on a Board."""
+        moves_to_go = max(EXPECTED_MOVES - self.moves, MIN_MOVES_TO_GO)
+        available = max(self.remaining - SAFETY_MARGIN, 0.0)
+        share = available / moves_to_go + self.increment
+        target = share * criticality(board, color)
+        cap = available * MAX_CLOCK_FRACTION + self.increment
+        floor = min(MIN_MOVE_TIME, cap)
+        return MoveBudget(max(target, floor), max(min(target * MAX_STRETCH, cap), floor), start)
+
+    def charge(self, elapsed):
+        """Take a move's time off the clock and add the increment."""
+        self.remaining += self.increment - elapsed
+        self.moves += 1
+
+    def __repr__(self):
+        return f'GameClock(remaining={self.remaining:.2f}, moves={self.moves})'
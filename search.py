@@ -0,0 +1,357 @@
+"""
+Search engine for Gomoku: negamax with alpha-beta pruning and iterative
+deepening under a wall-clock and/or node budget. The tree is walked on the
+caller's Board with push()/pop(), so no position is ever copied.
+
+Positions are scored from the side to move with the incremental shape tables
+of ai_logic: forced wins and losses are recognised from the five and open-four
+counts, and quiet positions score our threat potential minus the opponent's.
+Moves are ordered by the threat weight of the cell for both colors, and only
+the `width` most promising cells are searched at each node. Results are cached
+in a TranspositionTable keyed by the board's Zobrist hash, and the cached best
+move is tried first.
+"""
+import time
+from game_logic import Board
+from ai_logic import MAX_SCORE, shape_tables
+from transposition import EXACT, LOWER, NO_MOVE, UPPER, TranspositionTable
+
+WIN_SCORE = MAX_SCORE
+INFINITY = WIN_SCORE + 1
+
+# strength: (max_depth, width, time_limit in seconds)
+STRENGTH_LEVELS = {
+    1: (1, 6, 0.1),
+    2: (2, 8, 0.2),
+    3: (2, 10, 0.3),
+    4: (3, 10, 0.5),
+    5: (4, 10, 0.75),
+    6: (4, 12, 1.0),
+    7: (5, 12, 1.5),
+    8: (6, 12, 2.0),
+    9: (7, 14, 3.0),
+    10: (8, 16, 5.0),
+}
+DEFAULT_STRENGTH = 6
+# With a soft time limit: when the best move changed in the last iteration,
+# the soft limit is stretched this much (still within time_limit).
+INSTABILITY_EXTENSION = 2.0
+# Each iteration is expected to take about this many times the previous one.
+ITERATION_GROWTH = 3.0
+# Scores this close to WIN_SCORE are wins at a known distance in plies.
+_MATE_BOUND = WIN_SCORE - 1000
+
+_shared_table = None
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time or node budget runs out."""
+
+
+class SearchResult:
+    """
+    Outcome of a search: best move, its score and how much work it took.
+    `counters` holds the engine's work counters (see SearchEngine.counters)
+    when the engine keeps them.
+    """
+    def __init__(self, move, score, depth, nodes, elapsed, counters=None):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.counters = counters if counters is not None else {}
+
+    def __repr__(self):
+        return f'SearchResult(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes}, elapsed={self.elapsed:.3f})'
+
+
+def shared_table():
+    """The transposition table reused by search_move between calls."""
+    global _shared_table
+    if _shared_table is None:
+        _shared_table = TranspositionTable()
+    return _shared_table
+
+
+def _position_key(board, color):
+    return board.hash ^ board.geometry.white_to_move if color == -1 else board.hash
+
+
+def _to_table(score, ply):
+    """Make a win score relative to the node before storing it."""
+    if score > _MATE_BOUND:
+        return score + ply
+    if score < -_MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score > _MATE_BOUND:
+        return score - ply
+    if score < -_MATE_BOUND:
+        return score + ply
+    return score
+
+
+class SearchEngine:
+    """
+    Negamax alpha-beta searcher with iterative deepening.
+
+    The search deepens one ply at a time until `max_depth`, the `time_limit`
+    (seconds) or the `node_limit` is reached, and always answers with the best
+    move of the deepest iteration that completed.
+
+    With a `soft_time_limit` as well, the search is anytime: it starts no
+    new iteration once the soft limit has passed, or when the next one
+    (ITERATION_GROWTH times the last) would not finish by the time_limit.
+    While the best move is still changing between iterations, the soft limit
+    is stretched by INSTABILITY_EXTENSION. The time_limit stays a hard cap.
+
+    `table` is the TranspositionTable to use; the engine keeps it between
+    searches, so reusing one engine for a whole game also reuses its cache.
+    Setting `stop_event` (a threading.Event) aborts a running search.
+
+    Besides `nodes`, each search counts static evaluations, interior nodes
+    whose moves were expanded, the beta cutoffs among them, and its
+    transposition-table probes and hits; counters() returns them.
+    """
+    def __init__(self, max_depth=4, width=12, time_limit=1.0, node_limit=None, table=None, stop_event=None,
+                 soft_time_limit=None):
+        self.max_depth = max_depth
+        self.width = width
+        self.time_limit = time_limit
+        self.soft_time_limit = soft_time_limit
+        self.node_limit = node_limit
+        self.table = table if table is not None else TranspositionTable()
+        self.stop_event = stop_event
+        self.nodes = 0
+        self.evaluations = 0
+        self.expanded = 0
+        self.cutoffs = 0
+        self._table_start = (0, 0)
+        self._deadline = None
+
+    @classmethod
+    def from_strength(cls, strength=DEFAULT_STRENGTH, time_limit=None, node_limit=None, table=None, stop_event=None,
+                      soft_time_limit=None):
+        """
+        Build an engine from a 1-10 strength level. Higher levels search deeper
+        and wider and get a larger default time budget; an explicit time_limit
+        still caps the latency.
+        """
+        strength = min(max(int(strength), 1), max(STRENGTH_LEVELS))
+        max_depth, width, default_time = STRENGTH_LEVELS[strength]
+        return cls(max_depth=max_depth, width=width,
+                   time_limit=default_time if time_limit is None else time_limit,
+                   node_limit=node_limit, table=table, stop_event=stop_event, soft_time_limit=soft_time_limit)
+
+    def search(self, board, color, root_moves=None):
+        """
+        Find the best move for color on board. The board is modified during the
+        search and restored before returning.
+
+        `root_moves` restricts the search to those moves (tried in that order).
+        The (depth, move, score) of every completed iteration is kept in
+        `self.iterations`.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.time_limit if self.time_limit is not None else None
+        self.nodes = self.evaluations = self.expanded = self.cutoffs = 0
+        self._table_start = (self.table.probes, self.table.hits)
+        self.iterations = []
+        self._tables = shape_tables(board)
+        self.table.new_search()
+
+        moves = list(root_moves) if root_moves is not None else self.ordered_moves(board, color)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start, self.counters())
+        best_move, best_score, best_depth = moves[0], 0, 0
+        iteration_start = start
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, score = self._search_root(board, color, depth, moves)
+            except SearchAborted:
+                break
+            now = time.perf_counter()
+            stable = move == best_move or depth == 1
+            best_move, best_score, best_depth = move, score, depth
+            self.iterations.append((depth, move, score))
+            # Search the previous best move first in the next iteration.
+            moves.remove(move)
+            moves.insert(0, move)
+            if abs(score) >= WIN_SCORE - self.max_depth:
+                break
+            if self.soft_time_limit is not None and self._out_of_time(start, iteration_start, now, stable):
+                break
+            iteration_start = now
+        return SearchResult(best_move, best_score, best_depth, self.nodes, time.perf_counter() - start,
+                            self.counters())
+
+    def _out_of_time(self, start, iteration_start, now, stable):
+        """True if an anytime search should not start another iteration."""
+        soft = self.soft_time_limit if stable else self.soft_time_limit * INSTABILITY_EXTENSION
+        if now - start >= soft:
+            return True
+        return self._deadline is not None and now + ITERATION_GROWTH * (now - iteration_start) > self._deadline
+
+    def counters(self):
+        """The work counters of the last search, as a dict."""
+        return {
+            'evaluations': self.evaluations,
+            'expanded': self.expanded,
+            'cutoffs': self.cutoffs,
+            'tt_probes': self.table.probes - self._table_start[0],
+            'tt_hits': self.table.hits - self._table_start[1],
+        }
+
+    def principal_variation(self, board, color, move, max_length=None):
+        """
+        The expected line of play starting with color's `move`, read back from
+        the transposition table, as a list of (x, y). It ends at a win, at a
+        position the table has no move for, or after `max_length` moves
+        (default max_depth). The board is left unchanged.
+        """
+        max_length = self.max_depth if max_length is None else max_length
+        line = []
+        seen = set()
+        while move is not None and len(line) < max_length and board.is_empty(*move):
+            line.append(move)
+            won = board.check_win(*move, color)
+            board.push(*move, color)
+            color = -color
+            key = _position_key(board, color)
+            if won or key in seen:
+                break
+            seen.add(key)
+            entry = self.table.probe(key)
+            move = divmod(entry[3], board.size) if entry is not None and entry[3] != NO_MOVE else None
+        for _ in line:
+            board.pop()
+        return line
+
+    def root_moves(self, board, color):
+        """The moves search() would try at the root of board, best first."""
+        self._tables = shape_tables(board)
+        return self.ordered_moves(board, color)
+
+    def ordered_moves(self, board, color):
+        """
+        Candidate moves for color, most promising first. A winning cell or the
+        cells blocking the opponent's five are returned on their own.
+        """
+        own, opp = self._tables[color], self._tables[-color]
+        scored = []
+        blocks = []
+        for x, y in board.candidate_moves():
+            if own.value(x, y) >= MAX_SCORE:
+                return [(x, y)]
+            if opp.value(x, y) >= MAX_SCORE:
+                blocks.append((x, y))
+            scored.append((own.weight(x, y) + opp.weight(x, y), x, y))
+        if blocks:
+            return blocks
+        scored.sort(reverse=True)
+        return [(x, y) for _, x, y in scored[:self.width]]
+
+    def evaluate(self, color, ply=0):
+        """Static score of the position for the side to move, `ply` moves from the root."""
+        self.evaluations += 1
+        own, opp = self._tables[color], self._tables[-color]
+        if own.fives:
+            return WIN_SCORE - ply
+        if opp.fives > 1:
+            # We can block only one of the opponent's fives.
+            return -(WIN_SCORE - ply - 1)
+        if own.open_fours and not opp.fives:
+            return WIN_SCORE - ply - 2
+        return own.potential - opp.potential
+
+    def _check_budget(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchAborted()
+
+    def _search_root(self, board, color, depth, moves):
+        alpha = -INFINITY
+        best_move = moves[0]
+        for x, y in moves:
+            if board.check_win(x, y, color):
+                return (x, y), WIN_SCORE
+            board.push(x, y, color)
+            try:
+                score = -self._negamax(board, -color, depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                board.pop()
+            if score > alpha:
+                alpha, best_move = score, (x, y)
+        self.table.store(_position_key(board, color), depth, EXACT, alpha,
+                         best_move[0] * board.size + best_move[1])
+        return best_move, alpha
+
+    def _negamax(self, board, color, depth, alpha, beta, ply):
+        self._check_budget()
+        if depth <= 0:
+            return self.evaluate(color, ply)
+        key = _position_key(board, color)
+        entry = self.table.probe(key)
+        table_move = NO_MOVE
+        if entry is not None:
+            entry_depth, flag, score, table_move = entry
+            if entry_depth >= depth:
+                score = _from_table(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+        moves = self.ordered_moves(board, color)
+        if not moves:
+            return 0
+        if self._tables[color].value(*moves[0]) >= MAX_SCORE:
+            return WIN_SCORE - ply
+        if table_move != NO_MOVE:
+            move = divmod(table_move, board.size)
+            if move in moves:
+                moves.remove(move)
+                moves.insert(0, move)
+        alpha_orig = alpha
+        best = -INFINITY
+        best_move = moves[0]
+        self.expanded += 1
+        for x, y in moves:
+            board.push(x, y, color)
+            try:
+                score = -self._negamax(board, -color, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > best:
+                best, best_move = score, (x, y)
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        break
+        flag = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+        self.table.store(key, depth, flag, _to_table(best, ply), best_move[0] * board.size + best_move[1])
+        return best
+
+
+def search_move(board, color, strength=DEFAULT_STRENGTH, time_limit=None, node_limit=None, stop_event=None,
+                soft_time_limit=None):
+    """
+    Convenience wrapper: search a Board or grid[x][y] for color and return a
+    SearchResult. The transposition table is shared between calls.
+    """
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    engine = SearchEngine.from_strength(strength, time_limit=time_limit, node_limit=node_limit,
+                                        table=shared_table(), stop_event=stop_event,
+                                        soft_time_limit=soft_time_limit)
+    return engine.search(board, color)
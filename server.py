@@ -0,0 +1,319 @@
+"""
+Local HTTP/JSON analysis service.
+
+Keeps the engines loaded between requests, so other tools can ask for moves
+without starting pygame or paying for the imports and table set-up on every
+call. Positions are searched on a bounded pool of workers: by default one
+thread, so a single engine and its transposition table serve every request,
+or with --workers N, N processes that each keep their own warm engine.
+Requests beyond the pool wait in a queue of at most --max-pending positions;
+past that the server answers 503 until the queue drains.
+
+Endpoints (JSON in, JSON out):
+    GET  /health   status, pending positions and requests served
+    POST /analyse  one position
+    POST /batch    {"positions": [position, ...]}, answered in the same order
+
+A position is {"moves": [[x, y], ...], "size": 15} with black moving first,
+or {"grid": [[0, 1, -1, ...], ...]}, plus the optional "color" (default: the
+side to move), "time" (seconds, default 1.0), "strength" (1-10) and "engine"
+("search" for the alpha-beta engine, "mcts", or "proof" for the proof-number
+solver). The answer holds "move", "score", "depth", "nodes", "elapsed" and
+"pv", the expected line of play starting with the move; "proof" answers
+with "status" (proven, disproven or unknown) instead of a score, the
+proof's main line as "pv", and takes "nodes" as its node limit. On an
+empty board the answer is the centre, and "proof" refuses the position.
+
+The server has no authentication, so it listens on 127.0.0.1 only and never
+needs the network:
+    python server.py --port 8765 --workers 2
+    curl -d '{"moves": [[7, 7]], "time": 0.5}' localhost:8765/analyse
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from game_logic import BOARD_SIZE, Board
+from mcts import MCTSEngine
+from pn_search import DEFAULT_NODE_LIMIT as PROOF_NODE_LIMIT, prove
+from search import DEFAULT_STRENGTH, SearchEngine, shared_table
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_TIME = 1.0
+MAX_TIME = 60.0
+MAX_PENDING = 64
+MAX_BATCH = 256
+MAX_BODY = 1 << 20
+MAX_PROOF_NODES = 1000000
+ENGINES = ('search', 'mcts', 'proof')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class RequestError(Exception):
+    """A position request that cannot be answered; reported back with its message."""
+
+
+class HTTPError(Exception):
+    """A malformed HTTP request: answered with `status` and the connection closed."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_position(request):
+    """Return (board, color) for a position request, or raise RequestError."""
+    if not isinstance(request, dict):
+        raise RequestError('a position must be a JSON object')
+    try:
+        if 'grid' in request:
+            grid = request['grid']
+            if not grid or any(len(row) != len(grid) for row in grid):
+                raise RequestError('grid must be a square list of rows')
+            if any(cell not in (0, 1, -1) for row in grid for cell in row):
+                raise RequestError('grid cells must be 0, 1 (black) or -1 (white)')
+            board = Board.from_grid(grid)
+            to_move = 1 if board.bits[1].bit_count() <= board.bits[-1].bit_count() else -1
+        else:
+            board = Board(int(request.get('size', BOARD_SIZE)))
+            to_move = 1
+            for move in request.get('moves', []):
+                x, y = (int(v) for v in move)
+                if not board.place(x, y, to_move):
+                    raise RequestError(f'illegal move {[x, y]}')
+                to_move = -to_move
+    except (TypeError, ValueError) as e:
+        raise RequestError(f'bad position: {e}') from e
+    color = request.get('color', to_move)
+    if color not in (1, -1):
+        raise RequestError('color must be 1 (black) or -1 (white)')
+    return board, color
+
+
+_mcts = None
+
+
+def analyse(request):
+    """Search one position request and return the answer as a dict (runs on a pool worker)."""
+    global _mcts
+    board, color = parse_position(request)
+    engine = request.get('engine', 'search')
+    try:
+        time_limit = min(max(float(request.get('time', DEFAULT_TIME)), 0.01), MAX_TIME)
+        strength = int(request.get('strength', DEFAULT_STRENGTH))
+        node_limit = min(max(int(request.get('nodes', PROOF_NODE_LIMIT)), 1), MAX_PROOF_NODES)
+    except (TypeError, ValueError) as e:
+        raise RequestError(f'bad search settings: {e}') from e
+    if engine not in ENGINES:
+        raise RequestError(f'engine must be one of {", ".join(ENGINES)}')
+    if not board.occupied:
+        if engine == 'proof':
+            raise RequestError('the proof search needs at least one stone on the board')
+        # The first move goes in the centre, as beta_go plays it
+        centre = [board.size // 2, board.size // 2]
+        return {'move': centre, 'color': color, 'score': 0, 'depth': 0, 'nodes': 0, 'elapsed': 0.0,
+                'pv': [centre]}
+    if engine == 'search':
+        # The shared table persists in this worker, so later requests start warm
+        searcher = SearchEngine.from_strength(strength, time_limit=time_limit, table=shared_table())
+        result = searcher.search(board, color)
+        pv = searcher.principal_variation(board, color, result.move) if result.move is not None else []
+    elif engine == 'mcts':
+        if _mcts is None:
+            _mcts = MCTSEngine()
+        _mcts.time_limit = time_limit
+        result = _mcts.search(board, color)
+        pv = _mcts.principal_variation()
+    else:
+        result = prove(board, color, node_limit, time_limit)
+        return {
+            'move': list(result.move) if result.move is not None else None,
+            'color': color,
+            'status': result.status,
+            'depth': (len(result.line) + 1) // 2,
+            'nodes': result.nodes,
+            'elapsed': result.elapsed,
+            'pv': [list(move) for move in result.line],
+        }
+    return {
+        'move': list(result.move) if result.move is not None else None,
+        'color': color,
+        'score': result.score,
+        'depth': result.depth,
+        'nodes': result.nodes,
+        'elapsed': result.elapsed,
+        'pv': [list(move) for move in pv],
+    }
+
+
+def _answer(request):
+    """analyse(), with a bad request reported in the answer rather than raised."""
+    try:
+        return analyse(request)
+    except RequestError as e:
+        return {'error': str(e)}
+
+
+def _warm_up():
+    """Build the per-size tables and caches before the first real request."""
+    analyse({'moves': [[7, 7], [7, 8]], 'time': 0.05})
+    analyse({'moves': [[7, 7], [7, 8]], 'time': 0.05, 'engine': 'mcts'})
+
+
+class AnalysisServer:
+    """The HTTP front end and the bounded worker pool behind it."""
+    def __init__(self, workers=1, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        if workers == 1:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.pending = 0
+        self.served = 0
+        self.started = time.time()
+
+    async def warm_up(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers)))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, requests):
+        """Answer position requests on the pool, in order."""
+        loop = asyncio.get_running_loop()
+        self.pending += len(requests)
+        try:
+            return await asyncio.gather(*(loop.run_in_executor(self.executor, _answer, r) for r in requests))
+        finally:
+            self.pending -= len(requests)
+            self.served += len(requests)
+
+    async def dispatch(self, method, path, body):
+        """Return (status, payload) for one HTTP request."""
+        path = path.split('?', 1)[0].rstrip('/') or '/'
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': 'use GET'}
+            return 200, {'status': 'ok', 'workers': self.workers, 'pending': self.pending,
+                         'max_pending': self.max_pending, 'served': self.served,
+                         'uptime': time.time() - self.started}
+        if path not in ('/analyse', '/batch'):
+            return 404, {'error': f'no such endpoint {path}'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            return 400, {'error': 'request body is not valid JSON'}
+        if path == '/analyse':
+            requests = [data]
+        else:
+            requests = data.get('positions') if isinstance(data, dict) else None
+            if not isinstance(requests, list):
+                return 400, {'error': 'a batch needs a "positions" list'}
+            if len(requests) > MAX_BATCH:
+                return 413, {'error': f'at most {MAX_BATCH} positions per batch'}
+        if self.pending + len(requests) > self.max_pending:
+            return 503, {'error': 'server busy, try again later'}
+        results = await self._run(requests)
+        if path == '/analyse':
+            return (400 if 'error' in results[0] else 200), results[0]
+        return 200, {'results': results}
+
+    async def _read_request(self, reader):
+        """(method, path, body, keep_alive) of the next request, or None at end of stream."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, 'malformed request line')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, 'bad Content-Length')
+        if length > MAX_BODY:
+            raise HTTPError(413, f'request body over {MAX_BODY} bytes')
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+        return method, path, body, keep_alive
+
+    @staticmethod
+    def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                'Content-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._respond(writer, e.status, {'error': str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+                self._respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(port=DEFAULT_PORT, workers=1, max_pending=MAX_PENDING):
+    analysis = AnalysisServer(workers, max_pending)
+    try:
+        await analysis.warm_up()
+        server = await asyncio.start_server(analysis.handle, HOST, port)
+        print(f'Analysing on http://{HOST}:{port} with {workers} worker(s)', flush=True)
+        async with server:
+            await server.serve_forever()
+    finally:
+        analysis.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Gomoku move analysis over HTTP on localhost.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='1: one warm engine on a thread; N: N engine processes')
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help='positions queued or running before requests are refused')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.port, max(args.workers, 1), args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
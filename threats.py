@@ -0,0 +1,267 @@
+"""
+Threat-space solver for Gomoku: searches forcing moves only.
+
+- VCF (victory by continuous fours): the attacker plays nothing but fours,
+  each of which leaves the defender a single forced block.
+- VCT (victory by continuous threats): the attacker may also play open
+  threes; every defence (either end or gap of the three, or a counter-four)
+  is tried.
+
+The search works directly on the two color bitmasks, so it never touches the
+Board or its observers. Fours and threes are found from five- and six-cell
+windows precomputed per board size: a five-window with four friendly stones
+and no enemy stone has a five point; with three stones, both empty cells are
+four moves. A six-window with empty ends, no enemy stone and two friendly
+stones among the middle four makes either of the two empty middle cells a
+three move.
+"""
+import time
+from game_logic import BOARD_SIZE, Board, geometry
+
+VCF_DEPTH = 12
+VCT_DEPTH = 6
+DEFAULT_NODE_LIMIT = 5000
+
+
+def _mask(cells):
+    mask = 0
+    for idx in cells:
+        mask |= 1 << idx
+    return mask
+
+
+_WINDOW_TABLES = {}
+
+
+def _window_tables(size):
+    """
+    (fives, sixes) for a board size, built once: the five-window masks, and
+    for each six-window (whole window, the two end cells, the four middle cells).
+    """
+    tables = _WINDOW_TABLES.get(size)
+    if tables is None:
+        geo = geometry(size)
+        fives = [_mask(cells) for cells in geo.windows(5)]
+        sixes = [(_mask(cells), _mask((cells[0], cells[5])), _mask(cells[1:5])) for cells in geo.windows(6)]
+        tables = _WINDOW_TABLES[size] = (fives, sixes)
+    return tables
+
+
+def _bit_indices(mask):
+    """Yield the indices of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def five_points(mine, theirs, size=BOARD_SIZE):
+    """Bitmask of empty cells where `mine` would complete five."""
+    points = 0
+    for mask in _window_tables(size)[0]:
+        own = mine & mask
+        if own and not theirs & mask and own.bit_count() == 4:
+            points |= mask ^ own
+    return points
+
+
+def four_moves(mine, theirs, size=BOARD_SIZE):
+    """Bitmask of empty cells where `mine` would make a four."""
+    moves = 0
+    for mask in _window_tables(size)[0]:
+        own = mine & mask
+        if own and not theirs & mask and own.bit_count() == 3:
+            moves |= mask ^ own
+    return moves
+
+
+def three_moves(mine, theirs, size=BOARD_SIZE):
+    """Bitmask of empty cells where `mine` would make an open three."""
+    moves = 0
+    for mask, ends, middle in _window_tables(size)[1]:
+        own = mine & middle
+        if own and not theirs & mask and not mine & ends and own.bit_count() == 2:
+            moves |= middle ^ own
+    return moves
+
+
+def three_defences(mine, theirs, move, size=BOARD_SIZE):
+    """Cells that answer the open three(s) `mine` made by playing `move`."""
+    bit = 1 << move
+    defences = 0
+    for mask, ends, middle in _window_tables(size)[1]:
+        if not mask & bit or theirs & mask or mine & ends:
+            continue
+        own = mine & middle
+        if own.bit_count() == 3:
+            defences |= ends | (middle ^ own)
+    return defences
+
+
+class SearchLimit(Exception):
+    """Raised when the solver runs out of nodes or time."""
+
+
+class ThreatSolver:
+    """
+    Forced-win solver. `vcf` and `vct` return the winning line as a list of
+    (x, y) moves, attacker first and alternating with the defender's forced
+    replies, or None if no win was found within the depth and node budget.
+    Depth counts attacker moves. Setting `stop_event` aborts a running solve.
+    """
+    def __init__(self, node_limit=DEFAULT_NODE_LIMIT, time_limit=None, stop_event=None):
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.stop_event = stop_event
+        self.nodes = 0
+
+    def vcf(self, board, color, max_depth=VCF_DEPTH):
+        """Look for a victory by continuous fours for color."""
+        return self._solve(board, color, max_depth, self._vcf)
+
+    def vct(self, board, color, max_depth=VCT_DEPTH):
+        """Look for a victory by continuous fours and open threes for color."""
+        return self._solve(board, color, max_depth, self._vct)
+
+    def forced_win(self, board, color, use_vct=True):
+        """
+        Try VCF, then (if use_vct) VCT; returns the winning line or None.
+        The time_limit covers both solves together. Afterwards `nodes`
+        counts the nodes of both solves.
+        """
+        deadline = self._new_deadline()
+        line = self._solve(board, color, VCF_DEPTH, self._vcf, deadline)
+        if line is None and use_vct:
+            nodes = self.nodes
+            line = self._solve(board, color, VCT_DEPTH, self._vct, deadline)
+            self.nodes += nodes
+        return line
+
+    def _new_deadline(self):
+        return time.perf_counter() + self.time_limit if self.time_limit is not None else None
+
+    def _solve(self, board, color, max_depth, search, deadline=None):
+        """Run one solve; `deadline` (a perf_counter time) defaults to time_limit from now."""
+        if not isinstance(board, Board):
+            board = Board.from_grid(board)
+        self.nodes = 0
+        self._size = board.size
+        self._deadline = deadline if deadline is not None else self._new_deadline()
+        self._failed = {'vcf': {}, 'vct': {}}
+        try:
+            line = search(board.bits[color], board.bits[-color], max_depth)
+        except SearchLimit:
+            return None
+        if line is None:
+            return None
+        return [divmod(idx, self._size) for idx in line]
+
+    def _tick(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimit()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchLimit()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchLimit()
+
+    def _known_failure(self, kind, mine, theirs, depth):
+        return self._failed[kind].get((mine, theirs), -1) >= depth
+
+    def _forced(self, mine, theirs, depth):
+        """
+        Common start of a node. Returns (line, their_points): a finished line if
+        the attacker can complete five now, or None with the defender's five
+        points; their_points is None if the node is lost for the attacker.
+        """
+        self._tick()
+        points = five_points(mine, theirs, self._size)
+        if points:
+            return [points.bit_length() - 1], 0
+        their_points = five_points(theirs, mine, self._size)
+        if depth <= 0 or their_points & (their_points - 1):
+            return None, None
+        return None, their_points
+
+    def _after_four(self, mine, theirs, idx, depth, search):
+        """Play four move idx and follow up; return the line or None."""
+        mine |= 1 << idx
+        threats = five_points(mine, theirs, self._size)
+        if threats & (threats - 1):
+            blocks = list(_bit_indices(threats))
+            return [idx, blocks[0], blocks[1]]
+        block = threats.bit_length() - 1
+        line = search(mine, theirs | threats, depth - 1)
+        if line is not None:
+            return [idx, block] + line
+        return None
+
+    def _vcf(self, mine, theirs, depth):
+        line, their_points = self._forced(mine, theirs, depth)
+        if line is not None or their_points is None:
+            return line
+        if self._known_failure('vcf', mine, theirs, depth):
+            return None
+        moves = four_moves(mine, theirs, self._size)
+        if their_points:
+            moves &= their_points
+        for idx in _bit_indices(moves):
+            line = self._after_four(mine, theirs, idx, depth, self._vcf)
+            if line is not None:
+                return line
+        self._failed['vcf'][(mine, theirs)] = depth
+        return None
+
+    def _vct(self, mine, theirs, depth):
+        line, their_points = self._forced(mine, theirs, depth)
+        if line is not None or their_points is None:
+            return line
+        if self._known_failure('vct', mine, theirs, depth):
+            return None
+        # Fours alone are cheapest to refute, so try a plain VCF first.
+        line = self._vcf(mine, theirs, VCF_DEPTH)
+        if line is not None:
+            return line
+        fours = four_moves(mine, theirs, self._size)
+        threes = three_moves(mine, theirs, self._size) & ~fours
+        if their_points:
+            fours &= their_points
+            threes &= their_points
+        for idx in _bit_indices(fours):
+            line = self._after_four(mine, theirs, idx, depth, self._vct)
+            if line is not None:
+                return line
+        for idx in _bit_indices(threes):
+            after = mine | (1 << idx)
+            defences = (three_defences(after, theirs, idx, self._size)
+                        | four_moves(theirs, after, self._size))
+            main_line = None
+            for defence in _bit_indices(defences):
+                line = self._vct(after, theirs | (1 << defence), depth - 1)
+                if line is None:
+                    break
+                if main_line is None:
+                    main_line = [idx, defence] + line
+            else:
+                if main_line is not None:
+                    return main_line
+        self._failed['vct'][(mine, theirs)] = depth
+        return None
+
+
+def find_vcf(board, color, max_depth=VCF_DEPTH, node_limit=DEFAULT_NODE_LIMIT, time_limit=None):
+    """Return a VCF line for color on a Board or grid[x][y], or None."""
+    return ThreatSolver(node_limit, time_limit).vcf(board, color, max_depth)
+
+
+def find_vct(board, color, max_depth=VCT_DEPTH, node_limit=DEFAULT_NODE_LIMIT, time_limit=None):
+    """Return a VCT line for color on a Board or grid[x][y], or None."""
+    return ThreatSolver(node_limit, time_limit).vct(board, color, max_depth)
+
+
+def find_forced_win(board, color, use_vct=True, node_limit=DEFAULT_NODE_LIMIT, time_limit=None, stop_event=None):
+    """
+    Try VCF, then (if use_vct) VCT. Returns the winning line or None. This is
+    the cheap tactical check beta_go runs before its normal evaluation.
+    """
+    return ThreatSolver(node_limit, time_limit, stop_event).forced_win(board, color, use_vct)
@@ -0,0 +1,103 @@
+"""
+Fixed-size transposition table for the search engine.
+
+Entries live in preallocated parallel arrays, so the memory use is decided
+once from `max_bytes` and never grows. The table is split into buckets of two
+slots:
+
+- 'two-tier' (default): slot 0 is depth-preferred, slot 1 is always-replace.
+- 'depth': only slot 0 is used and a shallower result never evicts a deeper
+  one from the current search.
+- 'always': only slot 0 is used and every store overwrites it.
+
+Entries left over from earlier searches (older `generation`) are always
+replaceable, which keeps depth-preferred slots from filling up with stale
+positions over a long session.
+"""
+from array import array
+
+EXACT, LOWER, UPPER = 0, 1, 2
+NO_MOVE = -1
+
+# key (8) + score (4) + move (2) + depth (1) + flag (1) + generation (1)
+ENTRY_BYTES = 17
+DEFAULT_TABLE_BYTES = 16 * 1024 * 1024
+POLICIES = ('two-tier', 'depth', 'always')
+
+
+class TranspositionTable:
+    """
+    Bounded hash table of search results keyed by 64-bit Zobrist hashes.
+    Each entry keeps the searched depth, the bound type (EXACT, LOWER or
+    UPPER), the score and the best move as a cell index.
+    """
+    def __init__(self, max_bytes=DEFAULT_TABLE_BYTES, policy='two-tier'):
+        if policy not in POLICIES:
+            raise ValueError(f'unknown replacement policy: {policy!r}')
+        buckets = 1
+        while buckets * 4 * ENTRY_BYTES <= max_bytes:
+            buckets *= 2
+        self.policy = policy
+        self.size = buckets * 2
+        self._mask = buckets - 1
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('i', bytes(4 * self.size))
+        self.moves = array('h', [NO_MOVE]) * self.size
+        self.depths = array('b', [-1]) * self.size
+        self.flags = array('B', bytes(self.size))
+        self.generations = array('B', bytes(self.size))
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    @property
+    def nbytes(self):
+        """Memory held by the entry arrays."""
+        return self.size * ENTRY_BYTES
+
+    def new_search(self):
+        """Age the current entries; call once before each root search."""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        """Drop every entry without releasing memory."""
+        self.depths = array('b', [-1]) * self.size
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """Return (depth, flag, score, move) stored for key, or None."""
+        self.probes += 1
+        slot = (key & self._mask) << 1
+        for i in (slot, slot + 1):
+            if self.keys[i] == key and self.depths[i] >= 0:
+                self.hits += 1
+                return self.depths[i], self.flags[i], self.scores[i], self.moves[i]
+        return None
+
+    def store(self, key, depth, flag, score, move=NO_MOVE):
+        """Record a search result, subject to the replacement policy."""
+        slot = (key & self._mask) << 1
+        if self.policy == 'always':
+            i = slot
+        elif self.keys[slot + 1] == key and self.depths[slot + 1] >= 0 and self.policy == 'two-tier':
+            i = slot + 1
+        elif (self.keys[slot] == key or depth >= self.depths[slot]
+              or self.generations[slot] != self.generation):
+            i = slot
+        elif self.policy == 'two-tier':
+            i = slot + 1
+        else:
+            return
+        if move == NO_MOVE and self.keys[i] == key:
+            # Keep the best move of an earlier search of the same position.
+            move = self.moves[i]
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.scores[i] = score
+        self.moves[i] = move
+        self.generations[i] = self.generation
+        self.stores += 1
+
+    def hit_rate(self):
+        """Fraction of probes that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0